@@ -5,7 +5,8 @@ import requests
 import pandas as pd
 import time
 from nlp_engine import find_herbs_in_text, extract_ayurvedic_properties
-from knowledge_graph import KNOWLEDGE_GRAPH, get_herb_properties
+from itertools import islice
+from knowledge_graph import KNOWLEDGE_GRAPH, get_herb_properties, iter_herb_neighborhood
 from pubchem_integration import call_pubchem_api, get_fallback_compound_data
 from hypothesis_engine import generate_hypothesis
 
@@ -121,6 +122,23 @@ def demo():
             'status': 'error'
         })
 
+@app.route('/herbs/<herb_name>/neighbors')
+def herb_neighbors(herb_name):
+    """Herbs sharing compounds or properties with a herb within `depth` hops"""
+    depth = min(max(request.args.get('depth', 2, type=int), 1), 4)
+    fan_out = request.args.get('fan_out', type=int)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    neighbors = iter_herb_neighborhood(herb_name, depth, fan_out)
+    results = [n.to_dict() for n in islice(neighbors, offset, offset + limit + 1)]
+    return jsonify({
+        'herb': herb_name,
+        'results': results[:limit],
+        'next_offset': offset + limit if len(results) > limit else None,
+        'status': 'success'
+    })
+
 if __name__ == '__main__':
     print("Starting Ayurvedic AI Analyzer...")
     print("Available endpoints:")
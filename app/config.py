@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,56 @@ class Config:
     NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
     NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
     NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
+    # How far a property term may be from a herb mention to be attributed to it
+    NLP_SENTENCE_WINDOW = int(os.getenv('NLP_SENTENCE_WINDOW', '1'))
+    NLP_TOKEN_WINDOW = int(os.getenv('NLP_TOKEN_WINDOW')) if os.getenv('NLP_TOKEN_WINDOW') else None
+    SPACY_MODEL = os.getenv('SPACY_MODEL', 'en_core_web_sm')
+    NLP_BATCH_SIZE = int(os.getenv('NLP_BATCH_SIZE', '64'))
+    NLP_N_PROCESS = int(os.getenv('NLP_N_PROCESS', '1'))
+    # Persistent PubChem response cache (shared by all workers on the host)
+    PUBCHEM_CACHE_PATH = os.getenv('PUBCHEM_CACHE_PATH', 'pubchem_cache.sqlite3')
+    PUBCHEM_CACHE_TTL = float(os.getenv('PUBCHEM_CACHE_TTL', str(30 * 86400)))
+    PUBCHEM_NEGATIVE_TTL = float(os.getenv('PUBCHEM_NEGATIVE_TTL', '86400'))
+    PUBCHEM_PROPERTY_BATCH_SIZE = int(os.getenv('PUBCHEM_PROPERTY_BATCH_SIZE', '100'))
+    # Token bucket state shared by every process on the host (5 req/s budget)
+    PUBCHEM_RATE_LIMIT_STATE = os.getenv(
+        'PUBCHEM_RATE_LIMIT_STATE',
+        os.path.join(tempfile.gettempdir(), 'vedhify-pubchem-rate-limit.bucket')
+    )
+    PUBCHEM_RATE_BURST = int(os.getenv('PUBCHEM_RATE_BURST', '5'))
+    PUBCHEM_MAX_CONCURRENCY = int(os.getenv('PUBCHEM_MAX_CONCURRENCY', '8'))
+    # Offline compound database built by import_compounds.py
+    COMPOUND_DB_PATH = os.getenv('COMPOUND_DB_PATH', 'compounds.sqlite3')
+    PUBCHEM_OFFLINE = os.getenv('PUBCHEM_OFFLINE', 'false').lower() in ('1', 'true', 'yes')
+    # Content hashes of imported records, so dataset re-imports only write changes
+    IMPORT_MANIFEST_PATH = os.getenv('IMPORT_MANIFEST_PATH', 'import_manifest.sqlite3')
+    # In-memory herb store written by import_herbs.py --memory, loaded at startup
+    HERB_STORE_PATH = os.getenv('HERB_STORE_PATH', 'herb_store.json')
+    # JSON file of extra hypothesis rules, merged over the built-in tables
+    HYPOTHESIS_RULES_PATH = os.getenv('HYPOTHESIS_RULES_PATH')
+    HYPOTHESIS_CACHE_SIZE = int(os.getenv('HYPOTHESIS_CACHE_SIZE', '1024'))
+    # Cross-herb synergy stage of /api/analyze
+    FORMULATION_MAX_COMBINATION_SIZE = int(os.getenv('FORMULATION_MAX_COMBINATION_SIZE', '3'))
+    FORMULATION_MAX_COMBINATIONS = int(os.getenv('FORMULATION_MAX_COMBINATIONS', '200'))
+    # 'auto' uses Neo4j if reachable, else the embedded graph; 'embedded' skips Neo4j
+    KG_BACKEND = os.getenv('KG_BACKEND', 'auto')
+    KG_SNAPSHOT_PATH = os.getenv('KG_SNAPSHOT_PATH')
+    # Knowledge-graph write-behind queue (flush on size or interval)
+    KG_WRITE_BEHIND = os.getenv('KG_WRITE_BEHIND', 'true').lower() in ('1', 'true', 'yes')
+    KG_FLUSH_SIZE = int(os.getenv('KG_FLUSH_SIZE', '200'))
+    KG_FLUSH_INTERVAL = float(os.getenv('KG_FLUSH_INTERVAL', '1.0'))
+    # Per-process LRU of /api/graph results; the TTL bounds staleness across workers
+    KG_GRAPH_CACHE_SIZE = int(os.getenv('KG_GRAPH_CACHE_SIZE', '256'))
+    KG_GRAPH_CACHE_TTL = float(os.getenv('KG_GRAPH_CACHE_TTL', '300'))
+    # Batch analysis (/api/analyze/batch): texts per request, NLP threads
+    # and texts per NLP task
+    BATCH_MAX_DOCUMENTS = int(os.getenv('BATCH_MAX_DOCUMENTS', '500'))
+    BATCH_NLP_WORKERS = int(os.getenv('BATCH_NLP_WORKERS', '4'))
+    BATCH_NLP_SLICE = int(os.getenv('BATCH_NLP_SLICE', '16'))
+    # Streaming document analysis (/api/analyze/document)
+    DOCUMENT_ROOT = os.getenv('ANALYSIS_DOCUMENT_ROOT')
+    DOCUMENT_CHUNK_SIZE = int(os.getenv('DOCUMENT_CHUNK_SIZE', '20000'))
+    DOCUMENT_CHUNK_OVERLAP = int(os.getenv('DOCUMENT_CHUNK_OVERLAP', '500'))
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -1,9 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from app.services.nlp_service import AyurvedicNLPService
 from app.services.kg_service import KnowledgeGraphService
 from app.services.pubchem_service import PubChemService
+from app.services.pubchem_async import AsyncPubChemClient
 from app.services.hypothesis_service import HypothesisEngine
+from app.services.rule_store import get_rule_store
 from app.config import Config
+from app.utils.text_chunker import iter_text_chunks, iter_decoded
+from app.utils.graph_search import MAX_DEPTH
+from app.services.herb_similarity import HerbSimilarityEngine
+import knowledge_graph
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+import json
+import os
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,18 +23,275 @@ logger = logging.getLogger(__name__)
 api_bp = Blueprint('api', __name__)
 
 # Initialize services
-nlp_service = AyurvedicNLPService()
+nlp_service = AyurvedicNLPService(
+    sentence_window=Config.NLP_SENTENCE_WINDOW,
+    token_window=Config.NLP_TOKEN_WINDOW,
+    spacy_model=Config.SPACY_MODEL,
+    batch_size=Config.NLP_BATCH_SIZE,
+    n_process=Config.NLP_N_PROCESS
+)
 kg_service = KnowledgeGraphService(
     Config.NEO4J_URI,
     Config.NEO4J_USER,
-    Config.NEO4J_PASSWORD
+    Config.NEO4J_PASSWORD,
+    write_behind=Config.KG_WRITE_BEHIND,
+    flush_size=Config.KG_FLUSH_SIZE,
+    flush_interval=Config.KG_FLUSH_INTERVAL,
+    backend=Config.KG_BACKEND,
+    snapshot_path=Config.KG_SNAPSHOT_PATH,
+    graph_cache_size=Config.KG_GRAPH_CACHE_SIZE,
+    graph_cache_ttl=Config.KG_GRAPH_CACHE_TTL
+)
+pubchem_service = PubChemService(
+    cache_path=Config.PUBCHEM_CACHE_PATH,
+    cache_ttl=Config.PUBCHEM_CACHE_TTL,
+    negative_ttl=Config.PUBCHEM_NEGATIVE_TTL,
+    property_batch_size=Config.PUBCHEM_PROPERTY_BATCH_SIZE,
+    rate_limit_state_path=Config.PUBCHEM_RATE_LIMIT_STATE,
+    rate_burst=Config.PUBCHEM_RATE_BURST,
+    max_connections=Config.PUBCHEM_MAX_CONCURRENCY,
+    compound_db_path=Config.COMPOUND_DB_PATH,
+    offline=Config.PUBCHEM_OFFLINE
+)
+pubchem_client = AsyncPubChemClient(
+    pubchem_service,
+    max_concurrency=Config.PUBCHEM_MAX_CONCURRENCY
 )
-pubchem_service = PubChemService()
-hypothesis_engine = HypothesisEngine()
+hypothesis_engine = HypothesisEngine(
+    get_rule_store(Config.HYPOTHESIS_RULES_PATH),
+    cache_size=Config.HYPOTHESIS_CACHE_SIZE
+)
+if Config.HERB_STORE_PATH and os.path.exists(Config.HERB_STORE_PATH):
+    logger.info(f"Loaded {knowledge_graph.load_herbs(Config.HERB_STORE_PATH)} herbs "
+                f"from {Config.HERB_STORE_PATH}")
+# Worker pools of /api/analyze/batch: NLP slices, and PubChem lookups that
+# overlap with them (each lookup fans out on pubchem_client's own pool)
+nlp_executor = ThreadPoolExecutor(max_workers=Config.BATCH_NLP_WORKERS, thread_name_prefix='batch-nlp')
+lookup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='batch-lookup')
+# Per-herb PubChem lookups of streamed /api/analyze responses
+stream_executor = ThreadPoolExecutor(max_workers=Config.PUBCHEM_MAX_CONCURRENCY,
+                                     thread_name_prefix='analyze-stream')
+_stream_stats = {'streams': 0, 'completed': 0, 'cancelled': 0, 'errors': 0,
+                 'lookups_cancelled': 0}
+_stream_stats_lock = threading.Lock()
+
+STREAM_MIMETYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+def _lookup_name(herb):
+    """Name used for PubChem/KG lookups: the canonical herb if known."""
+    return herb.get('canonical', herb['name'])
+
+def _prefetch_compounds(herbs, compound_cache):
+    """Resolve compounds for all not-yet-cached herbs concurrently."""
+    missing = list(dict.fromkeys(
+        _lookup_name(herb) for herb in herbs if _lookup_name(herb) not in compound_cache
+    ))
+    if missing:
+        compound_cache.update(pubchem_client.search_compounds_for_herbs(missing))
+    return compound_cache
+
+def _kg_record(herb, compounds):
+    """Knowledge-graph batch entry for one analyzed herb."""
+    virya = herb.get('virya', 'unknown')
+    return {
+        'name': herb['name'],
+        'properties': {
+            'rasa': ','.join(herb.get('rasa', [])),
+            'virya': virya,
+            'guna': ','.join(herb.get('guna', []))
+        },
+        'rasa': herb.get('rasa', []),
+        'guna': herb.get('guna', []),
+        'virya': [virya] if virya != 'unknown' else [],
+        'compounds': [
+            {'cid': compound['cid'], 'name': compound.get('molecular_formula', 'Unknown')}
+            for compound in compounds if 'cid' in compound
+        ]
+    }
+
+def _analyze_herbs(herbs, compound_cache, min_confidence=0.0, top_k=None):
+    """Run the pipeline for extracted herbs and write the KG in one transaction."""
+    # Step 3 for every herb at once: bulk PubChem lookups
+    _prefetch_compounds(herbs, compound_cache)
+    compounds = [_herb_compounds(herb, compound_cache) for herb in herbs]
+    
+    # Step 5 for every herb at once: one confidence scoring pass
+    hypotheses = hypothesis_engine.generate_hypotheses_batch(
+        list(zip(herbs, compounds)), min_confidence, top_k
+    )
+    results = [
+        {'herb': herb, 'compounds': herb_compounds, 'hypotheses': herb_hypotheses}
+        for herb, herb_compounds, herb_hypotheses in zip(herbs, compounds, hypotheses)
+    ]
+    
+    # Steps 2 and 4: herbs, properties and compound links, written behind
+    kg_service.enqueue_analysis([
+        _kg_record(result['herb'], result['compounds']) for result in results
+    ])
+    return results
+
+def _herb_compounds(herb, compound_cache=None):
+    """Compounds of one extracted herb, from the cache or PubChem."""
+    lookup_name = _lookup_name(herb)
+    if compound_cache is not None and lookup_name in compound_cache:
+        return compound_cache[lookup_name]
+    compounds = pubchem_service.search_herb_compounds(lookup_name)
+    if compound_cache is not None:
+        compound_cache[lookup_name] = compounds
+    return compounds
+
+def _analysis_options(data):
+    """min_confidence, top_k and max_combination_size from a request body.
+    
+    Raises ValueError for invalid values.
+    """
+    min_confidence = data.get('min_confidence', 0.0)
+    top_k = data.get('top_k')
+    max_combination_size = data.get('max_combination_size')
+    if isinstance(min_confidence, bool) or not isinstance(min_confidence, (int, float)) \
+            or not 0.0 <= min_confidence <= 1.0:
+        raise ValueError('min_confidence must be a number between 0 and 1')
+    if top_k is not None and (isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1):
+        raise ValueError('top_k must be a positive integer')
+    if max_combination_size is not None and (
+            isinstance(max_combination_size, bool) or not isinstance(max_combination_size, int)
+            or max_combination_size < 2):
+        raise ValueError('max_combination_size must be an integer >= 2')
+    return {'min_confidence': float(min_confidence), 'top_k': top_k,
+            'max_combination_size': max_combination_size}
+
+def _analyze_formulation(results, options):
+    """Cross-herb synergy stage, run once every herb of a text is resolved."""
+    herbs = [_lookup_name(result['herb']) for result in results]
+    compounds = {}
+    for herb, result in zip(herbs, results):
+        compounds.setdefault(herb, result['compounds'])
+    return hypothesis_engine.generate_formulation_hypotheses(
+        herbs, compounds,
+        max_combination_size=options['max_combination_size'] or Config.FORMULATION_MAX_COMBINATION_SIZE,
+        max_combinations=Config.FORMULATION_MAX_COMBINATIONS,
+        min_confidence=options['min_confidence'],
+        top_k=options['top_k']
+    )
+
+def _count_stream(key, amount=1):
+    with _stream_stats_lock:
+        _stream_stats[key] += amount
+
+def _stream_format():
+    """'ndjson', 'sse' or None (plain JSON) from ?stream= or the Accept header."""
+    requested = request.args.get('stream', '').lower()
+    if requested in ('1', 'true', 'yes', 'ndjson'):
+        return 'ndjson'
+    if requested == 'sse':
+        return 'sse'
+    if requested in ('0', 'false', 'no'):
+        return None
+    best = request.accept_mimetypes.best_match(
+        ['application/json', STREAM_MIMETYPES['ndjson'], STREAM_MIMETYPES['sse']]
+    )
+    return next((fmt for fmt, mimetype in STREAM_MIMETYPES.items() if mimetype == best), None)
+
+def _iter_analysis_frames(herbs, options):
+    """Analysis frames for extracted herbs, each herb's as soon as it is ready.
+    
+    Yields a 'herbs' frame, then one 'result' (or 'error') frame per herb in
+    completion order, tagged with the herb's index, and finally a 'summary'
+    frame with the formulation synergies. Compounds are looked up per
+    unique herb on stream_executor. If the generator is closed early (the
+    client went away) or fails, lookups that have not started are
+    cancelled and nothing is written to the knowledge graph; the two cases
+    are counted separately ('cancelled' / 'errors').
+    """
+    started = time.perf_counter()
+    yield {'type': 'herbs', 'herbs': [_lookup_name(herb) for herb in herbs]}
+    
+    cancelled = threading.Event()
+    
+    def lookup(name):
+        if cancelled.is_set():
+            return []
+        return pubchem_service.search_herb_compounds(name)
+    
+    positions = {}
+    for index, herb in enumerate(herbs):
+        positions.setdefault(_lookup_name(herb), []).append(index)
+    futures = {stream_executor.submit(lookup, name): name for name in positions}
+    results = [None] * len(herbs)
+    finished = False
+    _count_stream('streams')
+    try:
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                compounds = future.result()
+            except Exception as e:
+                logger.error(f"Error looking up compounds for {name}: {e}")
+                for index in positions[name]:
+                    yield {'type': 'error', 'index': index, 'herb': name, 'error': str(e)}
+                continue
+            for index in positions[name]:
+                herb = herbs[index]
+                results[index] = {
+                    'herb': herb,
+                    'compounds': compounds,
+                    'hypotheses': hypothesis_engine.generate_hypotheses(
+                        herb, compounds, options['min_confidence'], options['top_k']
+                    )
+                }
+                yield {'type': 'result', 'index': index, 'result': results[index]}
+        
+        completed = [result for result in results if result is not None]
+        kg_service.enqueue_analysis([
+            _kg_record(result['herb'], result['compounds']) for result in completed
+        ])
+        finished = True
+        yield {
+            'type': 'summary',
+            'success': True,
+            'herbs': len(herbs),
+            'resolved': len(completed),
+            'formulation': _analyze_formulation(completed, options),
+            'elapsed_ms': _elapsed_ms(started)
+        }
+        _count_stream('completed')
+    except GeneratorExit:
+        if not finished:
+            _count_stream('cancelled')
+        raise
+    except Exception:
+        _count_stream('errors')
+        raise
+    finally:
+        if not finished:
+            cancelled.set()
+            _count_stream('lookups_cancelled', sum(future.cancel() for future in futures))
+
+def _encode_frames(frames, fmt):
+    """Serialize analysis frames as NDJSON lines or Server-Sent Events."""
+    try:
+        for number, frame in enumerate(frames):
+            if fmt == 'sse':
+                yield f"id: {number}\nevent: {frame['type']}\ndata: {json.dumps(frame)}\n\n"
+            else:
+                yield json.dumps(frame) + '\n'
+    except Exception as e:
+        logger.error(f"Error streaming analysis: {e}", exc_info=True)
+        frame = {'type': 'error', 'error': str(e)}
+        yield (f"event: error\ndata: {json.dumps(frame)}\n\n" if fmt == 'sse'
+               else json.dumps(frame) + '\n')
+    finally:
+        frames.close()
 
 @api_bp.route('/analyze', methods=['POST'])
 def analyze_text():
-    """Analyze Ayurvedic text and generate insights."""
+    """Analyze Ayurvedic text and generate insights.
+    
+    With ``?stream=ndjson`` / ``?stream=sse`` (or an Accept header of
+    application/x-ndjson / text/event-stream) each herb's result is sent as
+    soon as it is ready, followed by a summary frame; see
+    _iter_analysis_frames.
+    """
     try:
         data = request.get_json()
         text = data.get('text', '')
@@ -30,68 +299,273 @@ def analyze_text():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
+        try:
+            options = _analysis_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Step 1: Extract herbs using NLP
         herbs = nlp_service.extract_herbs(text)
         logger.info(f"Extracted {len(herbs)} herbs")
         
-        results = []
+        fmt = _stream_format()
+        if fmt:
+            frames = _encode_frames(_iter_analysis_frames(herbs, options), fmt)
+            return Response(stream_with_context(frames), mimetype=STREAM_MIMETYPES[fmt],
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
         
-        for herb in herbs:
-            herb_name = herb['name']
-            
-            # Step 2: Add to knowledge graph
-            kg_service.add_herb(herb_name, {
-                'rasa': ','.join(herb.get('rasa', [])),
-                'virya': herb.get('virya', 'unknown'),
-                'guna': ','.join(herb.get('guna', []))
-            })
-            
-            # Add properties to graph
-            for rasa in herb.get('rasa', []):
-                kg_service.add_rasa_property(herb_name, rasa)
-            
-            for guna in herb.get('guna', []):
-                kg_service.add_guna_property(herb_name, guna)
-            
-            if herb.get('virya') != 'unknown':
-                kg_service.add_virya_property(herb_name, herb['virya'])
-            
-            # Step 3: Search PubChem for compounds
-            compounds = pubchem_service.search_herb_compounds(herb_name)
-            
-            # Step 4: Link compounds to graph
-            for compound in compounds:
-                if 'cid' in compound:
-                    kg_service.link_herb_to_compound(
-                        herb_name,
-                        compound['cid'],
-                        compound.get('molecular_formula', 'Unknown')
-                    )
-            
-            # Step 5: Generate hypotheses
-            hypotheses = hypothesis_engine.generate_hypotheses(herb, compounds)
-            
-            results.append({
-                'herb': herb,
-                'compounds': compounds,
-                'hypotheses': hypotheses
-            })
+        results = _analyze_herbs(herbs, {}, options['min_confidence'], options['top_k'])
+        
+        # Step 6: Synergies across the whole formulation
+        formulation = _analyze_formulation(results, options)
         
         return jsonify({
             'success': True,
-            'results': results
+            'results': results,
+            'formulation': formulation
         }), 200
         
     except Exception as e:
         logger.error(f"Error analyzing text: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+def _merge_kg_records(records):
+    """One knowledge-graph record per herb, with every property and compound seen for it."""
+    merged = {}
+    for record in records:
+        current = merged.get(record['name'])
+        if current is None:
+            merged[record['name']] = {**record, 'properties': dict(record['properties']),
+                                      'rasa': list(record['rasa']), 'guna': list(record['guna']),
+                                      'virya': list(record['virya']),
+                                      'compounds': list(record['compounds'])}
+            continue
+        for key in ('rasa', 'guna', 'virya'):
+            current[key].extend(value for value in record[key] if value not in current[key])
+        cids = {compound['cid'] for compound in current['compounds']}
+        current['compounds'].extend(c for c in record['compounds'] if c['cid'] not in cids)
+        current['properties'].update({
+            'rasa': ','.join(current['rasa']),
+            'guna': ','.join(current['guna']),
+            'virya': current['virya'][0] if current['virya'] else 'unknown'
+        })
+    return list(merged.values())
+
+def _elapsed_ms(since):
+    return round((time.perf_counter() - since) * 1000, 2)
+
+def _analyze_batch(texts, options):
+    """Run the analysis pipeline over many texts, sharing work between them.
+    
+    Distinct texts are extracted in slices on the NLP worker pool. As each
+    slice completes (in input order), the herbs it introduces are sent to
+    PubChem while later slices are still being extracted, so every unique
+    herb is resolved once and lookups overlap with NLP. Hypotheses for all
+    herbs of the batch are then scored in one pass, formulation synergies
+    are found per document, and knowledge-graph writes are merged per herb.
+    """
+    timings = {}
+    started = stage = time.perf_counter()
+    
+    # Stage 1: NLP over distinct texts, with overlapping PubChem lookups
+    distinct = list(dict.fromkeys(texts))
+    size = Config.BATCH_NLP_SLICE
+    slices = [distinct[i:i + size] for i in range(0, len(distinct), size)]
+    extractions = [nlp_executor.submit(nlp_service.extract_herbs_batch, piece, None, 1)
+                   for piece in slices]
+    herbs_by_text = {}
+    requested = set()
+    lookups = []
+    for piece, extraction in zip(slices, extractions):
+        herbs_by_text.update(zip(piece, extraction.result()))
+        new = list(dict.fromkeys(
+            name for text in piece for name in map(_lookup_name, herbs_by_text[text])
+            if name not in requested
+        ))
+        requested.update(new)
+        if new:
+            lookups.append(lookup_executor.submit(pubchem_client.search_compounds_for_herbs, new))
+    timings['nlp_ms'] = _elapsed_ms(stage)
+    
+    # Stage 2: whatever PubChem work is still outstanding once NLP is done
+    stage = time.perf_counter()
+    compound_cache = {}
+    for lookup in lookups:
+        compound_cache.update(lookup.result())
+    timings['compounds_ms'] = _elapsed_ms(stage)
+    
+    # Stage 3: hypotheses for every herb of every document, scored together
+    stage = time.perf_counter()
+    items = [(herb, compound_cache.get(_lookup_name(herb), []))
+             for text in texts for herb in herbs_by_text[text]]
+    hypotheses = iter(zip(items, hypothesis_engine.generate_hypotheses_batch(
+        items, options['min_confidence'], options['top_k']
+    )))
+    timings['hypotheses_ms'] = _elapsed_ms(stage)
+    
+    # Stage 4: per-document results and formulation synergies
+    stage = time.perf_counter()
+    documents = []
+    for index, text in enumerate(texts):
+        results = [{'herb': herb, 'compounds': compounds, 'hypotheses': herb_hypotheses}
+                   for (herb, compounds), herb_hypotheses
+                   in islice(hypotheses, len(herbs_by_text[text]))]
+        documents.append({
+            'index': index,
+            'results': results,
+            'formulation': _analyze_formulation(results, options)
+        })
+    timings['formulation_ms'] = _elapsed_ms(stage)
+    
+    # Stage 5: one knowledge-graph record per herb, written behind
+    stage = time.perf_counter()
+    kg_service.enqueue_analysis(_merge_kg_records(
+        _kg_record(herb, compound_cache.get(_lookup_name(herb), []))
+        for herbs in herbs_by_text.values() for herb in herbs
+    ))
+    timings['kg_ms'] = _elapsed_ms(stage)
+    timings['total_ms'] = _elapsed_ms(started)
+    
+    return {
+        'success': True,
+        'documents': documents,
+        'distinct_texts': len(distinct),
+        'unique_herbs': len(requested),
+        'timings': timings
+    }
+
+@api_bp.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze many texts in one request; results come back in input order.
+    
+    Body: ``{"texts": [...]}`` plus the optional /analyze settings
+    (min_confidence, top_k, max_combination_size).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        texts = data.get('texts')
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return jsonify({'error': 'texts must be a non-empty list of strings'}), 400
+        if len(texts) > Config.BATCH_MAX_DOCUMENTS:
+            return jsonify({'error': f'At most {Config.BATCH_MAX_DOCUMENTS} texts per batch'}), 413
+        try:
+            options = _analysis_options(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        batch = _analyze_batch(texts, options)
+        logger.info(f"Batch of {len(texts)} texts: {batch['unique_herbs']} unique herbs, "
+                    f"{batch['timings']['total_ms']} ms")
+        return jsonify(batch), 200
+        
+    except Exception as e:
+        logger.error(f"Error analyzing batch: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+def _resolve_document_path(path):
+    """Resolve a server-side document path, confined to DOCUMENT_ROOT."""
+    if not Config.DOCUMENT_ROOT:
+        raise PermissionError('Server-side documents are disabled (set ANALYSIS_DOCUMENT_ROOT)')
+    root = os.path.realpath(Config.DOCUMENT_ROOT)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root:
+        raise PermissionError('Document path is outside ANALYSIS_DOCUMENT_ROOT')
+    if not os.path.isfile(full_path):
+        raise FileNotFoundError(f'Document not found: {path}')
+    return full_path
+
+def _iter_chunk_results(chunks):
+    """Run the NLP/KG/hypothesis pipeline chunk by chunk."""
+    compound_cache = {}
+    herbs_seen = set()
+    chunk_count = 0
+    
+    for chunk in chunks:
+        herbs = []
+        for herb in nlp_service.extract_herbs(chunk.text):
+            # Herbs only mentioned in the overlap were reported with the previous chunk
+            mentions = [m for m in herb.get('mentions', []) if m[0] >= chunk.overlap]
+            if not mentions:
+                continue
+            herb['mentions'] = [[start + chunk.offset, end + chunk.offset]
+                                for start, end in mentions]
+            herbs_seen.add(_lookup_name(herb))
+            herbs.append(herb)
+        
+        results = _analyze_herbs(herbs, compound_cache)
+        
+        chunk_count += 1
+        yield {
+            'chunk': chunk.index,
+            'offset': chunk.offset + chunk.overlap,
+            'length': len(chunk.text) - chunk.overlap,
+            'results': results
+        }
+    
+    yield {
+        'done': True,
+        'chunks': chunk_count,
+        'herbs': sorted(herbs_seen)
+    }
+
+@api_bp.route('/analyze/document', methods=['POST'])
+def analyze_document():
+    """Analyze a book-length text chunk by chunk, streaming NDJSON results.
+    
+    The body is either the raw text (chunked uploads are fine) or JSON
+    ``{"path": ...}`` naming a file under ANALYSIS_DOCUMENT_ROOT.
+    """
+    try:
+        chunk_size = request.args.get('chunk_size', Config.DOCUMENT_CHUNK_SIZE, type=int)
+        overlap = request.args.get('overlap', Config.DOCUMENT_CHUNK_OVERLAP, type=int)
+        if chunk_size <= 0 or overlap < 0:
+            return jsonify({'error': 'chunk_size must be positive and overlap non-negative'}), 400
+        
+        if request.is_json:
+            path = (request.get_json() or {}).get('path')
+            if not path:
+                return jsonify({'error': 'No path provided'}), 400
+            full_path = _resolve_document_path(path)
+            
+            def read_pieces():
+                with open(full_path, encoding='utf-8', errors='replace') as handle:
+                    while True:
+                        piece = handle.read(65536)
+                        if not piece:
+                            break
+                        yield piece
+            pieces = read_pieces()
+        else:
+            pieces = iter_decoded(request.stream, request.mimetype_params.get('charset', 'utf-8'))
+        
+        def generate():
+            try:
+                for frame in _iter_chunk_results(iter_text_chunks(pieces, chunk_size, overlap)):
+                    yield json.dumps(frame) + '\n'
+            except Exception as e:
+                logger.error(f"Error analyzing document: {e}", exc_info=True)
+                yield json.dumps({'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except PermissionError as e:
+        return jsonify({'error': str(e)}), 403
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error analyzing document: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/graph/<herb_name>', methods=['GET'])
 def get_herb_graph(herb_name):
-    """Get knowledge graph for a specific herb."""
+    """Get knowledge graph for a specific herb (supports If-None-Match)."""
     try:
-        graph_data = kg_service.get_herb_graph(herb_name)
-        return jsonify(graph_data), 200
+        graph_data, etag = kg_service.get_herb_graph_with_etag(herb_name)
+        response = jsonify(graph_data)
+        response.set_etag(etag)
+        # Clients may keep the graph but must revalidate before reusing it
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Error fetching graph: {e}")
         return jsonify({'error': str(e)}), 500
@@ -106,6 +580,79 @@ def get_all_herbs():
         logger.error(f"Error fetching herbs: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/herbs/<herb_name>/neighbors', methods=['GET'])
+def get_herb_neighbors(herb_name):
+    """Herbs sharing compounds or properties with a herb within `depth` hops.
+    
+    Query params: depth (1-4), fan_out (herbs expanded per herb), rel
+    (comma-separated relationship types), limit/offset for pagination and
+    stream=1 for NDJSON output.
+    """
+    try:
+        depth = request.args.get('depth', 2, type=int)
+        fan_out = request.args.get('fan_out', type=int)
+        limit = request.args.get('limit', 50, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if not 1 <= depth <= MAX_DEPTH or not 1 <= limit <= 500 or offset < 0 \
+                or (fan_out is not None and fan_out < 1):
+            return jsonify({'error': f'depth must be 1-{MAX_DEPTH}, limit 1-500, '
+                                     f'offset >= 0 and fan_out >= 1'}), 400
+        relationships = [rel.strip().upper() for rel in request.args.get('rel', '').split(',')
+                         if rel.strip()] or None
+        
+        # One extra result tells us whether there is a next page
+        neighbors = kg_service.iter_herb_neighborhood(
+            herb_name, depth, fan_out, relationships, limit=offset + limit + 1
+        )
+        page = islice(neighbors, offset, offset + limit + 1)
+        
+        if request.args.get('stream', '').lower() in ('1', 'true'):
+            def generate():
+                count = 0
+                for neighbor in page:
+                    if count == limit:
+                        yield json.dumps({'done': True, 'count': count,
+                                          'next_offset': offset + limit}) + '\n'
+                        return
+                    count += 1
+                    yield json.dumps(neighbor.to_dict()) + '\n'
+                yield json.dumps({'done': True, 'count': count, 'next_offset': None}) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        results = [neighbor.to_dict() for neighbor in page]
+        has_more = len(results) > limit
+        return jsonify({
+            'herb': herb_name,
+            'results': results[:limit],
+            'next_offset': offset + limit if has_more else None
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching herb neighbors: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/herbs/<herb_name>/similar', methods=['GET'])
+def get_similar_herbs(herb_name):
+    """Top-k herbs by weighted property similarity (`metric` jaccard or cosine)."""
+    try:
+        k = request.args.get('k', 10, type=int)
+        metric = request.args.get('metric', 'jaccard').lower()
+        if not 1 <= k <= 100 or metric not in HerbSimilarityEngine.METRICS:
+            return jsonify({'error': f'k must be 1-100 and metric one of '
+                                     f'{", ".join(HerbSimilarityEngine.METRICS)}'}), 400
+        if knowledge_graph.get_herb_properties(herb_name) is None:
+            return jsonify({'error': f'Unknown herb: {herb_name}'}), 404
+        
+        similar = knowledge_graph.get_similar_herbs(herb_name, k, metric)
+        return jsonify({
+            'herb': herb_name.title(),
+            'metric': metric,
+            'similar': [{'herb': herb, 'score': round(score, 4)} for herb, score in similar]
+        }), 200
+    except Exception as e:
+        logger.error(f"Error fetching similar herbs: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/search', methods=['GET'])
 def search_herbs():
     """Search herbs by property."""
@@ -122,6 +669,22 @@ def search_herbs():
         logger.error(f"Error searching herbs: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/stats', methods=['GET'])
+def get_stats():
+    """Runtime counters for caches and background components."""
+    return jsonify({
+        'pubchem_cache': pubchem_service.cache_stats(),
+        'pubchem_rate_limit': pubchem_service.rate_limit_stats(),
+        'compound_store': pubchem_service.compound_store_stats(),
+        'kg_write_queue': kg_service.write_queue_stats(),
+        'kg_backend': kg_service.backend_stats(),
+        'kg_graph_cache': kg_service.graph_cache_stats(),
+        'herb_similarity': knowledge_graph.SIMILARITY_ENGINE.stats(),
+        'hypothesis_rules': hypothesis_engine.rules.stats(),
+        'hypothesis_cache': hypothesis_engine.cache_stats(),
+        'analyze_stream': dict(_stream_stats)
+    }), 200
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
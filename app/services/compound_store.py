@@ -0,0 +1,317 @@
+import json
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+from app.services.import_manifest import EntityHasher, ImportManifest
+from app.utils.archive import iter_archive_rows, normalize_key
+
+logger = logging.getLogger(__name__)
+
+# Dataset column headers (normalized) accepted for each compound field
+FIELD_ALIASES = {
+    'name': ('name', 'compound', 'compoundname', 'phytochemical', 'phytochemicalname',
+             'chemical', 'chemicalname', 'cmpdname', 'constituent'),
+    'cid': ('cid', 'pubchemcid', 'pubchemid', 'pubchemcompoundid'),
+    'inchikey': ('inchikey', 'standardinchikey'),
+    'synonyms': ('synonyms', 'synonym', 'aliases', 'alias', 'othernames', 'cmpdsynonym'),
+    'herb': ('herb', 'herbname', 'plant', 'plantname', 'botanicalname',
+             'scientificname', 'species', 'source', 'sourceplant'),
+    'molecular_formula': ('molecularformula', 'formula', 'mf'),
+    'molecular_weight': ('molecularweight', 'mw', 'molwt', 'weight'),
+    'smiles': ('canonicalsmiles', 'smiles', 'isomericsmiles'),
+    'iupac_name': ('iupacname', 'iupac'),
+}
+
+_ALIAS_TO_FIELD = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+_LIST_SPLIT_RE = re.compile(r'\s*[|;]\s*')
+PROPERTY_KEYS = ('molecular_formula', 'molecular_weight', 'smiles', 'iupac_name')
+
+def _normalize(name: str) -> str:
+    return ' '.join(name.split()).lower()
+
+def parse_compound_row(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map a dataset row onto compound fields; None if it names no compound."""
+    record = {'synonyms': [], 'herbs': []}
+    for key, value in row.items():
+        field = _ALIAS_TO_FIELD.get(normalize_key(key))
+        if field is None or value is None or value == '':
+            continue
+        if field == 'synonyms':
+            values = value if isinstance(value, list) else _LIST_SPLIT_RE.split(str(value))
+            record['synonyms'].extend(str(v).strip() for v in values if str(v).strip())
+        elif field == 'herb':
+            record['herbs'].append(str(value).strip())
+        elif field == 'cid':
+            try:
+                record['cid'] = int(float(value))
+            except (TypeError, ValueError):
+                continue
+        elif field == 'inchikey':
+            record.setdefault('inchikey', str(value).strip().upper())
+        elif field not in record:
+            record[field] = str(value).strip()
+    if '__group__' in row and not record['herbs']:
+        record['herbs'].append(str(row['__group__']).strip())
+    if not record.get('name') and record['synonyms']:
+        record['name'] = record['synonyms'][0]
+    return record if record.get('name') or record.get('cid') else None
+
+def compound_key(record: Dict[str, Any]) -> str:
+    """Identity of a parsed compound for the import manifest."""
+    if record.get('cid'):
+        return f"cid:{record['cid']}"
+    if record.get('inchikey'):
+        return f"inchikey:{record['inchikey']}"
+    return f"name:{_normalize(record['name'])}"
+
+class CompoundStore:
+    """Local SQLite compound database built from the phytochemical dataset.
+
+    Compounds are indexed by name and synonym (normalized, with the
+    dataset's spelling kept for display), CID, InChIKey and herb, so
+    PubChemService can answer lookups without the network.
+    Rows describing the same compound (same CID, InChIKey or name) are
+    merged, filling fields earlier rows left empty.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+        self._create_tables()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        """Create tables and lookup indexes if they do not exist."""
+        conn = self._connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS compounds "
+                         "(id INTEGER PRIMARY KEY, cid INTEGER UNIQUE, "
+                         "inchikey TEXT UNIQUE, name TEXT, data TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS compound_names "
+                         "(name TEXT, compound_id INTEGER, is_synonym INTEGER, display TEXT, "
+                         "PRIMARY KEY (name, compound_id)) WITHOUT ROWID")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(compound_names)")]
+            if 'display' not in columns:
+                # Stores created before display names were kept
+                conn.execute("ALTER TABLE compound_names ADD COLUMN display TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS compound_names_by_id "
+                         "ON compound_names (compound_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS herb_compounds "
+                         "(herb TEXT, compound_id INTEGER, "
+                         "PRIMARY KEY (herb, compound_id)) WITHOUT ROWID")
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            self._stats['hits' if hit else 'misses'] += 1
+
+    def _find_id(self, conn: sqlite3.Connection, record: Dict[str, Any]) -> Optional[int]:
+        """Return the id of an already stored compound matching the record."""
+        queries = []
+        if record.get('cid'):
+            queries.append(("SELECT id FROM compounds WHERE cid = ?", record['cid']))
+        if record.get('inchikey'):
+            queries.append(("SELECT id FROM compounds WHERE inchikey = ?", record['inchikey']))
+        if record.get('name'):
+            queries.append(("SELECT compound_id FROM compound_names "
+                            "WHERE name = ? AND is_synonym = 0", _normalize(record['name'])))
+        for query, key in queries:
+            row = conn.execute(query, (key,)).fetchone()
+            if row:
+                return row[0]
+        return None
+
+    def _upsert(self, conn: sqlite3.Connection, record: Dict[str, Any]) -> bool:
+        """Insert or merge one compound record; return True if it was new."""
+        compound_id = self._find_id(conn, record)
+        created = compound_id is None
+        if created:
+            data = {key: record.get(key) for key in PROPERTY_KEYS}
+            compound_id = conn.execute(
+                "INSERT INTO compounds (cid, inchikey, name, data) VALUES (?, ?, ?, ?)",
+                (record.get('cid'), record.get('inchikey'), record.get('name'), json.dumps(data))
+            ).lastrowid
+        else:
+            cid, inchikey, name, data = conn.execute(
+                "SELECT cid, inchikey, name, data FROM compounds WHERE id = ?", (compound_id,)
+            ).fetchone()
+            data = json.loads(data)
+            for key in PROPERTY_KEYS:
+                data[key] = data.get(key) or record.get(key)
+            try:
+                conn.execute("UPDATE compounds SET cid = ?, inchikey = ?, name = ?, data = ? "
+                             "WHERE id = ?",
+                             (cid or record.get('cid'), inchikey or record.get('inchikey'),
+                              name or record.get('name'), json.dumps(data), compound_id))
+            except sqlite3.IntegrityError:
+                # CID/InChIKey already claimed by another row; keep the properties only
+                conn.execute("UPDATE compounds SET data = ? WHERE id = ?",
+                             (json.dumps(data), compound_id))
+
+        names = [(record['name'], 0)] if record.get('name') else []
+        names += [(synonym, 1) for synonym in record['synonyms']]
+        conn.executemany(
+            "INSERT OR IGNORE INTO compound_names (name, compound_id, is_synonym, display) "
+            "VALUES (?, ?, ?, ?)",
+            [(_normalize(name), compound_id, is_synonym, ' '.join(name.split()))
+             for name, is_synonym in names]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO herb_compounds (herb, compound_id) VALUES (?, ?)",
+            [(_normalize(herb), compound_id) for herb in record['herbs']]
+        )
+        return created
+
+    def import_rows(self, rows: Iterable[Dict[str, Any]], batch_size: int = 1000) -> Dict[str, int]:
+        """Load dataset rows, committing every ``batch_size`` rows."""
+        counts = {'rows': 0, 'compounds': 0, 'skipped': 0}
+        conn = self._connection()
+        try:
+            for row in rows:
+                counts['rows'] += 1
+                record = parse_compound_row(row)
+                if record is None:
+                    counts['skipped'] += 1
+                    continue
+                counts['compounds'] += self._upsert(conn, record)
+                if counts['rows'] % batch_size == 0:
+                    conn.commit()
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return counts
+
+    def import_archive(self, archive_path: str, batch_size: int = 1000,
+                       manifest: Optional[ImportManifest] = None,
+                       dataset: str = 'compounds') -> Dict[str, Any]:
+        """Stream every record of a dataset zip into the store.
+
+        With a manifest only compounds whose records changed since the last
+        import are rewritten, and compounds that disappeared are deleted;
+        the counts then include the 'delta'.
+        """
+        if manifest is None:
+            return self.import_rows((row for _, row in iter_archive_rows(archive_path)), batch_size)
+
+        hasher = EntityHasher()
+        for _, row in iter_archive_rows(archive_path):
+            record = parse_compound_row(row)
+            if record is not None:
+                hasher.add(compound_key(record), record.get('name') or compound_key(record), row)
+        hashes = hasher.hashes()
+        delta = manifest.diff(dataset, hashes)
+
+        dirty = set(delta['added']) | set(delta['changed'])
+        conn = self._connection()
+        with conn:
+            for key in delta['changed'] + delta['removed']:
+                self._delete(conn, key)
+
+        def changed_rows():
+            for _, row in iter_archive_rows(archive_path):
+                record = parse_compound_row(row)
+                if record is not None and compound_key(record) in dirty:
+                    yield row
+
+        counts = self.import_rows(changed_rows(), batch_size) if dirty else \
+            {'rows': 0, 'compounds': 0, 'skipped': 0}
+        removed = manifest.removed_names(dataset, delta['removed'])
+        manifest.commit(dataset, hashes, hasher.names, delta)
+        counts['delta'] = {
+            'added': [hasher.names[key] for key in delta['added']],
+            'changed': [hasher.names[key] for key in delta['changed']],
+            'removed': removed,
+            'unchanged': delta['unchanged']
+        }
+        return counts
+
+    def _delete(self, conn: sqlite3.Connection, key: str) -> None:
+        """Delete the stored compound a manifest key refers to, with its names and herb links."""
+        kind, _, value = key.partition(':')
+        record = {'cid': int(value)} if kind == 'cid' else {kind: value}
+        compound_id = self._find_id(conn, record)
+        if compound_id is None:
+            return
+        for table, column in (('compound_names', 'compound_id'),
+                              ('herb_compounds', 'compound_id'), ('compounds', 'id')):
+            conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (compound_id,))
+
+    def _record(self, compound_id: int) -> Dict[str, Any]:
+        conn = self._connection()
+        cid, inchikey, name, data = conn.execute(
+            "SELECT cid, inchikey, name, data FROM compounds WHERE id = ?", (compound_id,)
+        ).fetchone()
+        record = {'cid': cid, 'inchikey': inchikey, 'name': name, **json.loads(data)}
+        record['synonyms'] = [row[0] for row in conn.execute(
+            "SELECT COALESCE(display, name) FROM compound_names "
+            "WHERE compound_id = ? AND is_synonym = 1",
+            (compound_id,)
+        )]
+        return record
+
+    def _lookup(self, query: str, key) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(query, (key,)).fetchone()
+        self._count(row is not None)
+        return self._record(row[0]) if row else None
+
+    def find_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Find a compound by name or synonym (case-insensitive)."""
+        return self._lookup("SELECT compound_id FROM compound_names WHERE name = ? "
+                            "ORDER BY is_synonym LIMIT 1", _normalize(name))
+
+    def find_by_cid(self, cid: int) -> Optional[Dict[str, Any]]:
+        """Find a compound by PubChem CID."""
+        return self._lookup("SELECT id FROM compounds WHERE cid = ?", int(cid))
+
+    def find_by_inchikey(self, inchikey: str) -> Optional[Dict[str, Any]]:
+        """Find a compound by InChIKey."""
+        return self._lookup("SELECT id FROM compounds WHERE inchikey = ?", inchikey.strip().upper())
+
+    def compounds_for_herb(self, herb_name: str) -> List[Dict[str, Any]]:
+        """Return every compound the dataset lists for a herb."""
+        rows = self._connection().execute(
+            "SELECT compound_id FROM herb_compounds WHERE herb = ? ORDER BY compound_id",
+            (_normalize(herb_name),)
+        ).fetchall()
+        self._count(bool(rows))
+        return [self._record(row[0]) for row in rows]
+
+    def get_cid(self, name: str) -> Optional[int]:
+        """Return the CID for a name or synonym, or None if not stored."""
+        record = self.find_by_name(name)
+        return record['cid'] if record else None
+
+    def get_properties(self, cid: int) -> Optional[Dict[str, Any]]:
+        """Return properties in PubChemService's format, or None if not stored."""
+        record = self.find_by_cid(cid)
+        if record is None:
+            return None
+        return {
+            'cid': record['cid'],
+            'molecular_formula': record.get('molecular_formula'),
+            'molecular_weight': record.get('molecular_weight'),
+            'smiles': record.get('smiles')
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return row counts and lookup hit/miss counters for this process."""
+        conn = self._connection()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        for table in ('compounds', 'compound_names', 'herb_compounds'):
+            stats[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
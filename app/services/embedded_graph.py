@@ -0,0 +1,282 @@
+import json
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class CSRAdjacency:
+    """Edges of one relationship type in one direction.
+
+    Compacted edges live in CSR arrays (``indptr``/``indices``, neighbours
+    sorted per node); new edges go to an append buffer that is merged in
+    once it exceeds ``compact_threshold`` or a quarter of the compacted
+    edges, whichever is larger. Growing the threshold with the graph keeps
+    bulk loads linear-logarithmic instead of rebuilding the arrays every
+    ``compact_threshold`` edges.
+    """
+
+    def __init__(self, compact_threshold: int = 1024):
+        self.compact_threshold = compact_threshold
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int64)
+        self.pending: Dict[int, set] = defaultdict(set)
+        self.pending_count = 0
+
+    def __len__(self) -> int:
+        return len(self.indices) + self.pending_count
+
+    def _row(self, node: int) -> np.ndarray:
+        if node + 1 >= len(self.indptr):
+            return self.indices[:0]
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def has(self, source: int, target: int) -> bool:
+        row = self._row(source)
+        position = np.searchsorted(row, target)
+        return (position < len(row) and row[position] == target) or target in self.pending.get(source, ())
+
+    def add(self, source: int, target: int) -> bool:
+        """Add an edge; return False if it already existed."""
+        if self.has(source, target):
+            return False
+        self.pending[source].add(target)
+        self.pending_count += 1
+        if self.pending_count >= max(self.compact_threshold, len(self.indices) // 4):
+            self.compact()
+        return True
+
+    def neighbors(self, node: int) -> List[int]:
+        """Neighbour ids: compacted ones in id order, then buffered ones."""
+        neighbors = self._row(node).tolist()
+        if node in self.pending:
+            neighbors.extend(sorted(self.pending[node]))
+        return neighbors
+
+    def discard(self, sources: List[int], targets: List[int]) -> int:
+        """Remove edges given as parallel id lists; return how many existed."""
+        self.compact()
+        if not sources or not len(self.indices):
+            return 0
+        all_sources = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        width = int(max(all_sources.max(), self.indices.max(), sources.max(), targets.max())) + 1
+        drop = np.isin(all_sources * width + self.indices, sources * width + targets)
+        if not drop.any():
+            return 0
+        counts = np.bincount(all_sources[~drop], minlength=len(self.indptr) - 1)
+        self.indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.indices = self.indices[~drop]
+        return int(drop.sum())
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All (sources, targets) as parallel arrays."""
+        self.compact()
+        sources = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        return sources, self.indices.copy()
+
+    def compact(self, sources: Optional[np.ndarray] = None,
+                targets: Optional[np.ndarray] = None) -> None:
+        """Merge the append buffer (and any given edges) into the CSR arrays."""
+        if not self.pending_count and sources is None:
+            return
+        old_sources = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        new_pairs = [(s, t) for s, targets_ in self.pending.items() for t in targets_]
+        all_sources = [old_sources, np.array([s for s, _ in new_pairs], dtype=np.int64)]
+        all_targets = [self.indices, np.array([t for _, t in new_pairs], dtype=np.int64)]
+        if sources is not None:
+            all_sources.append(np.asarray(sources, dtype=np.int64))
+            all_targets.append(np.asarray(targets, dtype=np.int64))
+        src = np.concatenate(all_sources)
+        dst = np.concatenate(all_targets)
+
+        order = np.lexsort((dst, src))
+        src, dst = src[order], dst[order]
+        if len(src):
+            keep = np.ones(len(src), dtype=bool)
+            keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+            src, dst = src[keep], dst[keep]
+        counts = np.bincount(src, minlength=int(src.max()) + 1 if len(src) else 0)
+        self.indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.indices = dst
+        self.pending = defaultdict(set)
+        self.pending_count = 0
+
+class EmbeddedGraph:
+    """In-process property graph used when Neo4j is not available.
+
+    Nodes get dense integer ids and are keyed by (label, name), or by
+    (label, cid) for compounds. Each relationship type keeps outgoing and
+    incoming CSRAdjacency arrays, so neighbour lookups in either direction
+    are array slices. The graph can be snapshotted to a JSON file and
+    reloaded on start. It is per process: with several workers, each has
+    its own copy. Removed nodes leave an empty slot so ids stay dense.
+    """
+
+    SNAPSHOT_VERSION = 1
+    KEY_PROPERTY = {'Compound': 'cid'}
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.RLock()
+        self._ids: Dict[Tuple[str, Any], int] = {}
+        self._labels: List[Optional[str]] = []
+        self._properties: List[Dict[str, Any]] = []
+        self._by_label: Dict[str, List[int]] = defaultdict(list)
+        self._out: Dict[str, CSRAdjacency] = {}
+        self._in: Dict[str, CSRAdjacency] = {}
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def batch(self) -> threading.RLock:
+        """Hold (``with graph.batch():``) to apply several writes atomically."""
+        return self._lock
+
+    def _key(self, label: str, properties: Dict[str, Any]) -> Tuple[str, Any]:
+        return (label, properties[self.KEY_PROPERTY.get(label, 'name')])
+
+    def merge_node(self, label: str, properties: Dict[str, Any], replace: bool = False) -> int:
+        """MERGE a node on its key property and SET the rest (or, with replace,
+        SET n = properties); return its id."""
+        with self._lock:
+            key = self._key(label, properties)
+            node = self._ids.get(key)
+            if node is None:
+                node = len(self._labels)
+                self._ids[key] = node
+                self._labels.append(label)
+                self._properties.append({})
+                self._by_label[label].append(node)
+            if replace:
+                self._properties[node] = {}
+            self._properties[node].update(properties)
+            return node
+
+    def merge_edge(self, source: int, relationship: str, target: int) -> bool:
+        """MERGE a relationship; return False if it already existed."""
+        with self._lock:
+            if relationship not in self._out:
+                self._out[relationship] = CSRAdjacency()
+                self._in[relationship] = CSRAdjacency()
+            if not self._out[relationship].add(source, target):
+                return False
+            self._in[relationship].add(target, source)
+            return True
+
+    def remove_edges(self, nodes: List[int], direction: str = 'out') -> int:
+        """Delete every relationship leaving (or entering, or 'both') the nodes."""
+        removed = 0
+        with self._lock:
+            directions = ('out', 'in') if direction == 'both' else (direction,)
+            for side in directions:
+                forward, backward = (self._out, self._in) if side == 'out' else (self._in, self._out)
+                for relationship, adjacency in forward.items():
+                    pairs = [(node, other) for node in nodes for other in adjacency.neighbors(node)]
+                    if not pairs:
+                        continue
+                    sources, targets = [s for s, _ in pairs], [t for _, t in pairs]
+                    removed += adjacency.discard(sources, targets)
+                    backward[relationship].discard(targets, sources)
+        return removed
+
+    def remove_nodes(self, label: str, keys: List[Any]) -> int:
+        """DETACH DELETE nodes by key; return how many existed."""
+        with self._lock:
+            nodes = [self._ids.pop((label, key)) for key in keys if (label, key) in self._ids]
+            if not nodes:
+                return 0
+            self.remove_edges(nodes, 'both')
+            gone = set(nodes)
+            self._by_label[label] = [node for node in self._by_label[label] if node not in gone]
+            for node in nodes:
+                self._labels[node] = None
+                self._properties[node] = {}
+            return len(nodes)
+
+    def find_node(self, label: str, key: Any) -> Optional[int]:
+        """Node id for a label and key value, or None."""
+        return self._ids.get((label, key))
+
+    def node(self, node: int) -> Dict[str, Any]:
+        """Properties of a node (a copy)."""
+        return dict(self._properties[node])
+
+    def label(self, node: int) -> str:
+        return self._labels[node]
+
+    def nodes_with_label(self, label: str) -> List[int]:
+        return list(self._by_label.get(label, ()))
+
+    def relationship_types(self) -> List[str]:
+        return list(self._out)
+
+    def neighbors(self, node: int, relationship: Optional[str] = None,
+                  direction: str = 'out') -> Iterator[Tuple[str, int]]:
+        """Yield (relationship type, neighbour id) for one or all types."""
+        adjacency = self._out if direction == 'out' else self._in
+        with self._lock:
+            types = [relationship] if relationship else list(adjacency)
+            pairs = [(rel_type, neighbor) for rel_type in types if rel_type in adjacency
+                     for neighbor in adjacency[rel_type].neighbors(node)]
+        return iter(pairs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Node and edge counts."""
+        with self._lock:
+            return {
+                'nodes': len(self._ids),
+                'labels': {label: len(nodes) for label, nodes in self._by_label.items()},
+                'relationships': {rel: len(adj) for rel, adj in self._out.items()}
+            }
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write a snapshot atomically (temp file + rename)."""
+        path = path or self.snapshot_path
+        if not path:
+            return
+        with self._lock:
+            snapshot = {
+                'version': self.SNAPSHOT_VERSION,
+                'nodes': [[label, props] for label, props in zip(self._labels, self._properties)],
+                'edges': {}
+            }
+            for relationship, adjacency in self._out.items():
+                sources, targets = adjacency.edges()
+                snapshot['edges'][relationship] = [sources.tolist(), targets.tolist()]
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as handle:
+                json.dump(snapshot, handle, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def load(self, path: str) -> None:
+        """Replace the graph with a snapshot written by save()."""
+        with open(path) as handle:
+            snapshot = json.load(handle)
+        if snapshot.get('version') != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported graph snapshot version in {path}")
+        with self._lock:
+            self._ids, self._labels, self._properties = {}, [], []
+            self._by_label = defaultdict(list)
+            self._out, self._in = {}, {}
+            for label, properties in snapshot['nodes']:
+                if label is None:
+                    # Removed node: keep the slot so edge ids still line up
+                    self._labels.append(None)
+                    self._properties.append({})
+                else:
+                    self.merge_node(label, properties)
+            for relationship, (sources, targets) in snapshot['edges'].items():
+                self._out[relationship] = CSRAdjacency()
+                self._in[relationship] = CSRAdjacency()
+                self._out[relationship].compact(sources, targets)
+                self._in[relationship].compact(targets, sources)
+        logger.info(f"Loaded graph snapshot {path}: {len(self._ids)} nodes")
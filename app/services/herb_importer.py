@@ -0,0 +1,438 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+from app.models.entities import Compound, Herb, Property
+from app.services.import_manifest import EntityHasher, ImportManifest
+from app.services.nlp_service import AyurvedicNLPService
+from app.utils.archive import check_archive, iter_archive_rows, normalize_key
+from app.utils.lru_cache import LRUCache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Dataset column headers (normalized) accepted for each herb field
+HERB_FIELD_ALIASES = {
+    'name': ('herb', 'herbname', 'name', 'commonname', 'englishname', 'plant', 'plantname',
+             'drug', 'drugname'),
+    'scientific_name': ('scientificname', 'botanicalname', 'latinname', 'species', 'binomial'),
+    'sanskrit_name': ('sanskritname', 'sanskrit'),
+    'rasa': ('rasa', 'taste', 'tastes'),
+    'guna': ('guna', 'gunas', 'quality', 'qualities'),
+    'virya': ('virya', 'veerya', 'potency'),
+    'vipaka': ('vipaka', 'postdigestiveeffect', 'postdigestivetaste'),
+    'prabhava': ('prabhava', 'specialaction'),
+    'dosha': ('dosha', 'doshas', 'doshaeffect', 'doshakarma', 'effectondosha'),
+    'uses': ('karma', 'actions', 'action', 'therapeuticactions', 'therapeuticuses', 'uses',
+             'indications', 'pharmacologicalactions'),
+    'compounds': ('compounds', 'compound', 'chemicalconstituents', 'constituents',
+                  'phytochemicals', 'activeconstituents', 'activecompounds',
+                  'chemicalcomposition'),
+    'contraindications': ('contraindications', 'contraindication', 'precautions'),
+    'description': ('description', 'summary', 'notes'),
+}
+
+_ALIAS_TO_FIELD = {alias: field for field, aliases in HERB_FIELD_ALIASES.items() for alias in aliases}
+_LIST_SPLIT_RE = re.compile(r'\s*[,;|]\s*')
+_WORD_RE = re.compile(r'[a-z]+')
+
+# Property types written as graph edges / matched against the NLP term lists
+TERM_PROPERTIES = ('rasa', 'guna', 'virya', 'vipaka')
+TEXT_PROPERTIES = ('dosha', 'prabhava')
+# Herb node properties herb_entry stores as comma-joined value lists
+JOINED_PROPERTIES = ('vipaka',) + TEXT_PROPERTIES
+
+def _split(value: Any) -> List[str]:
+    values = value if isinstance(value, list) else _LIST_SPLIT_RE.split(str(value))
+    return [' '.join(str(v).split()) for v in values if str(v).strip()]
+
+def property_terms() -> Tuple[Dict[str, Dict[str, str]], Dict[str, Dict[str, str]]]:
+    """From the NLP term lists: property type -> alias -> canonical Sanskrit
+    term, and property type -> canonical term -> English term."""
+    nlp = AyurvedicNLPService()
+    tables = {'rasa': nlp.rasa_terms, 'guna': nlp.guna_terms, 'virya': nlp.virya_terms,
+              'vipaka': nlp.rasa_terms}  # vipaka is expressed as a taste
+    terms = {ptype: {alias: canonical for canonical, aliases in table.items() for alias in aliases}
+             for ptype, table in tables.items()}
+    english = {ptype: {canonical: aliases[0] for canonical, aliases in table.items()}
+               for ptype, table in tables.items()}
+    return terms, english
+
+def parse_herb_row(row: Dict[str, Any], terms: Dict[str, Dict[str, str]],
+                   english: Dict[str, Dict[str, str]]) -> Optional[Herb]:
+    """Map a dataset row onto a Herb; None if it names no herb.
+
+    Rasa/guna/virya/vipaka values become Property(name=<canonical Sanskrit
+    term>, value=<English term>, type); terms missing from the NLP lists are
+    kept lowercased under both. Dosha and prabhava descriptions are kept as
+    text properties.
+    """
+    herb = Herb(name='')
+    for key, value in row.items():
+        field = _ALIAS_TO_FIELD.get(normalize_key(key))
+        if field is None or value is None or value == '':
+            continue
+        if field in ('name', 'scientific_name', 'description'):
+            if not getattr(herb, field):
+                setattr(herb, field, ' '.join(str(value).split()))
+        elif field == 'sanskrit_name':
+            herb.properties.append(Property('sanskrit_name', ' '.join(str(value).split()), 'name'))
+        elif field in TERM_PROPERTIES:
+            for item in _split(value):
+                text = item.lower()
+                canonical = terms[field].get(text) or next(
+                    (terms[field][word] for word in _WORD_RE.findall(text) if word in terms[field]),
+                    text
+                )
+                herb.properties.append(Property(canonical, english[field].get(canonical, canonical), field))
+        elif field in TEXT_PROPERTIES:
+            for item in _split(value):
+                herb.properties.append(Property(item.lower(), item.lower(), field))
+        elif field == 'compounds':
+            herb.compounds.extend(Compound(cid='', name=item, molecular_formula='',
+                                           molecular_weight=0.0) for item in _split(value))
+        else:
+            getattr(herb, field).extend(_split(value))
+    if '__group__' in row and not herb.name:
+        herb.name = ' '.join(str(row['__group__']).split())
+    if not herb.name:
+        herb.name = herb.scientific_name or ''
+    return herb if herb.name else None
+
+def merge_herbs(current: Herb, update: Herb) -> Herb:
+    """Combine two records of the same herb (long-format datasets repeat herbs)."""
+    current.scientific_name = current.scientific_name or update.scientific_name
+    current.description = current.description or update.description
+    seen = {(p.type, p.name) for p in current.properties}
+    current.properties.extend(p for p in update.properties if (p.type, p.name) not in seen)
+    names = {c.name.lower() for c in current.compounds}
+    current.compounds.extend(c for c in update.compounds if c.name.lower() not in names)
+    for field in ('uses', 'contraindications'):
+        values = getattr(current, field)
+        values.extend(v for v in getattr(update, field) if v not in values)
+    return current
+
+def herb_properties(herb: Herb) -> Dict[str, Any]:
+    """The herb in knowledge_graph.KNOWLEDGE_GRAPH layout (English terms)."""
+    properties = {}
+    for prop in herb.properties:
+        if prop.type in TERM_PROPERTIES or prop.type in TEXT_PROPERTIES:
+            properties.setdefault(prop.type, []).append(prop.value)
+    if herb.uses:
+        properties['therapeutic_actions'] = list(herb.uses)
+    if herb.compounds:
+        properties['modern_compounds'] = [compound.name.lower() for compound in herb.compounds]
+    if herb.scientific_name:
+        properties['scientific_name'] = herb.scientific_name
+    return properties
+
+def herb_entry(herb: Herb) -> Dict[str, Any]:
+    """KnowledgeGraphService.upsert_analysis entry for a herb.
+
+    Only compounds with a resolved CID are linked (Compound nodes are keyed
+    by CID); the Herb node keeps scalar fields and the vipaka/dosha text.
+    """
+    entry = {'name': herb.name, 'properties': {}, 'rasa': [], 'guna': [], 'virya': [],
+             'compounds': [{'cid': int(c.cid), 'name': c.name} for c in herb.compounds if c.cid]}
+    for prop in herb.properties:
+        if prop.type in ('rasa', 'guna', 'virya'):
+            entry[prop.type].append(prop.name)
+        elif prop.type == 'name':
+            entry['properties'][prop.name] = prop.value
+        else:
+            entry['properties'].setdefault(prop.type, []).append(prop.name)
+    entry['properties'] = {key: ','.join(value) if isinstance(value, list) else value
+                           for key, value in entry['properties'].items()}
+    for field in ('scientific_name', 'description'):
+        if getattr(herb, field):
+            entry['properties'][field] = getattr(herb, field)
+    return entry
+
+def merge_joined_properties(stored: Dict[str, Any], properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Union an entry's comma-joined properties with the stored node's (stored values first)."""
+    merged = dict(properties)
+    for key in JOINED_PROPERTIES:
+        if stored.get(key) and properties.get(key):
+            merged[key] = ','.join(dict.fromkeys(stored[key].split(',') + properties[key].split(',')))
+    return merged
+
+def merge_properties(current: Optional[Dict[str, Any]], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Union list properties into an existing in-memory entry (new values last)."""
+    if not current:
+        return update
+    merged = dict(current)
+    for key, value in update.items():
+        if isinstance(value, list):
+            merged[key] = list(dict.fromkeys(list(current.get(key, [])) + value))
+        else:
+            merged.setdefault(key, value)
+    return merged
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class HerbImporter:
+    """Streams the herb archive into the knowledge graph and in-memory store.
+
+    Rows are read member by member straight from the zip, normalized to
+    Herb models and written in batches of ``batch_size`` herbs through
+    KnowledgeGraphService.upsert_analysis (one UNWIND transaction per batch
+    on Neo4j) and/or ``memory_store.add_herb`` (the knowledge_graph module).
+    Compound names are resolved to CIDs through the offline CompoundStore
+    when one is given.
+
+    After every ``checkpoint_every`` batches the archive position is saved
+    to ``checkpoint_path`` (after the embedded graph snapshot, if any), so a
+    crashed import resumes from the last checkpoint. Upserts are MERGEs, so
+    replaying the rows after it is harmless.
+
+    With an ImportManifest the import is incremental: a first pass hashes
+    each herb's records, and only herbs whose hash changed are parsed and
+    rewritten (replacing their old properties and edges); herbs missing
+    from the archive are removed and tombstoned in the manifest.
+    """
+
+    def __init__(self, kg_service=None, memory_store=None, compound_store=None,
+                 batch_size: int = 500, checkpoint_path: Optional[str] = None,
+                 checkpoint_every: int = 10, manifest: Optional[ImportManifest] = None,
+                 dataset: str = 'herbs'):
+        self.kg_service = kg_service
+        self.memory_store = memory_store
+        self.compound_store = compound_store
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.manifest = manifest
+        self.dataset = dataset
+        self._terms, self._english = property_terms()
+        self._cids = LRUCache(maxsize=100000)
+
+    def _resolve_cids(self, herb: Herb) -> None:
+        if self.compound_store is None:
+            return
+        for compound in herb.compounds:
+            key = compound.name.lower()
+            cid = self._cids.get(key, False)
+            if cid is False:
+                cid = self.compound_store.get_cid(compound.name)
+                self._cids.put(key, cid)
+            if cid:
+                compound.cid = str(cid)
+
+    def _write(self, herbs: List[Herb], replaced: Optional[set] = None,
+               hashes: Optional[Dict[str, str]] = None, only: Optional[set] = None) -> None:
+        """Write a batch. With ``replaced`` (keys already written this run),
+        a herb's first batch replaces what was stored and later ones merge.
+        With ``only``, other herbs go to the memory store alone."""
+        graph_herbs = herbs if only is None else [h for h in herbs if h.name.lower() in only]
+        for herb in graph_herbs:
+            self._resolve_cids(herb)
+        fresh = set()
+        if replaced is not None:
+            fresh = {herb.name.lower() for herb in herbs} - replaced
+            replaced |= fresh
+        if self.kg_service is not None:
+            entries = {True: [], False: []}
+            for herb in graph_herbs:
+                entry = herb_entry(herb)
+                if hashes:
+                    entry['properties']['content_hash'] = hashes[herb.name.lower()]
+                entries[herb.name.lower() in fresh].append(entry)
+            # Rows of a herb can span batches; SET += would overwrite its joined lists
+            stored = self.kg_service.get_herb_properties([entry['name'] for entry in entries[False]])
+            for entry in entries[False]:
+                if entry['name'] in stored:
+                    entry['properties'] = merge_joined_properties(stored[entry['name']],
+                                                                  entry['properties'])
+            self.kg_service.upsert_analysis(entries[True], replace=True)
+            self.kg_service.upsert_analysis(entries[False])
+        if self.memory_store is not None:
+            for herb in herbs:
+                current = None if herb.name.lower() in fresh else \
+                    self.memory_store.get_herb_properties(herb.name)
+                self.memory_store.add_herb(herb.name, merge_properties(current, herb_properties(herb)))
+
+    def _archive_id(self, path: str) -> Dict[str, Any]:
+        stat = os.stat(path)
+        return {'archive': os.path.abspath(path), 'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+    def load_checkpoint(self, path: str) -> Optional[Dict[str, Any]]:
+        """The saved position for this archive, or None (missing or stale)."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        identity = self._archive_id(path)
+        if any(checkpoint.get(key) != value for key, value in identity.items()):
+            logger.warning(f"Ignoring checkpoint for a different archive: {self.checkpoint_path}")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, path: str, position: Dict[str, Any]) -> None:
+        """Persist the graph, then atomically record how far the import got."""
+        if not self.checkpoint_path:
+            return
+        if self.kg_service is not None and self.kg_service.graph is not None:
+            self.kg_service.graph.save()
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as handle:
+                json.dump({**self._archive_id(path), **position}, handle)
+            os.replace(temp_path, self.checkpoint_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _iter_rows(self, path: str, checkpoint: Optional[Dict[str, Any]]
+                   ) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """Yield (member, row number within member, row), skipping checkpointed rows."""
+        member = checkpoint['member'] if checkpoint else None
+        skip = checkpoint['row'] if checkpoint else 0
+        current, index = None, 0
+        for name, row in iter_archive_rows(path, start_member=member):
+            if name != current:
+                current, index = name, 0
+            index += 1
+            if name == member and index <= skip:
+                continue
+            yield name, index, row
+
+    def import_archive(self, path: str, resume: bool = True,
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None
+                       ) -> Dict[str, Any]:
+        """Import every herb record of the archive; return counts and throughput.
+
+        ``progress`` is called with the running stats after each batch. With
+        a manifest only changed herbs are written (see import_changes) and
+        no checkpoint is used: the manifest is committed last, so an
+        interrupted run is finished by running it again.
+        """
+        check_archive(path)
+        if self.manifest is not None:
+            return self.import_changes(path, progress)
+        checkpoint = self.load_checkpoint(path) if resume else None
+        stats = {'rows': 0, 'herbs': 0, 'skipped': 0, 'batches': 0,
+                 'resumed_from': None, 'member': None}
+        if checkpoint:
+            stats['resumed_from'] = {'member': checkpoint['member'], 'row': checkpoint['row']}
+            logger.info(f"Resuming herb import at {checkpoint['member']} row {checkpoint['row']}")
+        start = time.perf_counter()
+        position = self._load(path, self._iter_rows(path, checkpoint), stats, start, progress,
+                              checkpoint=True)
+        if position:
+            self._save_checkpoint(path, {**position, 'complete': True})
+        return self._throughput(stats, start)
+
+    def _load(self, path: str, rows: Iterator[Tuple[str, int, Dict[str, Any]]],
+              stats: Dict[str, Any], start: float,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+              checkpoint: bool = False, only: Optional[set] = None,
+              hashes: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+        """Parse rows into herbs and write them in batches; return the last position.
+
+        ``only`` restricts graph writes to those herb keys, replacing them;
+        the memory store, which only lives as long as this process, still
+        gets every herb.
+        """
+        pending: Dict[str, Herb] = {}
+        replaced = set() if only is not None else None
+        position = None
+
+        def flush():
+            self._write(list(pending.values()), replaced, hashes, only)
+            stats['herbs'] += len(pending) if only is None else len(only.intersection(pending))
+            stats['batches'] += 1
+            pending.clear()
+            if checkpoint and position and stats['batches'] % self.checkpoint_every == 0:
+                self._save_checkpoint(path, position)
+            if progress:
+                progress(self._throughput(stats, start))
+
+        for member, index, row in rows:
+            stats['rows'] += 1
+            stats['member'] = member
+            herb = parse_herb_row(row, self._terms, self._english)
+            if herb is None:
+                stats['skipped'] += 1
+                continue
+            key = herb.name.lower()
+            if only is not None and key not in only and self.memory_store is None:
+                continue
+            pending[key] = merge_herbs(pending[key], herb) if key in pending else herb
+            position = {'member': member, 'row': index}
+            if len(pending) >= self.batch_size:
+                flush()
+        if pending:
+            flush()
+        return position
+
+    def import_changes(self, path: str,
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None
+                       ) -> Dict[str, Any]:
+        """Write only herbs whose records changed since the last committed
+        import, remove herbs that disappeared, and return the delta
+        ('added'/'changed'/'removed' herb names, 'unchanged' count) in stats.
+        A memory store is still given every herb of the archive.
+        """
+        start = time.perf_counter()
+        hasher = EntityHasher()
+        scanned = skipped = 0
+        for _, row in iter_archive_rows(path):
+            scanned += 1
+            herb = parse_herb_row(row, self._terms, self._english)
+            if herb is None:
+                skipped += 1
+                continue
+            hasher.add(herb.name.lower(), herb.name, row)
+        hashes = hasher.hashes()
+        delta = self.manifest.diff(self.dataset, hashes)
+        stats = {'rows': 0, 'herbs': 0, 'skipped': skipped, 'batches': 0,
+                 'resumed_from': None, 'member': None, 'scanned': scanned}
+
+        dirty = set(delta['added']) | set(delta['changed'])
+        if dirty or self.memory_store is not None:
+            self._load(path, self._iter_rows(path, None), stats, start, progress,
+                       only=dirty, hashes=hashes)
+        removed = self.manifest.removed_names(self.dataset, delta['removed'])
+        if removed:
+            if self.kg_service is not None:
+                self.kg_service.remove_herbs(removed)
+            if self.memory_store is not None:
+                for name in removed:
+                    self.memory_store.remove_herb(name)
+        if self.kg_service is not None and self.kg_service.graph is not None and (dirty or removed):
+            self.kg_service.graph.save()
+        self.manifest.commit(self.dataset, hashes, hasher.names, delta)
+
+        stats['delta'] = {
+            'added': [hasher.names[key] for key in delta['added']],
+            'changed': [hasher.names[key] for key in delta['changed']],
+            'removed': removed,
+            'unchanged': delta['unchanged']
+        }
+        return self._throughput(stats, start)
+
+    @staticmethod
+    def _throughput(stats: Dict[str, Any], start: float) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - start
+        return {
+            **stats,
+            'elapsed_s': elapsed,
+            'rows_per_s': stats['rows'] / elapsed if elapsed else 0.0,
+            'herbs_per_s': stats['herbs'] / elapsed if elapsed else 0.0,
+            'peak_rss_mb': peak_rss_mb()
+        }
@@ -0,0 +1,181 @@
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import logging
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Weight of one shared value of each feature type; a shared compound says
+# more about two herbs than a shared taste
+DEFAULT_FEATURE_WEIGHTS = {
+    'modern_compounds': 3.0,
+    'therapeutic_actions': 2.0,
+    'dosha': 1.5,
+    'rasa': 1.0,
+    'guna': 1.0,
+    'vipaka': 1.0,
+    'virya': 1.0
+}
+
+class HerbSimilarityEngine:
+    """Top-k herb similarity over sparse binary property features.
+
+    Each herb is a row of a CSR matrix whose columns are (feature type,
+    value) pairs, weighted by feature type. Scores for a block of herbs come
+    from a single sparse x dense product against the matrix, and the top k
+    of each row are selected with argpartition rather than a full sort.
+
+    Herbs are featurized once, when upserted; the matrices are reassembled
+    from the cached rows on the next query after a change, so a run of
+    upserts costs one rebuild. Removed herbs are dropped at that point.
+    """
+
+    METRICS = ('jaccard', 'cosine')
+
+    def __init__(self, weights: Optional[Mapping[str, float]] = None):
+        self.weights = dict(DEFAULT_FEATURE_WEIGHTS if weights is None else weights)
+        self._lock = threading.RLock()
+        self._columns: Dict[Tuple[str, str], int] = {}
+        self._column_weights: List[float] = []
+        self._row_of: Dict[str, int] = {}
+        self._herbs: List[Optional[str]] = []
+        self._row_columns: List[np.ndarray] = []
+        self._dirty = True
+        self._stats = {'upserts': 0, 'removals': 0, 'rebuilds': 0, 'queries': 0}
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, herb: str) -> bool:
+        return herb in self._row_of
+
+    def _column(self, feature_type: str, value: str) -> int:
+        key = (feature_type, value)
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = len(self._column_weights)
+            self._column_weights.append(self.weights.get(feature_type, 1.0))
+        return column
+
+    def upsert(self, herb: str, features: Mapping[str, Iterable[str]]) -> None:
+        """Add or replace a herb given its feature type -> values mapping."""
+        with self._lock:
+            columns = np.unique(np.array([
+                self._column(feature_type, value)
+                for feature_type, values in features.items() if feature_type in self.weights
+                for value in values
+            ], dtype=np.int64))
+            row = self._row_of.get(herb)
+            if row is None:
+                self._row_of[herb] = len(self._herbs)
+                self._herbs.append(herb)
+                self._row_columns.append(columns)
+            else:
+                self._row_columns[row] = columns
+            self._dirty = True
+            self._stats['upserts'] += 1
+
+    def remove(self, herb: str) -> bool:
+        """Drop a herb; return False if it was not indexed."""
+        with self._lock:
+            row = self._row_of.pop(herb, None)
+            if row is None:
+                return False
+            self._herbs[row] = None
+            self._row_columns[row] = self._row_columns[row][:0]
+            self._dirty = True
+            self._stats['removals'] += 1
+            return True
+
+    def _refresh(self) -> None:
+        """Reassemble the matrices from the cached rows (caller holds the lock)."""
+        if not self._dirty:
+            return
+        if len(self._row_of) < len(self._herbs):
+            keep = [row for row, herb in enumerate(self._herbs) if herb is not None]
+            self._herbs = [self._herbs[row] for row in keep]
+            self._row_columns = [self._row_columns[row] for row in keep]
+            self._row_of = {herb: row for row, herb in enumerate(self._herbs)}
+
+        lengths = np.fromiter((len(columns) for columns in self._row_columns), dtype=np.int64,
+                              count=len(self._row_columns))
+        indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        indices = (np.concatenate(self._row_columns) if self._row_columns
+                   else np.zeros(0, dtype=np.int64))
+        shape = (len(self._herbs), len(self._column_weights))
+        self._matrix = sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=shape)
+        self._weights = np.asarray(self._column_weights, dtype=np.float64)
+        # Weighted feature mass per herb: |A|_w for Jaccard, ||A||^2 for cosine
+        self._mass = self._matrix @ self._weights
+        self._squared_mass = self._matrix @ (self._weights ** 2)
+        self._dirty = False
+        self._stats['rebuilds'] += 1
+
+    def _score_block(self, rows: np.ndarray, metric: str) -> np.ndarray:
+        """Similarity of each given row to every herb, as a dense (rows x herbs) array.
+
+        Herbs sharing nothing with a row, and the row itself, score -inf.
+        """
+        weights = self._weights if metric == 'jaccard' else self._weights ** 2
+        queries = self._matrix[rows].multiply(weights).T.toarray()
+        shared = np.asarray(self._matrix @ queries).T
+        if metric == 'jaccard':
+            mass = self._mass
+            denominator = mass[rows, None] + mass[None, :] - shared
+        else:
+            mass = self._squared_mass
+            denominator = np.sqrt(mass[rows, None] * mass[None, :])
+        scores = np.full(shared.shape, -np.inf)
+        np.divide(shared, denominator, out=scores, where=shared > 0)
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+        """Best k (herb, score) pairs per row; ties keep insertion order."""
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in scores]
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, candidates in zip(scores, best):
+            values = row_scores[candidates]
+            order = np.lexsort((candidates, -values))
+            results.append([(self._herbs[other], float(value))
+                            for other, value in zip(candidates[order], values[order])
+                            if value > -np.inf])
+        return results
+
+    def most_similar(self, herb: str, k: int = 10,
+                     metric: str = 'jaccard') -> List[Tuple[str, float]]:
+        """The k herbs most similar to one herb, as (herb, score) pairs."""
+        return self.most_similar_many([herb], k, metric).get(herb, [])
+
+    def most_similar_many(self, herbs: Iterable[str], k: int = 10, metric: str = 'jaccard',
+                          block_size: int = 256) -> Dict[str, List[Tuple[str, float]]]:
+        """Top-k similar herbs for many herbs, scored in blocks of rows.
+
+        Unknown herbs are left out of the result.
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown similarity metric {metric!r}; use one of {self.METRICS}")
+        with self._lock:
+            self._refresh()
+            self._stats['queries'] += 1
+            rows = np.array([self._row_of[herb] for herb in herbs if herb in self._row_of],
+                            dtype=np.int64)
+            results = {}
+            for start in range(0, len(rows), block_size):
+                block = rows[start:start + block_size]
+                top = self._top_k(self._score_block(block, metric), k)
+                results.update(zip((self._herbs[row] for row in block), top))
+            return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Herb and feature counts plus rebuild/query counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['herbs'] = len(self._row_of)
+            stats['features'] = len(self._column_weights)
+            stats['nonzeros'] = int(sum(len(columns) for columns in self._row_columns))
+        return stats
@@ -0,0 +1,102 @@
+from typing import Dict, List, Sequence, Tuple
+import logging
+import numpy as np
+from app.services.rule_store import RuleStore, normalize_key
+from app.utils.lexicon import LexiconMatcher
+
+logger = logging.getLogger(__name__)
+
+# Score thresholds for the confidence label kept alongside the number
+CONFIDENCE_LABELS = ((0.75, 'high'), (0.4, 'medium'), (0.0, 'low'))
+
+# Share of the gap between a hypothesis' prior and 1 that full compound
+# evidence for its predicted bioactivities can close
+EVIDENCE_WEIGHT = 0.6
+
+# Rule tables whose terms predict bioactivities ('likely_properties'), and
+# the table linking bioactivities to the compounds that evidence them
+PROPERTY_TABLES = ('property_bioactivity', 'guna_bioactivity')
+EVIDENCE_TABLE = 'therapeutic_correlations'
+
+def confidence_label(score: float) -> str:
+    """'high', 'medium' or 'low' for a numeric confidence."""
+    for threshold, label in CONFIDENCE_LABELS:
+        if score >= threshold:
+            return label
+    return CONFIDENCE_LABELS[-1][1]
+
+class ConfidenceModel:
+    """Numeric hypothesis confidence from rule priors and compound evidence.
+
+    Compiled from a rule store into two matrices over the bioactivity
+    vocabulary: a weight matrix with one row per property term (rasa, guna,
+    virya) spreading unit weight over the bioactivities it predicts, and an
+    evidence matrix with one row per known compound marking the
+    bioactivities it supports. A herb's evidence vector is the (clipped)
+    sum of the evidence rows of compounds found among its compounds, and a
+    hypothesis scores
+
+        prior + (1 - prior) * EVIDENCE_WEIGHT * (weights[row] . evidence[herb])
+
+    Row 0 is all zeros, for hypotheses that predict no bioactivity.
+    """
+
+    def __init__(self, rules: RuleStore):
+        self.version = rules.version
+        columns: Dict[str, int] = {}
+        self._rows: Dict[Tuple[str, str], int] = {}
+        weight_rows: List[Dict[int, float]] = [{}]
+        for table in PROPERTY_TABLES:
+            for term, rule in rules.items(table):
+                predicted = [normalize_key(b) for b in rule.get('likely_properties', [])]
+                if not predicted:
+                    continue
+                self._rows[(table, term)] = len(weight_rows)
+                weight_rows.append({columns.setdefault(b, len(columns)): 1.0 / len(predicted)
+                                    for b in predicted})
+
+        self._matcher = LexiconMatcher()
+        compounds: Dict[str, int] = {}
+        evidence_cells: List[Tuple[int, int]] = []
+        for action, rule in rules.items(EVIDENCE_TABLE):
+            column = columns.setdefault(action, len(columns))
+            for compound in rule.get('modern_compounds', []):
+                key = normalize_key(compound)
+                if key not in compounds:
+                    compounds[key] = len(compounds)
+                    self._matcher.add(key, key)
+                evidence_cells.append((compounds[key], column))
+        self._matcher.build()
+        self._compounds = compounds
+
+        self.bioactivities = list(columns)
+        self.weights = np.zeros((len(weight_rows), len(columns)))
+        for row, cells in enumerate(weight_rows):
+            for column, weight in cells.items():
+                self.weights[row, column] = weight
+        self.evidence_matrix = np.zeros((len(compounds), len(columns)))
+        for compound, column in evidence_cells:
+            self.evidence_matrix[compound, column] = 1.0
+
+    def row(self, table: str, term: str) -> int:
+        """Weight row of a property term (0 if it predicts nothing)."""
+        return self._rows.get((table, normalize_key(term)), 0)
+
+    def evidence(self, compound_texts: Sequence[Sequence[str]]) -> np.ndarray:
+        """Per-herb bioactivity evidence in [0, 1], from each herb's compound texts."""
+        presence = np.zeros((len(compound_texts), len(self._compounds)))
+        for herb, texts in enumerate(compound_texts):
+            for text in texts:
+                for match in self._matcher.find_all(text):
+                    presence[herb, self._compounds[match.canonical]] = 1.0
+        return np.minimum(presence @ self.evidence_matrix, 1.0)
+
+    def score(self, priors: np.ndarray, rows: np.ndarray, herbs: np.ndarray,
+              evidence: np.ndarray) -> np.ndarray:
+        """Confidence of every candidate hypothesis in one pass.
+
+        ``priors``, ``rows`` and ``herbs`` give each candidate's prior, weight
+        row and the index of its herb in ``evidence``.
+        """
+        support = np.einsum('ij,ij->i', self.weights[rows], evidence[herbs])
+        return np.clip(priors + (1.0 - priors) * EVIDENCE_WEIGHT * support, 0.0, 1.0)
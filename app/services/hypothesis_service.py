@@ -1,189 +1,375 @@
-from typing import List, Dict, Any
+from itertools import combinations as herb_pairs
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Tuple
 import logging
+import numpy as np
+from app.services.hypothesis_scoring import ConfidenceModel, confidence_label
+from app.services.rule_store import RuleStore, get_rule_store, normalize_key
+from app.utils.combinations import linked_combinations
+from app.utils.lru_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
+# Confidence of each kind of hypothesis before compound evidence; a rule
+# may set its own 'prior'
+DEFAULT_PRIORS = {
+    'property': 0.5,
+    'phytochemical': 0.8,
+    'synergy': 0.9,
+    'generic_synergy': 0.5,
+    # Formulation pairs, by the rule linking them: a herb synergy, or a
+    # compound synergy split across the two herbs
+    'herb_pair': 0.9,
+    'compound_pair': 0.8
+}
+
+# Each herb a formulation combination adds beyond a pair scales the prior of
+# its weakest supporting pair by this factor
+COMBINATION_DECAY = 0.8
+
+class Candidate(NamedTuple):
+    """A hypothesis before scoring; the payload is only built if it is kept."""
+    kind: str
+    label: str
+    rule: Optional[Dict[str, Any]]
+    prior: float
+    row: int
+    compounds: Tuple[str, ...]
+
 class HypothesisEngine:
-    def __init__(self):
-        """Initialize rule-based hypothesis engine."""
-        self._init_rules()
-    
-    def _init_rules(self):
-        """Define simple correlation rules."""
-        self.ayurveda_modern_mapping = {
-            'tikta': {  # Bitter taste
-                'likely_properties': ['anti-inflammatory', 'antimicrobial'],
-                'mechanism': 'Bitter compounds often contain alkaloids and polyphenols'
-            },
-            'ushna': {  # Heating potency
-                'likely_properties': ['metabolism-enhancing', 'circulation-improving'],
-                'mechanism': 'Heating herbs typically contain thermogenic compounds'
-            },
-            'kashaya': {  # Astringent taste
-                'likely_properties': ['antioxidant', 'wound-healing'],
-                'mechanism': 'Astringent taste indicates presence of tannins'
-            },
-            'madhura': {  # Sweet taste
-                'likely_properties': ['nutritive', 'tonic'],
-                'mechanism': 'Sweet compounds often have nutritive and tonic properties'
-            },
-            'katu': {  # Pungent taste
-                'likely_properties': ['digestive', 'antimicrobial'],
-                'mechanism': 'Pungent compounds often have digestive and antimicrobial properties'
-            },
-            'amla': {  # Sour taste
-                'likely_properties': ['antioxidant', 'digestive'],
-                'mechanism': 'Sour compounds often contain organic acids with antioxidant properties'
-            }
-        }
+    def __init__(self, rule_store: Optional[RuleStore] = None, cache_size: int = 1024):
+        """Initialize rule-based hypothesis engine on a compiled rule store."""
+        self.rules = rule_store or get_rule_store()
+        self.cache = LRUCache(cache_size)
+        self.model = ConfidenceModel(self.rules)
+        self._cache_version = self.rules.version
+        self._rule_invalidations = 0
+    
+    @staticmethod
+    def _freeze(value: Any) -> Any:
+        """Hashable form of a property value (lists become tuples)."""
+        if isinstance(value, (list, tuple)):
+            return tuple(value)
+        return value
+    
+    @staticmethod
+    def _compound_key(compound: Dict[str, Any]) -> Tuple[str, str, str]:
+        """What _candidates reads of a compound: CID, normalized name and formula as shown."""
+        return (str(compound.get('cid') or ''), normalize_key(compound.get('name') or ''),
+                str(compound.get('molecular_formula', 'Unknown')))
+    
+    def fingerprint(self, herb_data: Dict[str, Any],
+                    compound_data: List[Dict[str, Any]]) -> Tuple:
+        """Cache key for one herb: rule version, rasa/guna/virya and its sorted compound keys.
         
-        self.guna_modern_mapping = {
-            'guru': {  # Heavy quality
-                'likely_properties': ['nourishing', 'grounding'],
-                'mechanism': 'Heavy compounds often have nutritive and grounding effects'
-            },
-            'laghu': {  # Light quality
-                'likely_properties': ['digestive', 'metabolic'],
-                'mechanism': 'Light compounds often enhance digestion and metabolism'
-            },
-            'snigdha': {  # Oily quality
-                'likely_properties': ['lubricating', 'nourishing'],
-                'mechanism': 'Oily compounds often provide lubrication and nourishment'
-            },
-            'ruksha': {  # Dry quality
-                'likely_properties': ['astringent', 'absorbing'],
-                'mechanism': 'Dry compounds often have astringent and absorbing properties'
-            },
-            'tiksna': {  # Sharp quality
-                'likely_properties': ['penetrating', 'stimulating'],
-                'mechanism': 'Sharp compounds often have penetrating and stimulating effects'
-            },
-            'manda': {  # Dull quality
-                'likely_properties': ['calming', 'soothing'],
-                'mechanism': 'Dull compounds often have calming and soothing effects'
-            }
-        }
+        Compounds are keyed on everything rule matching and the payload
+        read (CID, name, formula), and output does not depend on their order.
+        """
+        return (
+            self.rules.version,
+            self._freeze(herb_data.get('rasa', [])),
+            self._freeze(herb_data.get('guna', [])),
+            self._freeze(herb_data.get('virya', 'unknown')),
+            tuple(sorted(self._compound_key(c) for c in compound_data))
+        )
+    
+    def _sync_rules(self) -> None:
+        """Drop cached hypotheses and recompile scoring after a rule reload."""
+        if self.rules.version != self._cache_version:
+            self.cache.clear()
+            self.model = ConfidenceModel(self.rules)
+            self._cache_version = self.rules.version
+            self._rule_invalidations += 1
     
     def generate_hypotheses(self, herb_data: Dict[str, Any],
-                           compound_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate hypotheses linking Ayurvedic properties to compounds."""
-        hypotheses = []
+                           compound_data: List[Dict[str, Any]],
+                           min_confidence: float = 0.0,
+                           top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Generate hypotheses linking Ayurvedic properties to compounds.
+        
+        Returned best first, each with a numeric ``confidence_score`` and its
+        ``confidence`` label; see generate_hypotheses_batch.
+        """
+        return self.generate_hypotheses_batch([(herb_data, compound_data)],
+                                              min_confidence, top_k)[0]
+    
+    def generate_hypotheses_batch(self, items: Sequence[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                                  min_confidence: float = 0.0,
+                                  top_k: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """Hypotheses for many (herb, compounds) pairs, scored together.
+        
+        Candidates of every herb not already cached are scored in a single
+        ConfidenceModel pass. Scored candidates are memoized per
+        fingerprint(), so herbs with the same properties and compounds share
+        an entry; payloads are built per call, and only for hypotheses scoring
+        at least ``min_confidence`` within the first ``top_k``.
+        """
+        self._sync_rules()
+        keys = [self.fingerprint(herb, compounds) for herb, compounds in items]
+        scored = [self.cache.get(key) for key in keys]
+        
+        missing: Dict[Tuple, List[int]] = {}
+        for index, entry in enumerate(scored):
+            if entry is None:
+                missing.setdefault(keys[index], []).append(index)
+        if missing:
+            firsts = [indexes[0] for indexes in missing.values()]
+            for (key, indexes), entry in zip(missing.items(),
+                                             self._score_candidates([items[i] for i in firsts])):
+                self.cache.put(key, entry)
+                for index in indexes:
+                    scored[index] = entry
+        
+        return [self._payloads(herb.get('name', 'Unknown'), entry, min_confidence, top_k)
+                for (herb, _), entry in zip(items, scored)]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hypothesis cache counters plus the rule version it is valid for."""
+        stats = self.cache.stats()
+        stats['rule_version'] = self._cache_version
+        stats['rule_invalidations'] = self._rule_invalidations
+        return stats
+    
+    def _prior(self, kind: str, rule: Optional[Dict[str, Any]] = None) -> float:
+        return float((rule or {}).get('prior', DEFAULT_PRIORS[kind]))
+    
+    def _candidates(self, herb_data: Dict[str, Any],
+                    compound_data: List[Dict[str, Any]]) -> List[Candidate]:
+        """Apply the rule tables to one herb and its compounds."""
+        candidates = []
         
-        herb_name = herb_data.get('name', 'Unknown')
         rasas = herb_data.get('rasa', [])
         gunas = herb_data.get('guna', [])
         virya = herb_data.get('virya', 'unknown')
         
-        # Generate hypotheses based on rasa
-        for rasa in rasas:
-            if rasa in self.ayurveda_modern_mapping:
-                mapping = self.ayurveda_modern_mapping[rasa]
-                
-                hypothesis = {
-                    'herb': herb_name,
-                    'ayurvedic_property': f"Rasa: {rasa}",
-                    'predicted_bioactivity': mapping['likely_properties'],
-                    'mechanism': mapping['mechanism'],
-                    'confidence': 'medium',
-                    'compounds_found': len(compound_data)
-                }
-                hypotheses.append(hypothesis)
-        
-        # Generate hypotheses based on guna
-        for guna in gunas:
-            if guna in self.guna_modern_mapping:
-                mapping = self.guna_modern_mapping[guna]
-                
-                hypothesis = {
-                    'herb': herb_name,
-                    'ayurvedic_property': f"Guna: {guna}",
-                    'predicted_bioactivity': mapping['likely_properties'],
-                    'mechanism': mapping['mechanism'],
-                    'confidence': 'medium',
-                    'compounds_found': len(compound_data)
-                }
-                hypotheses.append(hypothesis)
-        
-        # Generate hypothesis based on virya
-        if virya in self.ayurveda_modern_mapping:
-            mapping = self.ayurveda_modern_mapping[virya]
-            
+        # Hypotheses based on rasa, guna and virya
+        properties = ([('property_bioactivity', f"Rasa: {rasa}", rasa) for rasa in rasas] +
+                      [('guna_bioactivity', f"Guna: {guna}", guna) for guna in gunas] +
+                      [('property_bioactivity', f"Virya: {virya}", virya)])
+        for table, label, term in properties:
+            mapping = self.rules.get(table, term)
+            if mapping:
+                candidates.append(Candidate('property', label, mapping, self._prior('property', mapping),
+                                            self.model.row(table, term), ()))
+        
+        # Add compound-specific insights, sampled in fingerprint order
+        sample = tuple(c.get('molecular_formula', 'Unknown')
+                       for c in sorted(compound_data, key=self._compound_key)[:3])
+        if compound_data:
+            candidates.append(Candidate('phytochemical', 'phytochemical_analysis', None,
+                                        self._prior('phytochemical'), 0, sample))
+        
+        # Synergy between the herb's own compounds
+        if len(compound_data) > 1:
+            known = self.rules.find_pairs('compound_synergies', self._compound_texts(compound_data))
+            if known:
+                combo, synergy_info = known[0]
+                candidates.append(Candidate('synergy', 'synergy_analysis', synergy_info,
+                                            self._prior('synergy', synergy_info), 0, tuple(combo)))
+            else:
+                candidates.append(Candidate('generic_synergy', 'synergy_analysis', None,
+                                            self._prior('generic_synergy'), 0, sample))
+        
+        return candidates
+    
+    def _score_candidates(self, items: Sequence[Tuple[Dict[str, Any], List[Dict[str, Any]]]]
+                          ) -> List[Tuple[int, Tuple[Tuple[Candidate, float], ...]]]:
+        """Score every candidate of every item at once; (compound count, sorted candidates) per item."""
+        per_item = [self._candidates(herb, compounds) for herb, compounds in items]
+        flat = [candidate for candidates in per_item for candidate in candidates]
+        herbs = np.repeat(np.arange(len(items)), [len(candidates) for candidates in per_item])
+        evidence = self.model.evidence([self._compound_texts(compounds) for _, compounds in items])
+        scores = self.model.score(
+            np.array([candidate.prior for candidate in flat], dtype=np.float64),
+            np.array([candidate.row for candidate in flat], dtype=np.int64),
+            herbs,
+            evidence
+        )
+        
+        entries = []
+        start = 0
+        for (_, compounds), candidates in zip(items, per_item):
+            item_scores = scores[start:start + len(candidates)]
+            start += len(candidates)
+            order = np.argsort(-item_scores, kind='stable')
+            entries.append((len(compounds), tuple(
+                (candidates[i], round(float(item_scores[i]), 4)) for i in order
+            )))
+        return entries
+    
+    def _payloads(self, herb_name: str, entry: Tuple[int, Tuple[Tuple[Candidate, float], ...]],
+                  min_confidence: float, top_k: Optional[int]) -> List[Dict[str, Any]]:
+        """Hypothesis dicts for the kept candidates of one scored entry."""
+        compound_count, scored = entry
+        hypotheses = []
+        for candidate, score in scored:
+            if score < min_confidence or (top_k is not None and len(hypotheses) >= top_k):
+                break
+            hypotheses.append(self._payload(herb_name, candidate, score, compound_count))
+        return hypotheses
+    
+    @staticmethod
+    def _payload(herb_name: str, candidate: Candidate, score: float,
+                 compound_count: int) -> Dict[str, Any]:
+        """Response dict of one scored hypothesis."""
+        if candidate.kind == 'property':
             hypothesis = {
                 'herb': herb_name,
-                'ayurvedic_property': f"Virya: {virya}",
-                'predicted_bioactivity': mapping['likely_properties'],
-                'mechanism': mapping['mechanism'],
-                'confidence': 'medium',
-                'compounds_found': len(compound_data)
+                'ayurvedic_property': candidate.label,
+                'predicted_bioactivity': candidate.rule['likely_properties'],
+                'mechanism': candidate.rule['mechanism'],
+                'compounds_found': compound_count
             }
-            hypotheses.append(hypothesis)
-        
-        # Add compound-specific insights
-        if compound_data:
+        elif candidate.kind == 'phytochemical':
             hypothesis = {
                 'herb': herb_name,
                 'type': 'phytochemical_analysis',
-                'message': f"Identified {len(compound_data)} bioactive compounds",
-                'compounds': [c.get('molecular_formula', 'Unknown') 
-                            for c in compound_data[:3]],
-                'confidence': 'high'
+                'message': f"Identified {compound_count} bioactive compounds",
+                'compounds': list(candidate.compounds)
+            }
+        elif candidate.kind == 'synergy':
+            hypothesis = {
+                'herb': herb_name,
+                'type': 'synergy_analysis',
+                'title': 'Compound Synergy Identified',
+                'compounds': list(candidate.compounds),
+                'mechanism': candidate.rule['mechanism'],
+                'evidence': candidate.rule['evidence'],
+                'clinical_significance': candidate.rule['clinical_significance']
             }
-            hypotheses.append(hypothesis)
+        else:
+            hypothesis = {
+                'herb': herb_name,
+                'type': 'synergy_analysis',
+                'title': 'Potential Compound Synergy',
+                'message': "Multiple bioactive compounds identified that may work synergistically",
+                'compounds': list(candidate.compounds)
+            }
+        hypothesis['confidence'] = confidence_label(score)
+        hypothesis['confidence_score'] = score
+        return hypothesis
+    
+    @staticmethod
+    def _compound_texts(compound_data: List[Dict[str, Any]]) -> List[str]:
+        """Names and formulas of compounds, for matching against rule terms."""
+        return [text for c in compound_data
+                for text in (c.get('name'), c.get('molecular_formula')) if text]
+    
+    def _formulation_links(self, herbs: List[str],
+                           compound_data: Dict[str, List[Dict[str, Any]]]
+                           ) -> Dict[Tuple[int, int], List[Tuple[float, Dict[str, Any]]]]:
+        """Known synergies, with their priors, between herb positions (i < j) of a formulation."""
+        links: Dict[Tuple[int, int], List[Tuple[float, Dict[str, Any]]]] = {}
         
-        # Generate synergy hypotheses if multiple herbs
-        if len(compound_data) > 1:
-            synergy_hypothesis = self._generate_synergy_hypothesis(herb_name, compound_data)
-            if synergy_hypothesis:
-                hypotheses.append(synergy_hypothesis)
+        # Known herb pairs, looked up through the partner index
+        position = {}
+        for i, herb in enumerate(herbs):
+            position.setdefault(normalize_key(herb), i)
+        for i, herb in enumerate(herbs):
+            for partner in self.rules.partners('herb_synergies', herb):
+                j = position.get(partner)
+                if j is not None and j > i:
+                    synergy = self.rules.pair('herb_synergies', herb, partner)
+                    links.setdefault((i, j), []).append((self._prior('herb_pair', synergy), {
+                        'basis': 'herb',
+                        'mechanism': synergy['mechanism'],
+                        'evidence': synergy['evidence'],
+                        'clinical_significance': synergy['clinical_significance']
+                    }))
         
-        return hypotheses
+        # Known compound pairs split across two herbs
+        terms = [sorted(self.rules.find_terms('compound_synergies',
+                                              self._compound_texts(compound_data.get(herb, []))))
+                 for herb in herbs]
+        holders: Dict[str, List[int]] = {}
+        for i, found in enumerate(terms):
+            for term in found:
+                holders.setdefault(term, []).append(i)
+        for i, found in enumerate(terms):
+            for term in found:
+                for partner in self.rules.partners('compound_synergies', term):
+                    for j in holders.get(partner, ()):
+                        if j > i:
+                            synergy = self.rules.pair('compound_synergies', term, partner)
+                            links.setdefault((i, j), []).append((self._prior('compound_pair', synergy), {
+                                'basis': 'compound',
+                                'compounds': [term, partner],
+                                'mechanism': synergy['mechanism'],
+                                'evidence': synergy['evidence'],
+                                'clinical_significance': synergy['clinical_significance']
+                            }))
+        return links
     
-    def _generate_synergy_hypothesis(self, herb_name: str, compound_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Generate synergy hypothesis for multiple compounds."""
-        if len(compound_data) < 2:
-            return None
-        
-        # Known synergistic combinations
-        known_synergies = {
-            ('curcumin', 'piperine'): {
-                'mechanism': 'Piperine enhances curcumin bioavailability by inhibiting glucuronidation',
-                'evidence': 'Piperine increases curcumin absorption by up to 2000%',
-                'clinical_significance': 'Enhanced anti-inflammatory and antioxidant effects'
-            },
-            ('gingerol', 'allicin'): {
-                'mechanism': 'Combined anti-inflammatory and cardiovascular protective effects',
-                'evidence': 'Synergistic reduction in inflammatory markers',
-                'clinical_significance': 'Enhanced cardiovascular and immune system support'
-            },
-            ('withanolides', 'bacosides'): {
-                'mechanism': 'Complementary adaptogenic and neuroprotective effects',
-                'evidence': 'Enhanced stress reduction and cognitive function',
-                'clinical_significance': 'Improved mental clarity and stress resilience'
-            }
-        }
+    def generate_formulation_hypotheses(self, herbs: List[str],
+                                        compound_data: Dict[str, List[Dict[str, Any]]],
+                                        max_combination_size: int = 3,
+                                        max_combinations: int = 200,
+                                        min_confidence: float = 0.0,
+                                        top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Find synergies between the herbs of one formulation.
+        
+        Two herbs are linked by a known herb synergy, or by a known compound
+        synergy with one compound in each. Larger combinations are groups of
+        up to ``max_combination_size`` herbs that are all pairwise linked,
+        grown with Apriori pruning and capped at ``max_combinations`` per
+        size, so 30-herb formulas stay cheap.
+        
+        Pairs and combinations are scored together in one ConfidenceModel
+        pass. A pair's prior is that of its strongest rule ('herb_pair' or
+        'compound_pair', or the rule's own 'prior'); a combination's is its
+        weakest pair's, times COMBINATION_DECAY per herb beyond two. Neither
+        predicts bioactivities, so the score is the prior. Each list comes
+        back best first, filtered by ``min_confidence`` and ``top_k`` like
+        the per-herb hypotheses.
+        """
+        self._sync_rules()
+        herbs = list(dict.fromkeys(herbs))
+        links = self._formulation_links(herbs, compound_data)
+        
+        pair_keys = sorted(links)
+        pair_priors = {key: max(prior for prior, _ in links[key]) for key in pair_keys}
+        groups, truncated = linked_combinations(links, max_combination_size, max_combinations)
+        priors = [pair_priors[key] for key in pair_keys] + [
+            min(pair_priors[pair] for pair in herb_pairs(group, 2)) * COMBINATION_DECAY ** (len(group) - 2)
+            for group in groups
+        ]
+        scores = self.model.score(
+            np.array(priors, dtype=np.float64),
+            np.zeros(len(priors), dtype=np.int64),
+            np.zeros(len(priors), dtype=np.int64),
+            np.zeros((1, len(self.model.bioactivities)))
+        )
+        
+        pairs = [({
+            'herbs': [herbs[i], herbs[j]],
+            'type': 'formulation_synergy',
+            'synergies': [evidence for _, evidence in links[(i, j)]]
+        }, score) for (i, j), score in zip(pair_keys, scores[:len(pair_keys)])]
+        combinations = [({
+            'herbs': [herbs[i] for i in group],
+            'type': 'formulation_combination',
+            'size': len(group),
+            'supporting_pairs': len(group) * (len(group) - 1) // 2
+        }, score) for group, score in zip(groups, scores[len(pair_keys):])]
         
-        # Check for known synergies
-        compound_names = [c.get('molecular_formula', '').lower() for c in compound_data]
-        
-        for combo, synergy_info in known_synergies.items():
-            if all(any(comp in name for name in compound_names) for comp in combo):
-                return {
-                    'herb': herb_name,
-                    'type': 'synergy_analysis',
-                    'title': 'Compound Synergy Identified',
-                    'compounds': list(combo),
-                    'mechanism': synergy_info['mechanism'],
-                    'evidence': synergy_info['evidence'],
-                    'clinical_significance': synergy_info['clinical_significance'],
-                    'confidence': 'high'
-                }
-        
-        # Generic synergy hypothesis
         return {
-            'herb': herb_name,
-            'type': 'synergy_analysis',
-            'title': 'Potential Compound Synergy',
-            'message': f"Multiple bioactive compounds identified that may work synergistically",
-            'compounds': [c.get('molecular_formula', 'Unknown') for c in compound_data[:3]],
-            'confidence': 'medium'
+            'herbs': herbs,
+            'pairs': self._ranked(pairs, min_confidence, top_k),
+            'combinations': self._ranked(combinations, min_confidence, top_k),
+            'truncated': truncated
         }
+    
+    @staticmethod
+    def _ranked(scored: List[Tuple[Dict[str, Any], float]], min_confidence: float,
+                top_k: Optional[int]) -> List[Dict[str, Any]]:
+        """Scored hypotheses best first, with confidence fields, after the filters."""
+        order = np.argsort(-np.array([score for _, score in scored], dtype=np.float64), kind='stable')
+        ranked = []
+        for index in order:
+            hypothesis, score = scored[index]
+            score = round(float(score), 4)
+            if score < min_confidence or (top_k is not None and len(ranked) >= top_k):
+                break
+            hypothesis['confidence'] = confidence_label(score)
+            hypothesis['confidence_score'] = score
+            ranked.append(hypothesis)
+        return ranked
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+_HASH_SPACE = 1 << 128
+
+def record_hash(row: Dict[str, Any]) -> int:
+    """128-bit content hash of one source record (key order does not matter)."""
+    encoded = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=16).digest(), 'big')
+
+class EntityHasher:
+    """Accumulates one content hash per entity from the records describing it.
+
+    Record hashes are summed modulo 2**128, so the entity hash does not
+    depend on where its records sit in the dataset, and is computed in one
+    streaming pass with one integer per entity.
+    """
+
+    def __init__(self):
+        self._sums: Dict[str, int] = defaultdict(int)
+        self.names: Dict[str, str] = {}
+
+    def add(self, key: str, name: str, row: Dict[str, Any]) -> None:
+        self._sums[key] = (self._sums[key] + record_hash(row)) % _HASH_SPACE
+        self.names.setdefault(key, name)
+
+    def hashes(self) -> Dict[str, str]:
+        return {key: f'{total:032x}' for key, total in self._sums.items()}
+
+class ImportManifest:
+    """Content hashes of imported entities, per dataset, for incremental re-import.
+
+    diff() compares a fresh set of entity hashes with the last committed
+    import; commit() records the new hashes once the changes are written,
+    and tombstones entities that disappeared (kept, so one that comes back
+    counts as added). Until commit() a failed run leaves the manifest as it
+    was, and re-running applies the same delta again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS manifest "
+                              "(dataset TEXT, key TEXT, name TEXT, hash TEXT, "
+                              "deleted INTEGER DEFAULT 0, updated_at REAL, "
+                              "PRIMARY KEY (dataset, key)) WITHOUT ROWID")
+
+    def diff(self, dataset: str, hashes: Dict[str, str]) -> Dict[str, Any]:
+        """Split entity keys into added, changed and removed since the last commit."""
+        stored = {key: (digest, deleted) for key, digest, deleted in self.conn.execute(
+            "SELECT key, hash, deleted FROM manifest WHERE dataset = ?", (dataset,)
+        )}
+        added, changed = [], []
+        for key, digest in hashes.items():
+            previous = stored.get(key)
+            if previous is None or previous[1]:
+                added.append(key)
+            elif previous[0] != digest:
+                changed.append(key)
+        removed = [key for key, (_, deleted) in stored.items() if not deleted and key not in hashes]
+        return {'added': added, 'changed': changed, 'removed': removed,
+                'unchanged': len(hashes) - len(added) - len(changed)}
+
+    def removed_names(self, dataset: str, keys: Iterable[str]) -> List[str]:
+        """Display names recorded for entity keys."""
+        keys = list(keys)
+        names = dict(self.conn.execute(
+            "SELECT key, name FROM manifest WHERE dataset = ?", (dataset,)
+        ).fetchall()) if keys else {}
+        return [names.get(key) or key for key in keys]
+
+    def commit(self, dataset: str, hashes: Dict[str, str], names: Dict[str, str],
+               delta: Dict[str, Any]) -> None:
+        """Record the hashes of written entities and tombstone removed ones."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO manifest (dataset, key, name, hash, deleted, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                [(dataset, key, names.get(key, key), hashes[key], now)
+                 for key in delta['added'] + delta['changed']]
+            )
+            self.conn.executemany(
+                "UPDATE manifest SET deleted = 1, updated_at = ? WHERE dataset = ? AND key = ?",
+                [(now, dataset, key) for key in delta['removed']]
+            )
+
+    def stats(self, dataset: str) -> Dict[str, int]:
+        """Live and tombstoned entity counts for a dataset."""
+        live, deleted = self.conn.execute(
+            "SELECT COALESCE(SUM(deleted = 0), 0), COALESCE(SUM(deleted), 0) "
+            "FROM manifest WHERE dataset = ?", (dataset,)
+        ).fetchone()
+        return {'entities': live, 'tombstones': deleted}
+
+    def close(self) -> None:
+        self.conn.close()
+
+def format_delta(delta: Dict[str, Any], sample: int = 5) -> str:
+    """Delta summary ('+3 added, ~1 changed, -2 removed, 120 unchanged'), then
+    up to ``sample`` names of each kind."""
+    parts = [f"+{len(delta['added'])} added", f"~{len(delta['changed'])} changed",
+             f"-{len(delta['removed'])} removed", f"{delta['unchanged']} unchanged"]
+    line = ', '.join(parts)
+    for kind in ('added', 'changed', 'removed'):
+        names = delta[kind]
+        if names:
+            more = f", ... (+{len(names) - sample})" if len(names) > sample else ''
+            line += f"\n  {kind}: {', '.join(names[:sample])}{more}"
+    return line
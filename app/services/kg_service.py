@@ -1,25 +1,116 @@
 from neo4j import GraphDatabase
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import atexit
+import functools
+import hashlib
+import json
 import logging
+import threading
+from app.services.embedded_graph import EmbeddedGraph
+from app.services.kg_write_queue import KGWriteQueue
+from app.utils.graph_search import MAX_DEPTH, Neighbor, bounded_bfs
+from app.utils.lru_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
-class KnowledgeGraphService:
-    def __init__(self, uri: str, user: str, password: str):
-        """Initialize Neo4j connection."""
+def _invalidates_herb_graph(method):
+    """Invalidate the herb's cached graph once the write has been applied."""
+    @functools.wraps(method)
+    def wrapper(self, herb_name, *args, **kwargs):
         try:
-            self.driver = GraphDatabase.driver(uri, auth=(user, password))
-            self._create_constraints()
-            logger.info("Neo4j connection established successfully")
-        except Exception as e:
-            logger.warning(f"Neo4j not available, using fallback mode: {e}")
-            self.driver = None
+            return method(self, herb_name, *args, **kwargs)
+        finally:
+            self._invalidate_graph(herb_name)
+    return wrapper
+
+class KnowledgeGraphService:
+    # Property list key -> (node label, relationship type)
+    PROPERTY_RELATIONSHIPS = {
+        'rasa': ('Rasa', 'HAS_RASA'),
+        'guna': ('Guna', 'HAS_GUNA'),
+        'virya': ('Virya', 'HAS_VIRYA')
+    }
+    
+    # Relationships through which herbs are neighbours (shared target node)
+    NEIGHBOR_RELATIONSHIPS = ('CONTAINS_COMPOUND', 'HAS_RASA', 'HAS_GUNA', 'HAS_VIRYA')
+    
+    def __init__(self, uri: str, user: str, password: str,
+                 write_behind: bool = False, flush_size: int = 200,
+                 flush_interval: float = 1.0, backend: str = 'auto',
+                 snapshot_path: Optional[str] = None,
+                 graph_cache_size: int = 256, graph_cache_ttl: Optional[float] = 300):
+        """Initialize Neo4j connection.
+        
+        backend is 'neo4j' (log-only fallback mode if unreachable), 'auto'
+        (Neo4j, else the embedded graph) or 'embedded' (never use Neo4j).
+        The embedded graph is loaded from and saved to snapshot_path.
+        """
+        self.driver = None
+        self.graph = None
+        # Read-through cache of get_herb_graph results, invalidated on writes
+        self.graph_cache = LRUCache(graph_cache_size, graph_cache_ttl)
+        self._graph_cache_lock = threading.Lock()
+        self._graph_generation: Dict[str, int] = {}
+        self._compound_dependents: Dict[Any, set] = defaultdict(set)
+        if backend != 'embedded':
+            try:
+                self.driver = GraphDatabase.driver(uri, auth=(user, password))
+                self._create_constraints()
+                logger.info("Neo4j connection established successfully")
+            except Exception as e:
+                mode = 'embedded graph' if backend == 'auto' else 'fallback mode'
+                logger.warning(f"Neo4j not available, using {mode}: {e}")
+                self.driver = None
+        if self.driver is None and backend in ('auto', 'embedded'):
+            self.graph = EmbeddedGraph(snapshot_path)
+        
+        # Write-behind queue for enqueue_analysis; drained on close/exit
+        self.write_queue = None
+        if write_behind and self.driver:
+            self.write_queue = KGWriteQueue(self.upsert_analysis, flush_size, flush_interval)
+        if self.write_queue or (self.graph and snapshot_path):
+            atexit.register(self.close)
+    
+    @property
+    def backend(self) -> str:
+        """'neo4j', 'embedded' or 'fallback' (writes are only logged)."""
+        if self.driver:
+            return 'neo4j'
+        return 'embedded' if self.graph else 'fallback'
     
     def close(self):
-        """Close Neo4j connection."""
+        """Drain pending writes and close Neo4j connection."""
+        if self.write_queue:
+            self.write_queue.close()
+        if self.graph:
+            self.graph.save()
         if self.driver:
             self.driver.close()
     
+    def backend_stats(self) -> Dict[str, Any]:
+        """Return the active backend and, for the embedded graph, its size."""
+        stats = {'backend': self.backend}
+        if self.graph:
+            stats.update(self.graph.stats())
+        return stats
+    
+    def enqueue_analysis(self, batch: List[Dict[str, Any]]) -> None:
+        """Queue an upsert_analysis batch (written now if write-behind is off)."""
+        if self.write_queue:
+            self.write_queue.put(batch)
+        else:
+            self.upsert_analysis(batch)
+    
+    def flush_writes(self) -> None:
+        """Write all queued upserts so reads see them."""
+        if self.write_queue:
+            self.write_queue.flush()
+    
+    def write_queue_stats(self) -> Dict[str, Any]:
+        """Return write-behind queue depth and flush latency (empty if disabled)."""
+        return self.write_queue.stats() if self.write_queue else {}
+    
     def _create_constraints(self):
         """Create unique constraints for nodes."""
         if not self.driver:
@@ -31,8 +122,12 @@ class KnowledgeGraphService:
             session.run("CREATE CONSTRAINT compound_id IF NOT EXISTS "
                        "FOR (c:Compound) REQUIRE c.cid IS UNIQUE")
     
+    @_invalidates_herb_graph
     def add_herb(self, name: str, properties: Dict[str, Any]) -> None:
         """Add herb node to graph."""
+        if self.graph:
+            self.graph.merge_node('Herb', {**properties, 'name': name})
+            return
         if not self.driver:
             logger.info(f"Fallback mode: Would add herb {name} with properties {properties}")
             return
@@ -45,8 +140,12 @@ class KnowledgeGraphService:
                 properties=properties
             )
     
+    @_invalidates_herb_graph
     def add_rasa_property(self, herb_name: str, rasa: str) -> None:
         """Link herb to rasa (taste) property."""
+        if self.graph:
+            self._graph_link(herb_name, 'Rasa', {'name': rasa}, 'HAS_RASA')
+            return
         if not self.driver:
             logger.info(f"Fallback mode: Would link {herb_name} to rasa {rasa}")
             return
@@ -60,8 +159,12 @@ class KnowledgeGraphService:
                 rasa=rasa
             )
     
+    @_invalidates_herb_graph
     def add_guna_property(self, herb_name: str, guna: str) -> None:
         """Link herb to guna (quality) property."""
+        if self.graph:
+            self._graph_link(herb_name, 'Guna', {'name': guna}, 'HAS_GUNA')
+            return
         if not self.driver:
             logger.info(f"Fallback mode: Would link {herb_name} to guna {guna}")
             return
@@ -75,8 +178,12 @@ class KnowledgeGraphService:
                 guna=guna
             )
     
+    @_invalidates_herb_graph
     def add_virya_property(self, herb_name: str, virya: str) -> None:
         """Link herb to virya (potency) property."""
+        if self.graph:
+            self._graph_link(herb_name, 'Virya', {'name': virya}, 'HAS_VIRYA')
+            return
         if not self.driver:
             logger.info(f"Fallback mode: Would link {herb_name} to virya {virya}")
             return
@@ -93,6 +200,18 @@ class KnowledgeGraphService:
     def link_herb_to_compound(self, herb_name: str, cid: int, 
                              compound_name: str) -> None:
         """Link herb to PubChem compound."""
+        try:
+            self._link_herb_to_compound(herb_name, cid, compound_name)
+        finally:
+            # The compound's name may have changed in other herbs' graphs too
+            self._invalidate_graph(herb_name)
+            self._invalidate_compound(cid)
+    
+    def _link_herb_to_compound(self, herb_name: str, cid: int, compound_name: str) -> None:
+        if self.graph:
+            self._graph_link(herb_name, 'Compound', {'cid': cid, 'name': compound_name},
+                             'CONTAINS_COMPOUND')
+            return
         if not self.driver:
             logger.info(f"Fallback mode: Would link {herb_name} to compound {compound_name}")
             return
@@ -108,8 +227,207 @@ class KnowledgeGraphService:
                 compound_name=compound_name
             )
     
+    def upsert_analysis(self, batch: List[Dict[str, Any]], replace: bool = False) -> None:
+        """Write the herbs, property edges and compound links of one analysis.
+        
+        Each batch entry is {'name', 'properties', 'rasa': [...], 'guna': [...],
+        'virya': [...], 'compounds': [{'cid', 'name'}]}. Everything is written
+        in a single transaction with one parameterized UNWIND query per
+        node/relationship type, instead of one round-trip per edge. With
+        replace, the herbs' existing properties and outgoing relationships
+        are dropped first (a re-imported record replaces the old one).
+        """
+        if not batch:
+            return
+        try:
+            self._write_analysis(batch, replace)
+        finally:
+            for entry in batch:
+                self._invalidate_graph(entry['name'])
+                for compound in entry.get('compounds', []):
+                    self._invalidate_compound(compound['cid'])
+    
+    def _write_analysis(self, batch: List[Dict[str, Any]], replace: bool = False) -> None:
+        if self.graph:
+            with self.graph.batch():
+                if replace:
+                    herbs = [self.graph.find_node('Herb', entry['name']) for entry in batch]
+                    self.graph.remove_edges([herb for herb in herbs if herb is not None])
+                for entry in batch:
+                    self.graph.merge_node('Herb', {**entry.get('properties', {}),
+                                                   'name': entry['name']}, replace=replace)
+                    for key, (label, relationship) in self.PROPERTY_RELATIONSHIPS.items():
+                        for value in entry.get(key, []):
+                            self._graph_link(entry['name'], label, {'name': value}, relationship)
+                    for compound in entry.get('compounds', []):
+                        self._graph_link(entry['name'], 'Compound', compound, 'CONTAINS_COMPOUND')
+            return
+        if not self.driver:
+            logger.info(f"Fallback mode: Would upsert {len(batch)} herbs")
+            return
+        
+        herbs = [{'name': entry['name'], 'properties': entry.get('properties', {})}
+                 for entry in batch]
+        property_rows = {
+            key: [{'herb': entry['name'], 'value': value}
+                  for entry in batch for value in entry.get(key, [])]
+            for key in self.PROPERTY_RELATIONSHIPS
+        }
+        compound_rows = [{'herb': entry['name'], 'cid': compound['cid'], 'name': compound['name']}
+                         for entry in batch for compound in entry.get('compounds', [])]
+        
+        def write(tx):
+            if replace:
+                tx.run(
+                    "UNWIND $herbs AS herb "
+                    "MATCH (h:Herb {name: herb.name})-[r]->() "
+                    "DELETE r",
+                    herbs=herbs
+                )
+            tx.run(
+                "UNWIND $herbs AS herb "
+                "MERGE (h:Herb {name: herb.name}) "
+                + ("SET h = herb.properties, h.name = herb.name" if replace
+                   else "SET h += herb.properties"),
+                herbs=herbs
+            )
+            for key, (label, relationship) in self.PROPERTY_RELATIONSHIPS.items():
+                if property_rows[key]:
+                    tx.run(
+                        "UNWIND $rows AS row "
+                        "MATCH (h:Herb {name: row.herb}) "
+                        f"MERGE (p:{label} {{name: row.value}}) "
+                        f"MERGE (h)-[:{relationship}]->(p)",
+                        rows=property_rows[key]
+                    )
+            if compound_rows:
+                tx.run(
+                    "UNWIND $rows AS row "
+                    "MATCH (h:Herb {name: row.herb}) "
+                    "MERGE (c:Compound {cid: row.cid}) "
+                    "SET c.name = row.name "
+                    "MERGE (h)-[:CONTAINS_COMPOUND]->(c)",
+                    rows=compound_rows
+                )
+        
+        with self.driver.session() as session:
+            session.execute_write(write)
+    
+    def remove_herbs(self, names: List[str]) -> int:
+        """Delete herbs and their relationships (shared property and compound
+        nodes stay); return how many were removed."""
+        if not names:
+            return 0
+        try:
+            if self.graph:
+                return self.graph.remove_nodes('Herb', list(names))
+            if not self.driver:
+                logger.info(f"Fallback mode: Would remove {len(names)} herbs")
+                return 0
+            
+            def delete(tx):
+                record = tx.run(
+                    "UNWIND $names AS name "
+                    "MATCH (h:Herb {name: name}) "
+                    "DETACH DELETE h "
+                    "RETURN count(h) AS removed",
+                    names=list(names)
+                ).single()
+                return record['removed'] if record else 0
+            
+            with self.driver.session() as session:
+                return session.execute_write(delete)
+        finally:
+            for name in names:
+                self._invalidate_graph(name)
+    
+    def _graph_link(self, herb_name: str, label: str, properties: Dict[str, Any],
+                    relationship: str) -> None:
+        """Embedded equivalent of MATCH (h:Herb) MERGE (n) MERGE (h)-[r]->(n)."""
+        with self.graph.batch():
+            herb = self.graph.find_node('Herb', herb_name)
+            if herb is None:
+                return
+            self.graph.merge_edge(herb, relationship, self.graph.merge_node(label, properties))
+    
+    @staticmethod
+    def _node_id(label: str, properties: Dict[str, Any]) -> str:
+        """Stable node id for the graph format: 'Herb:Turmeric', 'Compound:969516'."""
+        key = properties.get('cid') if label == 'Compound' else properties.get('name')
+        return f"{label}:{key}"
+    
+    @classmethod
+    def _build_graph(cls, herb_node: Dict[str, Any], neighbors) -> Dict[str, Any]:
+        """Graph with each node once ({'id', 'label', **properties}) and
+        relationships as {'type', 'source', 'target'} node ids."""
+        herb_id = cls._node_id('Herb', herb_node)
+        nodes = {herb_id: {'id': herb_id, 'label': 'Herb', **herb_node}}
+        relationships = []
+        for rel, label, properties in neighbors:
+            node_id = cls._node_id(label, properties)
+            nodes.setdefault(node_id, {'id': node_id, 'label': label, **properties})
+            relationships.append({'type': rel, 'source': herb_id, 'target': node_id})
+        return {'nodes': list(nodes.values()), 'relationships': relationships}
+    
+    def _invalidate_graph(self, herb_name: str) -> None:
+        """Drop a herb's cached graph and any query for it still in flight."""
+        with self._graph_cache_lock:
+            self._graph_generation[herb_name] = self._graph_generation.get(herb_name, 0) + 1
+            self.graph_cache.invalidate(herb_name)
+    
+    def _invalidate_compound(self, cid: int) -> None:
+        """Drop cached graphs that include a compound whose properties changed."""
+        with self._graph_cache_lock:
+            herbs = self._compound_dependents.pop(cid, set())
+        for herb_name in herbs:
+            self._invalidate_graph(herb_name)
+    
     def get_herb_graph(self, herb_name: str) -> Dict[str, Any]:
-        """Get full graph data for a herb."""
+        """Get graph data for a herb (shared cached object; do not mutate)."""
+        return self.get_herb_graph_with_etag(herb_name)[0]
+    
+    def get_herb_graph_with_etag(self, herb_name: str) -> Tuple[Dict[str, Any], str]:
+        """Get a herb's graph through the LRU cache, with an ETag of its content.
+        
+        Entries are invalidated whenever this service writes to the herb or
+        to a compound in its graph; graph_cache_ttl bounds staleness from
+        writes made by other processes.
+        """
+        self.flush_writes()
+        cached = self.graph_cache.get(herb_name)
+        if cached is not None:
+            return cached
+        
+        with self._graph_cache_lock:
+            generation = self._graph_generation.get(herb_name, 0)
+        graph = self._query_herb_graph(herb_name)
+        etag = hashlib.sha1(
+            json.dumps(graph, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        
+        with self._graph_cache_lock:
+            # Skip caching if a write touched the herb while we were querying
+            if self._graph_generation.get(herb_name, 0) == generation:
+                self.graph_cache.put(herb_name, (graph, etag))
+                for node in graph['nodes']:
+                    if node['label'] == 'Compound':
+                        self._compound_dependents[node['cid']].add(herb_name)
+        return graph, etag
+    
+    def graph_cache_stats(self) -> Dict[str, Any]:
+        """Return herb graph cache counters."""
+        return self.graph_cache.stats()
+    
+    def _query_herb_graph(self, herb_name: str) -> Dict[str, Any]:
+        """Read a herb and its outgoing relationships from the backend."""
+        if self.graph:
+            herb = self.graph.find_node('Herb', herb_name)
+            if herb is None:
+                return {'nodes': [], 'relationships': []}
+            return self._build_graph(self.graph.node(herb), [
+                (rel, self.graph.label(neighbor), self.graph.node(neighbor))
+                for rel, neighbor in self.graph.neighbors(herb)
+            ])
         if not self.driver:
             return {'nodes': [], 'relationships': []}
             
@@ -117,28 +435,118 @@ class KnowledgeGraphService:
             result = session.run(
                 "MATCH (h:Herb {name: $herb_name})"
                 "-[r]->(n) "
-                "RETURN h, type(r) as rel, n",
+                "RETURN h, type(r) as rel, labels(n)[0] as label, n",
                 herb_name=herb_name
             )
-            
-            nodes = []
-            relationships = []
-            
-            for record in result:
-                nodes.append(dict(record['h']))
-                nodes.append(dict(record['n']))
-                relationships.append({
-                    'type': record['rel'],
-                    'source': record['h']['name'],
-                    'target': record['n'].get('name', record['n'].get('cid'))
-                })
-            
-            return {'nodes': nodes, 'relationships': relationships}
+            records = list(result)
+        
+        if not records:
+            return {'nodes': [], 'relationships': []}
+        return self._build_graph(dict(records[0]['h']), [
+            (record['rel'], record['label'], dict(record['n'])) for record in records
+        ])
+    
+    def iter_herb_neighborhood(self, herb_name: str, max_depth: int = 2,
+                               fan_out: Optional[int] = None,
+                               relationships: Optional[List[str]] = None,
+                               limit: Optional[int] = None) -> Iterator[Neighbor]:
+        """Yield herbs sharing compounds or properties with a herb within
+        max_depth hops, in BFS order.
+        
+        At most fan_out new herbs are taken from each expanded herb and at
+        most limit are produced. On Neo4j each BFS level is one query with
+        the fan-out and limit pushed down; the embedded graph walks its CSR
+        adjacency.
+        """
+        relationships = list(relationships or self.NEIGHBOR_RELATIONSHIPS)
+        self.flush_writes()
+        if self.graph:
+            neighbors = self._embedded_neighborhood(herb_name, max_depth, fan_out, relationships)
+        elif self.driver:
+            neighbors = self._neo4j_neighborhood(herb_name, max_depth, fan_out, relationships, limit)
+        else:
+            neighbors = iter(())
+        for count, neighbor in enumerate(neighbors):
+            if limit is not None and count >= limit:
+                return
+            yield neighbor
+    
+    def _embedded_neighborhood(self, herb_name: str, max_depth: int,
+                               fan_out: Optional[int], relationships: List[str]) -> Iterator[Neighbor]:
+        graph = self.graph
+        start = graph.find_node('Herb', herb_name)
+        if start is None:
+            return iter(())
+        # Shared nodes whose herbs were all reached already
+        exhausted = set()
+        
+        def expand(name):
+            herb = graph.find_node('Herb', name)
+            for rel, target in graph.neighbors(herb):
+                if rel not in relationships or (rel, target) in exhausted:
+                    continue
+                target_node = graph.node(target)
+                via = str(target_node.get('name', target_node.get('cid')))
+                for _, other in graph.neighbors(target, rel, direction='in'):
+                    yield graph.node(other)['name'], (rel, via)
+                exhausted.add((rel, target))
+        
+        return bounded_bfs(herb_name, expand, max_depth, fan_out)
+    
+    def _neo4j_neighborhood(self, herb_name: str, max_depth: int, fan_out: Optional[int],
+                            relationships: List[str], limit: Optional[int]) -> Iterator[Neighbor]:
+        seen = [herb_name]
+        frontier = [herb_name]
+        remaining = limit
+        with self.driver.session() as session:
+            for depth in range(1, min(max_depth, MAX_DEPTH) + 1):
+                # Each herb is credited to its first frontier parent, then
+                # every parent keeps at most fan_out herbs
+                result = session.run(
+                    "UNWIND range(0, size($frontier) - 1) AS i "
+                    "MATCH (h:Herb {name: $frontier[i]})-[r]->(a)<-[r2]-(o:Herb) "
+                    "WHERE type(r) IN $types AND type(r2) = type(r) AND NOT o.name IN $seen "
+                    "WITH o, i, [type(r), coalesce(a.name, toString(a.cid))] AS via "
+                    "ORDER BY i, o.name "
+                    "WITH o, collect([i, via])[0] AS first "
+                    "WITH first[0] AS i, o.name AS herb, first[1] AS via "
+                    "ORDER BY i, herb "
+                    "WITH i, collect([herb, via])[..$fan_out] AS found "
+                    "UNWIND found AS item "
+                    "RETURN i, item[0] AS herb, item[1][0] AS via_type, item[1][1] AS via "
+                    "ORDER BY i, herb "
+                    "LIMIT $limit",
+                    frontier=frontier,
+                    types=relationships,
+                    seen=seen,
+                    fan_out=fan_out or 2 ** 31,
+                    limit=remaining if remaining is not None else 2 ** 31
+                )
+                level = [Neighbor(record['herb'], depth, frontier[record['i']],
+                                  record['via_type'], record['via'])
+                         for record in result]
+                if not level:
+                    return
+                for neighbor in level:
+                    yield neighbor
+                frontier = [neighbor.herb for neighbor in level]
+                seen.extend(frontier)
+                if remaining is not None:
+                    remaining -= len(level)
+                    if remaining <= 0:
+                        return
     
     def search_herbs_by_property(self, property_type: str, property_value: str) -> List[str]:
         """Search herbs by specific property."""
+        if self.graph:
+            node = self.graph.find_node(property_type.capitalize(), property_value)
+            if node is None:
+                return []
+            return [self.graph.node(herb)['name'] for _, herb in
+                    self.graph.neighbors(node, f"HAS_{property_type.upper()}", direction='in')]
         if not self.driver:
             return []
+        self.flush_writes()
             
         with self.driver.session() as session:
             result = session.run(
@@ -149,10 +557,31 @@ class KnowledgeGraphService:
             
             return [record['herb_name'] for record in result]
     
+    def get_herb_properties(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored node properties of the named herbs (herbs not found are left out)."""
+        if self.graph:
+            nodes = {name: self.graph.find_node('Herb', name) for name in names}
+            return {name: self.graph.node(node) for name, node in nodes.items() if node is not None}
+        if not self.driver or not names:
+            return {}
+        self.flush_writes()
+        
+        with self.driver.session() as session:
+            result = session.run(
+                "UNWIND $names AS name "
+                "MATCH (h:Herb {name: name}) "
+                "RETURN h.name as herb_name, properties(h) as properties",
+                names=list(names)
+            )
+            return {record['herb_name']: dict(record['properties']) for record in result}
+    
     def get_all_herbs(self) -> List[str]:
         """Get all herbs in the knowledge graph."""
+        if self.graph:
+            return [self.graph.node(herb)['name'] for herb in self.graph.nodes_with_label('Herb')]
         if not self.driver:
             return []
+        self.flush_writes()
             
         with self.driver.session() as session:
             result = session.run("MATCH (h:Herb) RETURN h.name as herb_name")
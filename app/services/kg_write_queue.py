@@ -0,0 +1,176 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+def merge_entry(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Coalesce two upsert_analysis entries for the same herb.
+
+    Node properties from the newer entry win; property values and
+    compounds are unioned in first-seen order (compounds by CID).
+    """
+    merged = {
+        'name': current['name'],
+        'properties': {**current.get('properties', {}), **update.get('properties', {})}
+    }
+    for key in ('rasa', 'guna', 'virya'):
+        merged[key] = list(dict.fromkeys(current.get(key, []) + update.get(key, [])))
+    compounds = {compound['cid']: compound for compound in current.get('compounds', [])}
+    compounds.update((compound['cid'], compound) for compound in update.get('compounds', []))
+    merged['compounds'] = list(compounds.values())
+    return merged
+
+class KGWriteQueue:
+    """Write-behind buffer for knowledge-graph upserts.
+
+    Requests enqueue upsert_analysis entries and return immediately. Entries
+    for the same herb are coalesced while pending, and a background thread
+    writes them in batches once ``max_batch`` herbs are waiting or
+    ``flush_interval`` seconds have passed. Failed batches are retried, up
+    to ``max_pending`` herbs. close() drains whatever is left.
+
+    Batches are taken and written under one write lock, so writes of the
+    same herb land in enqueue order and flush() returns only once a batch
+    the background thread is writing has landed too.
+    """
+
+    def __init__(self, write: Callable[[List[Dict[str, Any]]], None],
+                 max_batch: int = 200, flush_interval: float = 1.0,
+                 max_pending: int = 10000):
+        self._write = write
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {'enqueued': 0, 'coalesced': 0, 'flushes': 0, 'written': 0,
+                       'errors': 0, 'dropped': 0, 'last_flush_ms': 0.0,
+                       'max_flush_ms': 0.0, 'total_flush_ms': 0.0}
+
+    def put(self, batch: List[Dict[str, Any]]) -> None:
+        """Queue entries for writing; writes synchronously once closed."""
+        with self._cond:
+            if not self._closed:
+                for entry in batch:
+                    self._stats['enqueued'] += 1
+                    current = self._pending.get(entry['name'])
+                    if current is not None:
+                        self._stats['coalesced'] += 1
+                        entry = merge_entry(current, entry)
+                    self._pending[entry['name']] = entry
+                self._ensure_thread()
+                if len(self._pending) >= self.max_batch:
+                    self._cond.notify()
+                return
+        with self._write_lock:
+            self._write_batch(batch)
+
+    def _ensure_thread(self):
+        """Start the flusher (again after a fork, where threads do not survive)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='kg-write-behind',
+                                            daemon=True)
+            self._thread.start()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        """Remove up to max_batch pending entries (caller holds the lock)."""
+        names = list(self._pending)[:self.max_batch]
+        return [self._pending.pop(name) for name in names]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._pending) >= self.max_batch,
+                    timeout=self.flush_interval
+                )
+                if self._closed:
+                    return
+            self._write_next(retry=True)
+
+    def _write_next(self, retry: bool) -> bool:
+        """Take and write the next batch; False if none was pending or it failed."""
+        with self._write_lock:
+            with self._cond:
+                batch = self._take()
+            return bool(batch) and self._write_batch(batch, retry)
+
+    def _write_batch(self, batch: List[Dict[str, Any]], retry: bool = False) -> bool:
+        """Write one batch, recording latency; requeue it on failure if asked.
+
+        The caller holds the write lock.
+        """
+        start = time.perf_counter()
+        try:
+            self._write(batch)
+        except Exception as e:
+            logger.error(f"Knowledge graph write of {len(batch)} herbs failed: {e}")
+            with self._cond:
+                self._stats['errors'] += 1
+                if retry:
+                    self._requeue(batch)
+            return False
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._stats['flushes'] += 1
+            self._stats['written'] += len(batch)
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed_ms)
+        return True
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed batch back behind newer updates (caller holds the lock)."""
+        pending = {}
+        for entry in batch:
+            pending[entry['name']] = entry
+        for name, entry in self._pending.items():
+            pending[name] = merge_entry(pending[name], entry) if name in pending else entry
+        overflow = len(pending) - self.max_pending
+        if overflow > 0:
+            for name in list(pending)[:overflow]:
+                del pending[name]
+            self._stats['dropped'] += overflow
+            logger.error(f"Knowledge graph write queue full; dropped {overflow} herbs")
+        self._pending = pending
+
+    def flush(self) -> None:
+        """Write everything pending now, on the calling thread.
+
+        Waits for a batch the background thread is writing, even when
+        nothing is left pending.
+        """
+        while self._write_next(retry=not self._closed):
+            pass
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the flusher and drain the queue."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def depth(self) -> int:
+        """Number of herbs waiting to be written."""
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, coalescing and flush latency counters."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['depth'] = len(self._pending)
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / stats['flushes'] if stats['flushes'] else 0.0
+        stats['max_batch'] = self.max_batch
+        stats['flush_interval'] = self.flush_interval
+        return stats
@@ -1,177 +1,198 @@
-from typing import List, Dict, Any
-import re
+from typing import List, Dict, Any, Optional
 import logging
+import threading
+from app.utils.lexicon import LexiconMatcher, LexiconMatch
+from app.utils.property_scanner import PropertyScanner
 
 logger = logging.getLogger(__name__)
 
+# Canonical herb name -> Sanskrit/Latin/vernacular aliases
+KNOWN_HERBS = {
+    'turmeric': ['curcumin', 'curcuma longa', 'haldi'],
+    'black pepper': ['piper nigrum', 'piperine', 'kali mirch'],
+    'ginger': ['zingiber officinale', 'adrak', 'shunthi'],
+    'ashwagandha': ['withania somnifera', 'winter cherry'],
+    'tulsi': ['ocimum sanctum', 'holy basil', 'basil'],
+    'neem': ['azadirachta indica', 'margosa'],
+    'amla': ['emblica officinalis', 'indian gooseberry'],
+    'brahmi': ['bacopa monnieri', 'water hyssop'],
+    'shankhpushpi': ['convolvulus pluricaulis'],
+    'guduchi': ['tinospora cordifolia', 'giloy'],
+    'triphala': [],
+    'haritaki': ['terminalia chebula'],
+    'bibhitaki': ['terminalia bellirica'],
+    'cardamom': ['elaichi', 'ela'],
+    'cinnamon': ['dalchini', 'cinnamomum'],
+    'cumin': ['jeera', 'cumin seed'],
+    'coriander': ['dhaniya', 'cilantro'],
+    'fennel': ['saunf', 'fennel seed'],
+    'clove': ['laung', 'syzygium aromaticum'],
+    'garlic': ['lahsun', 'allium sativum'],
+    'onion': ['pyaz', 'allium cepa'],
+    'mustard': ['sarson', 'brassica'],
+    'sesame': ['til', 'sesamum indicum'],
+    'coconut': ['nariyal', 'cocos nucifera'],
+    'mint': ['pudina', 'mentha'],
+    'lemongrass': ['lemon grass', 'cymbopogon'],
+    'sandalwood': ['chandan', 'santalum'],
+    'saffron': ['kesar', 'crocus sativus'],
+    'licorice': ['mulethi', 'glycyrrhiza glabra'],
+    'aloe vera': ['aloe', 'kumari'],
+    'castor oil': ['arandi', 'ricinus communis'],
+    'fenugreek': ['methi', 'trigonella foenum-graecum']
+}
+
 class AyurvedicNLPService:
-    def __init__(self):
-        """Initialize Ayurvedic patterns (spaCy optional)."""
-        try:
-            import spacy
-            self.nlp = spacy.load("en_core_web_sm")
-            logger.info("spaCy model loaded successfully")
-        except Exception as e:
-            logger.warning(f"spaCy not available, using fallback NLP: {e}")
-            self.nlp = None
+    # Pipeline components whose output we never read; only NER is used
+    UNUSED_PIPES = ['tagger', 'parser', 'attribute_ruler', 'lemmatizer']
+    HERB_ENTITY_LABELS = ['PRODUCT', 'SUBSTANCE', 'ORG']  # Adjust labels
+    
+    def __init__(self, herb_lexicon: Optional[Dict[str, List[str]]] = None,
+                 sentence_window: int = 1, token_window: Optional[int] = None,
+                 spacy_model: str = "en_core_web_sm",
+                 batch_size: int = 64, n_process: int = 1):
+        """Initialize Ayurvedic patterns (spaCy optional, loaded on first use).
+        
+        sentence_window/token_window bound how far a property term may be
+        from a herb mention to be attributed to that herb. batch_size and
+        n_process are the nlp.pipe defaults for extract_herbs_batch.
+        """
+        self.spacy_model = spacy_model
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self._nlp = None
+        self._nlp_loaded = False
+        self._nlp_lock = threading.Lock()
         
         self._init_ayurvedic_patterns()
+        self.property_scanner = PropertyScanner(
+            {'rasa': self.rasa_terms, 'guna': self.guna_terms, 'virya': self.virya_terms},
+            sentence_window=sentence_window,
+            token_window=token_window
+        )
+        
+        # Built once; extraction is a single pass regardless of lexicon size
+        self.herb_matcher = LexiconMatcher(herb_lexicon or KNOWN_HERBS)
+        self.herb_matcher.build()
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline without unused components, loaded on first access."""
+        if not self._nlp_loaded:
+            with self._nlp_lock:
+                if not self._nlp_loaded:
+                    try:
+                        import spacy
+                        self._nlp = spacy.load(self.spacy_model, exclude=self.UNUSED_PIPES)
+                        logger.info(f"spaCy model loaded successfully: {self._nlp.pipe_names}")
+                    except Exception as e:
+                        logger.warning(f"spaCy not available, using fallback NLP: {e}")
+                        self._nlp = None
+                    self._nlp_loaded = True
+        return self._nlp
     
     def _init_ayurvedic_patterns(self):
-        """Define regex patterns for Ayurvedic properties."""
-        self.rasa_patterns = {
-            'madhura': r'\b(sweet|madhura)\b',
-            'amla': r'\b(sour|amla)\b',
-            'lavana': r'\b(salty|lavana)\b',
-            'katu': r'\b(pungent|katu)\b',
-            'tikta': r'\b(bitter|tikta)\b',
-            'kashaya': r'\b(astringent|kashaya)\b'
+        """Define trigger terms for Ayurvedic properties."""
+        self.rasa_terms = {
+            'madhura': ['sweet', 'madhura'],
+            'amla': ['sour', 'amla'],
+            'lavana': ['salty', 'lavana'],
+            'katu': ['pungent', 'katu'],
+            'tikta': ['bitter', 'tikta'],
+            'kashaya': ['astringent', 'kashaya']
         }
         
-        self.virya_patterns = {
-            'ushna': r'\b(hot|heating|ushna)\b',
-            'shita': r'\b(cold|cooling|shita)\b'
+        self.virya_terms = {
+            'ushna': ['hot', 'heating', 'ushna'],
+            'shita': ['cold', 'cooling', 'shita']
         }
         
-        self.guna_patterns = {
-            'guru': r'\b(heavy|guru)\b',
-            'laghu': r'\b(light|laghu)\b',
-            'snigdha': r'\b(oily|snigdha)\b',
-            'ruksha': r'\b(dry|ruksha)\b',
-            'tiksna': r'\b(sharp|tiksna)\b',
-            'manda': r'\b(dull|manda)\b',
-            'sita': r'\b(cold|sita)\b',
-            'ushna': r'\b(hot|ushna)\b'
+        self.guna_terms = {
+            'guru': ['heavy', 'guru'],
+            'laghu': ['light', 'laghu'],
+            'snigdha': ['oily', 'snigdha'],
+            'ruksha': ['dry', 'ruksha'],
+            'tiksna': ['sharp', 'tiksna'],
+            'manda': ['dull', 'manda'],
+            'sita': ['cold', 'sita'],
+            'ushna': ['hot', 'ushna']
         }
     
     def extract_herbs(self, text: str) -> List[Dict[str, Any]]:
         """Extract herb names and their properties from text."""
+        doc = self.nlp(text) if self.nlp else None
+        return self._extract_herbs_from_doc(text, doc)
+    
+    def extract_herbs_batch(self, texts: List[str], batch_size: Optional[int] = None,
+                            n_process: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """Extract herbs from many texts, running spaCy via nlp.pipe.
+        
+        Returns one herb list per input text, in input order.
+        """
+        if not self.nlp:
+            return [self._extract_herbs_from_doc(text, None) for text in texts]
+        
+        docs = self.nlp.pipe(
+            texts,
+            batch_size=batch_size or self.batch_size,
+            n_process=n_process or self.n_process
+        )
+        return [self._extract_herbs_from_doc(text, doc) for text, doc in zip(texts, docs)]
+    
+    def _extract_herbs_from_doc(self, text: str, doc) -> List[Dict[str, Any]]:
+        """Combine spaCy entities (if any) with lexicon hits and attribute properties."""
         herbs = []
         
-        # Use spaCy if available
-        if self.nlp:
-            doc = self.nlp(text)
+        # Use spaCy entities if available
+        if doc is not None:
             # Extract entities that might be herbs
             for ent in doc.ents:
-                if ent.label_ in ['PRODUCT', 'SUBSTANCE', 'ORG']:  # Adjust labels
-                    herb_info = {
+                if ent.label_ in self.HERB_ENTITY_LABELS:
+                    herbs.append({
                         'name': ent.text,
-                        'rasa': self._extract_rasa(text, ent.text),
-                        'virya': self._extract_virya(text, ent.text),
-                        'guna': self._extract_guna(text, ent.text)
-                    }
-                    herbs.append(herb_info)
+                        'mentions': [[ent.start_char, ent.end_char]]
+                    })
         
-        # Also check for known Ayurvedic herbs using pattern matching
-        known_herbs = self._extract_known_herbs(text)
-        for herb in known_herbs:
-            if not any(h['name'].lower() == herb.lower() for h in herbs):
-                herb_info = {
-                    'name': herb,
-                    'rasa': self._extract_rasa(text, herb),
-                    'virya': self._extract_virya(text, herb),
-                    'guna': self._extract_guna(text, herb)
-                }
-                herbs.append(herb_info)
+        # Also check for known Ayurvedic herbs using the lexicon automaton
+        mentions_by_herb: Dict[str, List[LexiconMatch]] = {}
+        for mention in self.find_herb_mentions(text):
+            mentions_by_herb.setdefault(mention.canonical, []).append(mention)
         
-        return herbs
-    
-    def _extract_known_herbs(self, text: str) -> List[str]:
-        """Extract known Ayurvedic herbs from text."""
-        known_herbs = [
-            'turmeric', 'curcumin', 'curcuma longa', 'haldi',
-            'black pepper', 'piper nigrum', 'piperine', 'kali mirch',
-            'ginger', 'zingiber officinale', 'adrak', 'shunthi',
-            'ashwagandha', 'withania somnifera', 'winter cherry',
-            'tulsi', 'ocimum sanctum', 'holy basil', 'basil',
-            'neem', 'azadirachta indica', 'margosa',
-            'amla', 'emblica officinalis', 'indian gooseberry',
-            'brahmi', 'bacopa monnieri', 'water hyssop',
-            'shankhpushpi', 'convolvulus pluricaulis',
-            'guduchi', 'tinospora cordifolia', 'giloy',
-            'triphala', 'haritaki', 'terminalia chebula',
-            'bibhitaki', 'terminalia bellirica',
-            'cardamom', 'elaichi', 'ela',
-            'cinnamon', 'dalchini', 'cinnamomum',
-            'cumin', 'jeera', 'cumin seed',
-            'coriander', 'dhaniya', 'cilantro',
-            'fennel', 'saunf', 'fennel seed',
-            'clove', 'laung', 'syzygium aromaticum',
-            'garlic', 'lahsun', 'allium sativum',
-            'onion', 'pyaz', 'allium cepa',
-            'mustard', 'sarson', 'brassica',
-            'sesame', 'til', 'sesamum indicum',
-            'coconut', 'nariyal', 'cocos nucifera',
-            'mint', 'pudina', 'mentha',
-            'lemongrass', 'lemon grass', 'cymbopogon',
-            'sandalwood', 'chandan', 'santalum',
-            'saffron', 'kesar', 'crocus sativus',
-            'licorice', 'mulethi', 'glycyrrhiza glabra',
-            'aloe vera', 'aloe', 'kumari',
-            'castor oil', 'arandi', 'ricinus communis',
-            'fenugreek', 'methi', 'trigonella foenum-graecum'
-        ]
-        
-        found_herbs = []
-        text_lower = text.lower()
+        for canonical, mentions in mentions_by_herb.items():
+            surfaces = {m.text.lower() for m in mentions}
+            existing = next((h for h in herbs if h['name'].lower() in surfaces), None)
+            if existing:
+                existing.setdefault('canonical', canonical)
+            else:
+                herbs.append({
+                    'name': mentions[0].text,
+                    'canonical': canonical,
+                    'mentions': [[m.start, m.end] for m in mentions]
+                })
         
-        for herb in known_herbs:
-            if herb in text_lower:
-                # Find the original case version
-                pattern = re.compile(re.escape(herb), re.IGNORECASE)
-                match = pattern.search(text)
-                if match:
-                    found_herbs.append(match.group())
+        # One scan of the text; each property goes to its nearest herb
+        attributed = self.property_scanner.attribute(
+            text, {index: herb['mentions'] for index, herb in enumerate(herbs)}
+        )
+        for index, herb in enumerate(herbs):
+            properties = attributed[index]
+            herb['rasa'] = properties['rasa']
+            herb['virya'] = properties['virya'][0] if properties['virya'] else 'unknown'
+            herb['guna'] = properties['guna']
         
-        return list(set(found_herbs))
-    
-    def _extract_rasa(self, text: str, herb_name: str) -> List[str]:
-        """Extract rasa (taste) properties near herb mention."""
-        # Simple context window approach
-        rasas = []
-        for rasa, pattern in self.rasa_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                rasas.append(rasa)
-        return rasas
-    
-    def _extract_virya(self, text: str, herb_name: str) -> str:
-        """Extract virya (potency) property."""
-        for virya, pattern in self.virya_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                return virya
-        return 'unknown'
+        return herbs
     
-    def _extract_guna(self, text: str, herb_name: str) -> List[str]:
-        """Extract guna (qualities) properties."""
-        gunas = []
-        for guna, pattern in self.guna_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                gunas.append(guna)
-        return gunas
+    def find_herb_mentions(self, text: str) -> List[LexiconMatch]:
+        """Find known herb mentions with canonical names and span offsets."""
+        return self.herb_matcher.find_all(text)
     
     def extract_ayurvedic_properties(self, text: str) -> Dict[str, List[str]]:
         """Extract all Ayurvedic properties from text."""
-        properties = {
-            'rasa': [],
-            'guna': [],
+        found = self.property_scanner.properties(text)
+        return {
+            'rasa': found['rasa'],
+            'guna': found['guna'],
             'vipaka': [],
-            'virya': [],
+            'virya': found['virya'],
             'prabhava': []
         }
-        
-        # Extract rasa
-        for rasa, pattern in self.rasa_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                properties['rasa'].append(rasa)
-        
-        # Extract guna
-        for guna, pattern in self.guna_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                properties['guna'].append(guna)
-        
-        # Extract virya
-        for virya, pattern in self.virya_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                properties['virya'].append(virya)
-        
-        return properties
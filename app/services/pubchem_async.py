@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import logging
+from app.services.pubchem_service import PubChemService
+
+logger = logging.getLogger(__name__)
+
+class AsyncPubChemClient:
+    """Concurrent PubChem lookups on asyncio, with a sync facade for Flask.
+
+    Independent name->CID lookups and property batches are gathered
+    concurrently. The HTTP calls are PubChemService's own blocking calls,
+    run in a bounded thread pool, so caching, negative caching and the shared
+    token bucket apply unchanged. The service's keep-alive pool is reused by
+    every worker thread. Concurrency hides network latency; the token bucket
+    still caps throughput.
+    """
+
+    def __init__(self, service: PubChemService, max_concurrency: int = 8):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='pubchem')
+
+    def close(self):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False)
+
+    async def _call(self, func, *args):
+        """Run a blocking service call in the worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def search_compounds_async(self, compound_names: List[str]) -> Dict[str, Optional[int]]:
+        """Resolve compound names to CIDs concurrently."""
+        names = list(dict.fromkeys(compound_names))
+        cids = await asyncio.gather(*(self._call(self.service.search_compound, name)
+                                      for name in names))
+        return dict(zip(names, cids))
+
+    async def get_compound_properties_bulk_async(self, cids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch properties, issuing the uncached CID batches concurrently."""
+        results, missing = self.service.uncached_cids(cids)
+        batches = await asyncio.gather(*(self._call(self.service.fetch_property_batch, batch)
+                                         for batch in self.service.property_batches(missing)))
+        for batch in batches:
+            results.update(batch)
+        return results
+
+    async def search_compounds_for_herbs_async(self, herb_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Resolve compounds for all herbs in parallel."""
+        compound_names = self.service.herb_compound_names(herb_names)
+        cids = await self.search_compounds_async(
+            [name for names in compound_names.values() for name in names]
+        )
+        properties = await self.get_compound_properties_bulk_async(
+            [cid for cid in cids.values() if cid]
+        )
+        return self.service.assemble_herb_compounds(compound_names, cids, properties)
+
+    def _run(self, coroutine):
+        """Run a coroutine to completion from synchronous code."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # Called from inside a running loop: use a private loop in a thread
+        result = {}
+
+        def runner():
+            try:
+                result['value'] = asyncio.run(coroutine)
+            except BaseException as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=runner)
+        thread.start()
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def search_compounds_for_herbs(self, herb_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Synchronous facade over search_compounds_for_herbs_async."""
+        return self._run(self.search_compounds_for_herbs_async(herb_names))
@@ -0,0 +1,139 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Returned by lookups when nothing usable is cached
+MISS = object()
+
+class PubChemCache:
+    """Persistent SQLite cache for PubChem responses.
+
+    Holds name -> CID, CID -> properties and name -> synonyms with TTLs.
+    Names PubChem reported as not found are cached with a shorter
+    negative TTL. Every gunicorn worker opening the same file shares the
+    entries (WAL mode); hit/miss counters are per process.
+    """
+
+    TABLES = ('name_cid', 'cid_properties', 'name_synonyms')
+
+    def __init__(self, path: str, ttl: float = 30 * 86400,
+                 negative_ttl: float = 86400):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {table: {'hits': 0, 'misses': 0} for table in self.TABLES}
+        self._create_tables()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_tables(self):
+        """Create cache tables if they do not exist."""
+        conn = self._connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS name_cid "
+                         "(name TEXT PRIMARY KEY, cid INTEGER, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cid_properties "
+                         "(cid INTEGER PRIMARY KEY, data TEXT, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS name_synonyms "
+                         "(name TEXT PRIMARY KEY, data TEXT, expires_at REAL)")
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        return name.strip().lower()
+
+    def _count(self, table: str, hit: bool):
+        with self._stats_lock:
+            self._stats[table]['hits' if hit else 'misses'] += 1
+
+    def _get(self, table: str, key_column: str, value_column: str, key) -> Any:
+        """Fetch an unexpired value, counting the hit or miss."""
+        try:
+            row = self._connection().execute(
+                f"SELECT {value_column} FROM {table} "
+                f"WHERE {key_column} = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"PubChem cache read failed: {e}")
+            row = None
+        self._count(table, row is not None)
+        return MISS if row is None else row[0]
+
+    def _put(self, table: str, key_column: str, value_column: str,
+             key, value, ttl: float) -> None:
+        """Insert or replace a value with the given TTL."""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {table} "
+                    f"({key_column}, {value_column}, expires_at) VALUES (?, ?, ?)",
+                    (key, value, time.time() + ttl)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"PubChem cache write failed: {e}")
+
+    def get_cid(self, name: str) -> Any:
+        """Return the cached CID (None if known not found) or MISS."""
+        return self._get('name_cid', 'name', 'cid', self._normalize(name))
+
+    def set_cid(self, name: str, cid: Optional[int]) -> None:
+        """Cache a CID; None records a negative (not found) entry."""
+        ttl = self.ttl if cid is not None else self.negative_ttl
+        self._put('name_cid', 'name', 'cid', self._normalize(name), cid, ttl)
+
+    def get_properties(self, cid: int) -> Any:
+        """Return cached compound properties or MISS."""
+        data = self._get('cid_properties', 'cid', 'data', int(cid))
+        return data if data is MISS else json.loads(data)
+
+    def set_properties(self, cid: int, properties: Dict[str, Any]) -> None:
+        """Cache compound properties for a CID."""
+        self._put('cid_properties', 'cid', 'data', int(cid),
+                  json.dumps(properties), self.ttl)
+
+    def get_synonyms(self, name: str) -> Any:
+        """Return cached synonyms (possibly empty) or MISS."""
+        data = self._get('name_synonyms', 'name', 'data', self._normalize(name))
+        return data if data is MISS else json.loads(data)
+
+    def set_synonyms(self, name: str, synonyms: List[str]) -> None:
+        """Cache synonyms; an empty list uses the negative TTL."""
+        ttl = self.ttl if synonyms else self.negative_ttl
+        self._put('name_synonyms', 'name', 'data', self._normalize(name),
+                  json.dumps(synonyms), ttl)
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        conn = self._connection()
+        removed = 0
+        with conn:
+            for table in self.TABLES:
+                removed += conn.execute(
+                    f"DELETE FROM {table} WHERE expires_at <= ?", (time.time(),)
+                ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-table hit/miss counters for this process."""
+        with self._stats_lock:
+            stats = {table: dict(counts) for table, counts in self._stats.items()}
+        hits = sum(s['hits'] for s in stats.values())
+        lookups = hits + sum(s['misses'] for s in stats.values())
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
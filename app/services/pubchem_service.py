@@ -1,53 +1,154 @@
+import os
 import requests
-import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import logging
+from app.services.compound_store import CompoundStore
+from app.services.pubchem_cache import PubChemCache, MISS
+from app.utils.rate_limiter import TokenBucketRateLimiter
 
 logger = logging.getLogger(__name__)
 
 class PubChemService:
     BASE_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
     RATE_LIMIT = 0.2  # 5 requests per second = 0.2 seconds between requests
+    RATE_BURST = 5  # requests allowed back to back after an idle period
+    PROPERTY_FIELDS = "MolecularFormula,MolecularWeight,CanonicalSMILES"
     
-    def __init__(self):
+    # For MVP, a hardcoded herb -> compound name mapping
+    HERB_COMPOUNDS = {
+        'ashwagandha': ['withaferin', 'withanolide'],
+        'turmeric': ['curcumin'],
+        'tulsi': ['eugenol', 'ursolic acid'],
+        'ginger': ['gingerol', 'shogaol'],
+        'black pepper': ['piperine'],
+        'neem': ['azadirachtin', 'nimbin'],
+        'amla': ['vitamin c', 'ellagic acid'],
+        'brahmi': ['bacosides'],
+        'guduchi': ['berberine', 'tinosporin'],
+        'cardamom': ['cineole', 'limonene'],
+        'cinnamon': ['cinnamaldehyde', 'eugenol'],
+        'cumin': ['cuminaldehyde'],
+        'coriander': ['linalool'],
+        'fennel': ['anethole'],
+        'clove': ['eugenol'],
+        'garlic': ['allicin'],
+        'licorice': ['glycyrrhizin'],
+        'saffron': ['crocin', 'crocetin']
+    }
+    
+    def __init__(self, cache_path: Optional[str] = None,
+                 cache_ttl: float = 30 * 86400, negative_ttl: float = 86400,
+                 property_batch_size: int = 100,
+                 rate_limit_state_path: Optional[str] = None,
+                 rate_burst: Optional[int] = None,
+                 max_connections: int = 10,
+                 base_url: Optional[str] = None,
+                 compound_db_path: Optional[str] = None,
+                 offline: bool = False):
+        self.base_url = base_url or self.BASE_URL
         self.session = requests.Session()
-        self.last_request_time = 0
+        # Keep-alive pool large enough for concurrent lookups (see pubchem_async)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_connections)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.property_batch_size = property_batch_size
+        # One token bucket per host when rate_limit_state_path is shared
+        self.rate_limiter = TokenBucketRateLimiter(
+            rate=1 / self.RATE_LIMIT,
+            capacity=rate_burst or self.RATE_BURST,
+            state_path=rate_limit_state_path
+        )
+        self.cache = None
+        if cache_path:
+            try:
+                self.cache = PubChemCache(cache_path, cache_ttl, negative_ttl)
+            except Exception as e:
+                logger.warning(f"PubChem cache unavailable, querying live: {e}")
+        # Local compound database (import_compounds.py); consulted before
+        # the cache and the network. offline=True never leaves the host.
+        self.offline = offline
+        self.compound_store = None
+        if compound_db_path and os.path.exists(compound_db_path):
+            try:
+                self.compound_store = CompoundStore(compound_db_path)
+            except Exception as e:
+                logger.warning(f"Compound database unavailable: {e}")
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return cache hit/miss counters (empty if caching is disabled)."""
+        return self.cache.stats() if self.cache else {}
+    
+    def compound_store_stats(self) -> Dict[str, Any]:
+        """Return local compound database counters (empty if none loaded)."""
+        return self.compound_store.stats() if self.compound_store else {}
+    
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        """Return rate limiter wait-time metrics."""
+        return self.rate_limiter.stats()
     
     def _rate_limit(self):
-        """Enforce rate limiting."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.RATE_LIMIT:
-            time.sleep(self.RATE_LIMIT - elapsed)
-        self.last_request_time = time.time()
+        """Enforce rate limiting (thread- and process-safe token bucket)."""
+        self.rate_limiter.acquire()
     
     def search_compound(self, compound_name: str) -> Optional[int]:
         """Search for compound and return CID."""
+        if self.compound_store:
+            cid = self.compound_store.get_cid(compound_name)
+            if cid:
+                return cid
+        
+        if self.cache:
+            cached = self.cache.get_cid(compound_name)
+            if cached is not MISS:
+                return cached
+        
+        if self.offline:
+            return None
+        
         self._rate_limit()
         
-        url = f"{self.BASE_URL}/compound/name/{compound_name}/cids/JSON"
+        url = f"{self.base_url}/compound/name/{compound_name}/cids/JSON"
         
         try:
             response = self.session.get(url, timeout=10)
+            if response.status_code == 404:
+                # PubChem has no such name; remember that too
+                if self.cache:
+                    self.cache.set_cid(compound_name, None)
+                return None
             response.raise_for_status()
             data = response.json()
             
+            cid = None
             if 'IdentifierList' in data:
                 cid = data['IdentifierList']['CID'][0]
                 logger.info(f"Found CID {cid} for {compound_name}")
-                return cid
             
-            return None
+            if self.cache:
+                self.cache.set_cid(compound_name, cid)
+            return cid
         except requests.exceptions.RequestException as e:
             logger.error(f"PubChem API error for {compound_name}: {e}")
             return None
     
     def get_compound_properties(self, cid: int) -> Dict[str, Any]:
         """Get compound properties by CID."""
+        if self.compound_store:
+            stored = self.compound_store.get_properties(cid)
+            if stored:
+                return stored
+        
+        if self.cache:
+            cached = self.cache.get_properties(cid)
+            if cached is not MISS:
+                return cached
+        
+        if self.offline:
+            return {}
+        
         self._rate_limit()
         
-        url = (f"{self.BASE_URL}/compound/cid/{cid}/"
-               f"property/MolecularFormula,MolecularWeight,"
-               f"CanonicalSMILES/JSON")
+        url = f"{self.base_url}/compound/cid/{cid}/property/{self.PROPERTY_FIELDS}/JSON"
         
         try:
             response = self.session.get(url, timeout=10)
@@ -55,82 +156,191 @@ class PubChemService:
             data = response.json()
             
             if 'PropertyTable' in data:
-                props = data['PropertyTable']['Properties'][0]
-                return {
-                    'cid': props['CID'],
-                    'molecular_formula': props.get('MolecularFormula'),
-                    'molecular_weight': props.get('MolecularWeight'),
-                    'smiles': props.get('CanonicalSMILES')
-                }
+                properties = self._parse_properties(data['PropertyTable']['Properties'][0])
+                if self.cache:
+                    self.cache.set_properties(cid, properties)
+                return properties
             
             return {}
         except requests.exceptions.RequestException as e:
             logger.error(f"Error getting properties for CID {cid}: {e}")
             return {}
     
+    @staticmethod
+    def _parse_properties(props: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a PUG REST property record to our compound dict."""
+        return {
+            'cid': props['CID'],
+            'molecular_formula': props.get('MolecularFormula'),
+            'molecular_weight': props.get('MolecularWeight'),
+            'smiles': props.get('CanonicalSMILES')
+        }
+    
+    def get_compound_properties_bulk(self, cids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Get properties for many CIDs using comma-separated CID requests.
+        
+        Cached CIDs are served locally; the rest are fetched in batches of
+        property_batch_size. CIDs PubChem does not return are omitted.
+        """
+        results, missing = self.uncached_cids(cids)
+        for batch in self.property_batches(missing):
+            results.update(self.fetch_property_batch(batch))
+        
+        return results
+    
+    def uncached_cids(self, cids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        """Split CIDs into locally known properties and a list of CIDs to fetch."""
+        cached_properties = {}
+        missing = []
+        for cid in dict.fromkeys(int(c) for c in cids):
+            stored = self.compound_store.get_properties(cid) if self.compound_store else None
+            if stored:
+                cached_properties[cid] = stored
+                continue
+            cached = self.cache.get_properties(cid) if self.cache else MISS
+            if cached is not MISS:
+                cached_properties[cid] = cached
+            else:
+                missing.append(cid)
+        return cached_properties, missing
+    
+    def property_batches(self, cids: List[int]) -> List[List[int]]:
+        """Split CIDs into request-sized batches."""
+        return [cids[start:start + self.property_batch_size]
+                for start in range(0, len(cids), self.property_batch_size)]
+    
+    def fetch_property_batch(self, batch: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch properties for one batch of CIDs in a single request."""
+        if self.offline:
+            return {}
+        
+        self._rate_limit()
+        
+        results = {}
+        cid_list = ','.join(str(cid) for cid in batch)
+        url = f"{self.base_url}/compound/cid/{cid_list}/property/{self.PROPERTY_FIELDS}/JSON"
+        
+        try:
+            response = self.session.get(url, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            
+            for props in data.get('PropertyTable', {}).get('Properties', []):
+                properties = self._parse_properties(props)
+                results[properties['cid']] = properties
+                if self.cache:
+                    self.cache.set_properties(properties['cid'], properties)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error getting properties for CIDs {cid_list}: {e}")
+        
+        return results
+    
     def search_herb_compounds(self, herb_name: str) -> List[Dict[str, Any]]:
         """Search for common compounds in an herb."""
-        # For MVP, you might have a hardcoded mapping
-        # or use a simple search strategy
-        compound_mappings = {
-            'ashwagandha': ['withaferin', 'withanolide'],
-            'turmeric': ['curcumin'],
-            'tulsi': ['eugenol', 'ursolic acid'],
-            'ginger': ['gingerol', 'shogaol'],
-            'black pepper': ['piperine'],
-            'neem': ['azadirachtin', 'nimbin'],
-            'amla': ['vitamin c', 'ellagic acid'],
-            'brahmi': ['bacosides'],
-            'guduchi': ['berberine', 'tinosporin'],
-            'cardamom': ['cineole', 'limonene'],
-            'cinnamon': ['cinnamaldehyde', 'eugenol'],
-            'cumin': ['cuminaldehyde'],
-            'coriander': ['linalool'],
-            'fennel': ['anethole'],
-            'clove': ['eugenol'],
-            'garlic': ['allicin'],
-            'licorice': ['glycyrrhizin'],
-            'saffron': ['crocin', 'crocetin']
-        }
+        return self.search_compounds_for_herbs([herb_name])[herb_name]
+    
+    def search_compounds_for_herbs(self, herb_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Search compounds for several herbs with as few requests as possible.
+        
+        Every compound name is resolved once, even if several herbs share
+        it, and all properties are fetched with bulk CID requests.
+        """
+        compound_names = self.herb_compound_names(herb_names)
         
-        herb_lower = herb_name.lower()
-        compounds = []
+        cids = {}
+        for names in compound_names.values():
+            for compound_name in names:
+                if compound_name not in cids:
+                    cids[compound_name] = self.search_compound(compound_name)
         
-        if herb_lower in compound_mappings:
-            for compound_name in compound_mappings[herb_lower]:
-                cid = self.search_compound(compound_name)
+        properties = self.get_compound_properties_bulk(
+            [cid for cid in cids.values() if cid]
+        )
+        
+        return self.assemble_herb_compounds(compound_names, cids, properties)
+    
+    def herb_compound_names(self, herb_names: List[str]) -> Dict[str, List[str]]:
+        """Map each herb to the compound names to look up for it.
+        
+        Herbs missing from HERB_COMPOUNDS fall back to the compounds the
+        local database lists for them.
+        """
+        compound_names = {}
+        for herb_name in herb_names:
+            names = self.HERB_COMPOUNDS.get(herb_name.lower(), [])
+            if not names and self.compound_store:
+                names = [compound['name'] for compound in
+                         self.compound_store.compounds_for_herb(herb_name)
+                         if compound['name']]
+            compound_names[herb_name] = names
+        return compound_names
+    
+    @staticmethod
+    def assemble_herb_compounds(compound_names: Dict[str, List[str]],
+                                cids: Dict[str, Optional[int]],
+                                properties: Dict[int, Dict[str, Any]]
+                                ) -> Dict[str, List[Dict[str, Any]]]:
+        """Build per-herb compound lists from resolved CIDs and properties."""
+        results = {}
+        for herb_name, names in compound_names.items():
+            compounds = []
+            for compound_name in names:
+                cid = cids[compound_name]
                 if cid:
-                    props = self.get_compound_properties(cid)
+                    props = dict(properties.get(cid, {'cid': cid}))
+                    props.setdefault('name', compound_name)
                     props['source_herb'] = herb_name
                     compounds.append(props)
+            results[herb_name] = compounds
         
-        return compounds
+        return results
     
     def get_compound_synonyms(self, compound_name: str) -> List[str]:
         """Get synonyms for a compound from PubChem."""
+        if self.compound_store:
+            compound = self.compound_store.find_by_name(compound_name)
+            if compound and compound['synonyms']:
+                return compound['synonyms'][:10]
+        
+        if self.cache:
+            cached = self.cache.get_synonyms(compound_name)
+            if cached is not MISS:
+                return cached
+        
+        if self.offline:
+            return []
+        
         self._rate_limit()
         
         try:
-            url = f"{self.BASE_URL}/compound/name/{compound_name}/synonyms/JSON"
+            url = f"{self.base_url}/compound/name/{compound_name}/synonyms/JSON"
             response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
             
-            if 'InformationList' in data and 'Information' in data['InformationList']:
-                synonyms = data['InformationList']['Information'][0].get('Synonym', [])
-                return synonyms[:10]  # Return first 10 synonyms
+            synonyms = []
+            if response.status_code != 404:
+                response.raise_for_status()
+                data = response.json()
+                
+                if 'InformationList' in data and 'Information' in data['InformationList']:
+                    synonyms = data['InformationList']['Information'][0].get('Synonym', [])
+                    synonyms = synonyms[:10]  # Return first 10 synonyms
             
-            return []
+            if self.cache:
+                self.cache.set_synonyms(compound_name, synonyms)
+            return synonyms
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching synonyms for {compound_name}: {e}")
             return []
     
     def get_bioactivity_data(self, compound_name: str) -> Dict[str, Any]:
         """Get bioactivity data for a compound (simplified version)."""
+        if self.offline:
+            return {'bioactivity_available': False}
+        
         self._rate_limit()
         
         try:
-            url = f"{self.BASE_URL}/compound/name/{compound_name}/property/MolecularWeight,LogP/JSON"
+            url = f"{self.base_url}/compound/name/{compound_name}/property/MolecularWeight,LogP/JSON"
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
             data = response.json()
@@ -0,0 +1,424 @@
+import copy
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+from app.utils.lexicon import LexiconMatcher
+
+logger = logging.getLogger(__name__)
+
+# Built-in rule tables. 'key' tables map one normalized term to a rule and
+# keep their order (first match wins where callers scan them); 'pair' tables
+# hold unordered pairs of terms
+DEFAULT_RULES = {
+    'property_bioactivity': {
+        'kind': 'key',
+        'rules': {
+            'tikta': {  # Bitter taste
+                'likely_properties': ['anti-inflammatory', 'antimicrobial'],
+                'mechanism': 'Bitter compounds often contain alkaloids and polyphenols'
+            },
+            'ushna': {  # Heating potency
+                'likely_properties': ['metabolism-enhancing', 'circulation-improving'],
+                'mechanism': 'Heating herbs typically contain thermogenic compounds'
+            },
+            'kashaya': {  # Astringent taste
+                'likely_properties': ['antioxidant', 'wound-healing'],
+                'mechanism': 'Astringent taste indicates presence of tannins'
+            },
+            'madhura': {  # Sweet taste
+                'likely_properties': ['nutritive', 'tonic'],
+                'mechanism': 'Sweet compounds often have nutritive and tonic properties'
+            },
+            'katu': {  # Pungent taste
+                'likely_properties': ['digestive', 'antimicrobial'],
+                'mechanism': 'Pungent compounds often have digestive and antimicrobial properties'
+            },
+            'amla': {  # Sour taste
+                'likely_properties': ['antioxidant', 'digestive'],
+                'mechanism': 'Sour compounds often contain organic acids with antioxidant properties'
+            }
+        }
+    },
+    'guna_bioactivity': {
+        'kind': 'key',
+        'rules': {
+            'guru': {  # Heavy quality
+                'likely_properties': ['nourishing', 'grounding'],
+                'mechanism': 'Heavy compounds often have nutritive and grounding effects'
+            },
+            'laghu': {  # Light quality
+                'likely_properties': ['digestive', 'metabolic'],
+                'mechanism': 'Light compounds often enhance digestion and metabolism'
+            },
+            'snigdha': {  # Oily quality
+                'likely_properties': ['lubricating', 'nourishing'],
+                'mechanism': 'Oily compounds often provide lubrication and nourishment'
+            },
+            'ruksha': {  # Dry quality
+                'likely_properties': ['astringent', 'absorbing'],
+                'mechanism': 'Dry compounds often have astringent and absorbing properties'
+            },
+            'tiksna': {  # Sharp quality
+                'likely_properties': ['penetrating', 'stimulating'],
+                'mechanism': 'Sharp compounds often have penetrating and stimulating effects'
+            },
+            'manda': {  # Dull quality
+                'likely_properties': ['calming', 'soothing'],
+                'mechanism': 'Dull compounds often have calming and soothing effects'
+            }
+        }
+    },
+    'compound_synergies': {
+        'kind': 'pair',
+        'rules': [
+            {
+                'pair': ['curcumin', 'piperine'],
+                'mechanism': 'Piperine enhances curcumin bioavailability by inhibiting glucuronidation',
+                'evidence': 'Piperine increases curcumin absorption by up to 2000%',
+                'clinical_significance': 'Enhanced anti-inflammatory and antioxidant effects'
+            },
+            {
+                'pair': ['gingerol', 'allicin'],
+                'mechanism': 'Combined anti-inflammatory and cardiovascular protective effects',
+                'evidence': 'Synergistic reduction in inflammatory markers',
+                'clinical_significance': 'Enhanced cardiovascular and immune system support'
+            },
+            {
+                'pair': ['withanolides', 'bacosides'],
+                'mechanism': 'Complementary adaptogenic and neuroprotective effects',
+                'evidence': 'Enhanced stress reduction and cognitive function',
+                'clinical_significance': 'Improved mental clarity and stress resilience'
+            }
+        ]
+    },
+    'herb_synergies': {
+        'kind': 'pair',
+        'rules': [
+            {
+                'pair': ['turmeric', 'black pepper'],
+                'mechanism': 'Piperine enhances curcumin bioavailability by inhibiting glucuronidation',
+                'evidence': 'Piperine increases curcumin absorption by up to 2000%',
+                'clinical_significance': 'Enhanced anti-inflammatory and antioxidant effects'
+            },
+            {
+                'pair': ['ginger', 'garlic'],
+                'mechanism': 'Combined anti-inflammatory and cardiovascular protective effects',
+                'evidence': 'Synergistic reduction in inflammatory markers',
+                'clinical_significance': 'Enhanced cardiovascular and immune system support'
+            },
+            {
+                'pair': ['ashwagandha', 'brahmi'],
+                'mechanism': 'Complementary adaptogenic and neuroprotective effects',
+                'evidence': 'Enhanced stress reduction and cognitive function',
+                'clinical_significance': 'Improved mental clarity and stress resilience'
+            }
+        ]
+    },
+    'compound_interactions': {
+        'kind': 'pair',
+        'rules': [
+            {
+                'pair': ['curcumin', 'piperine'],
+                'mechanism': 'Bioavailability enhancement',
+                'effect': 'Piperine inhibits curcumin metabolism, increasing absorption'
+            },
+            {
+                'pair': ['gingerol', 'allicin'],
+                'mechanism': 'Anti-inflammatory synergy',
+                'effect': 'Combined COX-2 inhibition and antioxidant activity'
+            },
+            {
+                'pair': ['withanolides', 'bacosides'],
+                'mechanism': 'Neuroprotective synergy',
+                'effect': 'Complementary stress reduction and cognitive enhancement'
+            }
+        ]
+    },
+    'rasa_correlations': {
+        'kind': 'key',
+        'rules': {
+            'bitter': {
+                'compounds': ['alkaloids', 'glycosides', 'terpenoids'],
+                'modern_understanding': 'Bitter compounds often have strong pharmacological activity',
+                'examples': ['curcumin', 'piperine', 'withanolides']
+            },
+            'pungent': {
+                'compounds': ['volatile oils', 'phenolic compounds'],
+                'modern_understanding': 'Pungent compounds often have antimicrobial and digestive properties',
+                'examples': ['gingerol', 'piperine', 'eugenol']
+            },
+            'sweet': {
+                'compounds': ['sugars', 'glycosides', 'triterpenes'],
+                'modern_understanding': 'Sweet compounds often have nutritive and tonic properties',
+                'examples': ['glycyrrhizin', 'saponins']
+            }
+        }
+    },
+    'guna_correlations': {
+        'kind': 'key',
+        'rules': {
+            'hot': {
+                'modern_understanding': 'Hot guna correlates with compounds that increase metabolism and circulation',
+                'compounds': ['capsaicinoids', 'piperine', 'gingerol'],
+                'mechanism': 'Thermogenic and vasodilatory effects'
+            },
+            'cold': {
+                'modern_understanding': 'Cold guna correlates with compounds that have cooling and anti-inflammatory effects',
+                'compounds': ['menthol', 'camphor', 'eugenol'],
+                'mechanism': 'Anti-inflammatory and cooling effects'
+            },
+            'dry': {
+                'modern_understanding': 'Dry guna correlates with compounds that have astringent properties',
+                'compounds': ['tannins', 'phenolic compounds'],
+                'mechanism': 'Astringent and tissue-drying effects'
+            },
+            'oily': {
+                'modern_understanding': 'Oily guna correlates with lipid-soluble compounds',
+                'compounds': ['fatty acids', 'terpenes', 'sterols'],
+                'mechanism': 'Lipid-soluble absorption and tissue lubrication'
+            }
+        }
+    },
+    'therapeutic_correlations': {
+        'kind': 'key',
+        'rules': {
+            'anti-inflammatory': {
+                'modern_compounds': ['curcumin', 'gingerol', 'eugenol', 'ursolic acid'],
+                'mechanism': 'COX-2 inhibition, NF-κB pathway modulation',
+                'evidence': 'Well-documented anti-inflammatory activity in modern research'
+            },
+            'antioxidant': {
+                'modern_compounds': ['curcumin', 'vitamin C', 'ellagic acid', 'rosmarinic acid'],
+                'mechanism': 'Free radical scavenging, antioxidant enzyme induction',
+                'evidence': 'Strong antioxidant activity demonstrated in vitro and in vivo'
+            },
+            'antimicrobial': {
+                'modern_compounds': ['allicin', 'eugenol', 'azadirachtin', 'piperine'],
+                'mechanism': 'Cell membrane disruption, enzyme inhibition',
+                'evidence': 'Broad-spectrum antimicrobial activity against bacteria and fungi'
+            },
+            'adaptogenic': {
+                'modern_compounds': ['withanolides', 'bacosides', 'ginsenosides'],
+                'mechanism': 'HPA axis modulation, stress response regulation',
+                'evidence': 'Stress-reducing and performance-enhancing effects'
+            }
+        }
+    },
+    'dosha_implications': {
+        'kind': 'key',
+        'rules': {
+            'vata': {'implication': 'Calming, grounding, stress reduction, nervous system support'},
+            'pitta': {'implication': 'Cooling, anti-inflammatory, digestive support, liver health'},
+            'kapha': {'implication': 'Stimulating, expectorant, metabolic enhancement, weight management'},
+            'all three doshas': {'implication': 'Balancing, rejuvenative, comprehensive health support'}
+        }
+    },
+    'rgv_patterns': {
+        'kind': 'key',
+        'rules': {
+            'pungent-hot-sharp': {
+                'pattern': ['pungent', 'hot', 'sharp'],
+                'significance': 'Strong digestive and metabolic stimulation',
+                'therapeutic_potential': 'Digestive disorders, respiratory conditions, circulation'
+            },
+            'bitter-cold-light': {
+                'pattern': ['bitter', 'cold', 'light'],
+                'significance': 'Cooling and detoxifying properties',
+                'therapeutic_potential': 'Inflammation, fever, detoxification'
+            },
+            'sweet-heavy-cold': {
+                'pattern': ['sweet', 'heavy', 'cold'],
+                'significance': 'Nourishing and cooling properties',
+                'therapeutic_potential': 'Debility, inflammation, nourishment'
+            }
+        }
+    }
+}
+
+TABLE_KINDS = ('key', 'pair')
+
+Pair = Tuple[str, str]
+
+def normalize_key(term: str) -> str:
+    """Lookup form of a rule term: lowercased with whitespace collapsed."""
+    return ' '.join(str(term).lower().split())
+
+def pair_key(a: str, b: str) -> Pair:
+    """Order-independent key for a pair of terms."""
+    a, b = normalize_key(a), normalize_key(b)
+    return (a, b) if a <= b else (b, a)
+
+class _Table:
+    """One compiled rule table and its lookup indexes."""
+
+    def __init__(self, name: str, kind: str):
+        if kind not in TABLE_KINDS:
+            raise ValueError(f"Rule table {name!r} has unknown kind {kind!r}; use one of {TABLE_KINDS}")
+        self.name = name
+        self.kind = kind
+        self.rules: Dict[Any, Dict[str, Any]] = {}
+        # pair tables: term -> {partner: pair key}, and the pair as written
+        self.partners: Dict[str, Dict[str, Pair]] = {}
+        self.members: Dict[Pair, Tuple[str, str]] = {}
+        self.position: Dict[Pair, int] = {}
+        self._matcher: Optional[LexiconMatcher] = None
+
+    def add(self, entry: Any, rule: Dict[str, Any]) -> None:
+        if self.kind == 'key':
+            self.rules[normalize_key(entry)] = rule
+            return
+        if len(entry) != 2:
+            raise ValueError(f"Rule table {self.name!r}: pair rules need exactly two terms, got {entry!r}")
+        key = pair_key(*entry)
+        self.rules[key] = rule
+        self.members[key] = (normalize_key(entry[0]), normalize_key(entry[1]))
+        self.position.setdefault(key, len(self.position))
+        self.partners.setdefault(key[0], {})[key[1]] = key
+        self.partners.setdefault(key[1], {})[key[0]] = key
+        self._matcher = None
+
+    def matcher(self) -> LexiconMatcher:
+        """Whole-word matcher over the terms of a pair table, built on first use."""
+        if self._matcher is None:
+            matcher = LexiconMatcher()
+            for term in self.partners:
+                matcher.add(term, term)
+            # Built before it is shared, so concurrent readers never see a partial automaton
+            matcher.build()
+            self._matcher = matcher
+        return self._matcher
+
+class RuleStore:
+    """Hypothesis rule tables, compiled once and indexed by normalized term.
+
+    Key tables map a term (a rasa, guna, therapeutic action, ...) to its
+    rule; pair tables map an unordered pair of terms (two herbs or two
+    compounds) to the rule for that combination, with a per-term partner
+    index so pairs can be found without scanning the table. Rules come from
+    DEFAULT_RULES and, optionally, JSON data files of the same shape::
+
+        {"compound_interactions": {"kind": "pair", "rules": [
+            {"pair": ["curcumin", "piperine"], "mechanism": "...", "effect": "..."}]},
+         "rasa_correlations": {"kind": "key", "rules": {"bitter": {...}}}}
+
+    A file's rules are added to (or override) the table of the same name.
+    ``version`` increases with every load so callers can key caches on it.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, Dict[str, Any]]] = None):
+        self._lock = threading.RLock()
+        self._tables: Dict[str, _Table] = {}
+        self.version = 0
+        self.sources: List[str] = []
+        self.update(DEFAULT_RULES if tables is None else tables)
+
+    @classmethod
+    def from_file(cls, path: str, include_defaults: bool = True) -> 'RuleStore':
+        """Store with the rules in ``path``, on top of the built-in ones by default."""
+        store = cls(None if include_defaults else {})
+        store.load(path)
+        return store
+
+    def load(self, path: str) -> None:
+        """Add the tables of a JSON rule file."""
+        with open(path, 'r', encoding='utf-8') as handle:
+            tables = json.load(handle)
+        if not isinstance(tables, dict):
+            raise ValueError(f"Rule file {path} must hold an object of tables")
+        self.update(tables)
+        self.sources.append(path)
+        logger.info(f"Loaded {sum(len(t.get('rules', ())) for t in tables.values())} "
+                    f"hypothesis rules from {path}")
+
+    def update(self, tables: Dict[str, Dict[str, Any]]) -> None:
+        """Add or override rules from a table name -> {kind, rules} mapping."""
+        with self._lock:
+            for name, spec in tables.items():
+                kind = spec.get('kind', 'key')
+                table = self._tables.get(name)
+                if table is None:
+                    table = self._tables[name] = _Table(name, kind)
+                elif table.kind != kind:
+                    raise ValueError(f"Rule table {name!r} is a {table.kind} table, not {kind}")
+                rules = spec.get('rules', {})
+                if kind == 'key':
+                    for term, rule in rules.items():
+                        table.add(term, copy.deepcopy(rule))
+                else:
+                    for rule in rules:
+                        rule = copy.deepcopy(rule)
+                        table.add(rule.pop('pair'), rule)
+            self.version += 1
+
+    def _table(self, name: str) -> Optional[_Table]:
+        return self._tables.get(name)
+
+    def get(self, table: str, term: str) -> Optional[Dict[str, Any]]:
+        """Rule for one term of a key table."""
+        rules = self._table(table)
+        return rules.rules.get(normalize_key(term)) if rules else None
+
+    def items(self, table: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """(term, rule) pairs of a key table in their defined order."""
+        rules = self._table(table)
+        return list(rules.rules.items()) if rules else []
+
+    def pair(self, table: str, a: str, b: str) -> Optional[Dict[str, Any]]:
+        """Rule for a pair of terms, in either order."""
+        rules = self._table(table)
+        return rules.rules.get(pair_key(a, b)) if rules else None
+
+    def partners(self, table: str, term: str) -> Dict[str, Pair]:
+        """Terms paired with ``term`` in a pair table, mapped to the pair key."""
+        rules = self._table(table)
+        return rules.partners.get(normalize_key(term), {}) if rules else {}
+
+    def find_terms(self, table: str, texts: Iterable[str]) -> Set[str]:
+        """Terms of a pair table that occur (as whole words) in any of ``texts``."""
+        rules = self._table(table)
+        if rules is None or rules.kind != 'pair':
+            return set()
+        matcher = rules.matcher()
+        return {match.canonical for text in texts for match in matcher.find_all(text or '')}
+
+    def find_pairs(self, table: str,
+                   texts: Iterable[str]) -> List[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        """Pairs whose two terms both occur (as whole words) somewhere in ``texts``.
+
+        Returns ((term, term) as written in the rule, rule) in table order.
+        One automaton pass per text finds the terms present; pairs are then
+        read off the partner index rather than checking every rule.
+        """
+        present = self.find_terms(table, texts)
+        if not present:
+            return []
+        rules = self._tables[table]
+        keys = {key for term in present
+                for partner, key in rules.partners[term].items() if partner in present}
+        return [(rules.members[key], rules.rules[key])
+                for key in sorted(keys, key=rules.position.__getitem__)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Rule counts per table, the store version and the loaded files."""
+        with self._lock:
+            return {
+                'version': self.version,
+                'tables': {name: len(table.rules) for name, table in self._tables.items()},
+                'sources': list(self.sources)
+            }
+
+_shared_stores: Dict[Optional[str], RuleStore] = {}
+_shared_lock = threading.Lock()
+
+def get_rule_store(path: Optional[str] = None) -> RuleStore:
+    """Process-wide store of the built-in rules plus those in ``path``.
+
+    Each distinct path is loaded once; later calls reuse the compiled store.
+    """
+    with _shared_lock:
+        store = _shared_stores.get(path)
+        if store is None:
+            store = RuleStore.from_file(path) if path else RuleStore()
+            _shared_stores[path] = store
+        return store
@@ -0,0 +1,206 @@
+"""
+Streaming row reader for the zipped datasets shipped with the repo
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+LFS_POINTER_PREFIX = b'version https://git-lfs'
+
+TABULAR_DELIMITERS = {'.csv': ',', '.tsv': '\t', '.txt': '\t'}
+
+# Keys of a JSON object that wrap the record list rather than name a group
+RECORD_LIST_KEYS = {'data', 'records', 'rows', 'items', 'results', 'compounds', 'herbs'}
+
+_KEY_RE = re.compile(r'[^a-z0-9]')
+
+JSON_WHITESPACE = ' \t\r\n'
+
+
+def normalize_key(key: str) -> str:
+    """Fold a column header for alias lookup: 'Pubchem CID' -> 'pubchemcid'."""
+    return _KEY_RE.sub('', (key or '').lower())
+
+
+def check_archive(path: str) -> None:
+    """Raise a helpful error if ``path`` is missing, an LFS pointer or not a zip."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dataset archive not found: {path}")
+    with open(path, 'rb') as handle:
+        head = handle.read(len(LFS_POINTER_PREFIX))
+    if head == LFS_POINTER_PREFIX:
+        raise ValueError(f"{path} is a Git LFS pointer, not the dataset; "
+                         f"run 'git lfs pull' to fetch it")
+    if not zipfile.is_zipfile(path):
+        raise ValueError(f"{path} is not a zip archive")
+
+
+class _JSONReader:
+    """Incremental reader for the outer arrays and objects of a JSON document.
+
+    Only one element (a record) is decoded at a time, with
+    ``json.JSONDecoder.raw_decode`` over a buffer refilled in
+    ``chunk_size`` pieces, so a member never has to fit in memory.
+    """
+
+    def __init__(self, text: io.TextIOBase, chunk_size: int = 65536):
+        self._text = text
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping what was consumed; False at end of input."""
+        if self._eof:
+            return False
+        chunk = self._text.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character ('' at end of input)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in JSON_WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Malformed JSON: expected one of {chars!r}, found {char!r}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the complete value starting at the next character."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """Yield the elements of the array starting at the next character."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def keys(self) -> Iterator[str]:
+        """Yield the keys of the object starting at the next character.
+
+        The caller consumes each key's value before asking for the next.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError(f"Malformed JSON: expected an object key, found {self.peek()!r}")
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def _iter_json_rows(text: io.TextIOBase, chunk_size: int = 65536) -> Iterator[Dict[str, Any]]:
+    """Yield records of a JSON member one at a time.
+
+    Accepts ``[...]``, ``{"records": [...]}`` and ``{"<herb>": [...]}``
+    layouts. Non-list values of other keys are held back and only yielded
+    as group rows if no record-list key turned up, and group lists after a
+    record list are skipped, as with a whole-document parse.
+    """
+    reader = _JSONReader(text, chunk_size)
+    if reader.peek() == '[':
+        yield from (row for row in reader.items() if isinstance(row, dict))
+        return
+    wrapped = False
+    deferred = []
+    for key in reader.keys():
+        if reader.peek() != '[':
+            deferred.append((key, reader.value()))
+        elif normalize_key(key) in RECORD_LIST_KEYS and not wrapped:
+            wrapped = True
+            yield from (row for row in reader.items() if isinstance(row, dict))
+        else:
+            for row in reader.items():
+                if isinstance(row, dict) and not wrapped:
+                    yield {'__group__': key, **row}
+    if not wrapped:
+        for key, row in deferred:
+            if isinstance(row, dict):
+                yield {'__group__': key, **row}
+
+
+def _iter_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> Iterator[Dict[str, Any]]:
+    """Yield rows from one CSV/TSV/JSON/JSON-lines member without extracting it."""
+    extension = os.path.splitext(info.filename)[1].lower()
+    with archive.open(info) as raw:
+        if extension in TABULAR_DELIMITERS:
+            with archive.open(info) as probe:
+                sample = probe.read(4096).decode('utf-8-sig', errors='replace')
+            text = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=',\t;|').delimiter
+            except csv.Error:
+                delimiter = TABULAR_DELIMITERS[extension]
+            yield from csv.DictReader(text, delimiter=delimiter)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line in io.TextIOWrapper(raw, encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line)
+        elif extension == '.json':
+            yield from _iter_json_rows(io.TextIOWrapper(raw, encoding='utf-8-sig'))
+
+
+def iter_archive_rows(path: str, start_member: Optional[str] = None
+                      ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ``(member_name, row)`` for every record in a dataset zip.
+
+    Members are read one at a time straight from the archive, and JSON
+    members are parsed one record at a time, so memory stays flat
+    regardless of archive or member size. Unsupported members are skipped,
+    as are (without decompressing them) members before ``start_member``.
+    """
+    check_archive(path)
+    with zipfile.ZipFile(path) as archive:
+        members = archive.infolist()
+        if start_member is not None:
+            names = [info.filename for info in members]
+            members = members[names.index(start_member):] if start_member in names else members
+        for info in members:
+            name = os.path.basename(info.filename)
+            if info.is_dir() or name.startswith('.') or '__MACOSX' in info.filename:
+                continue
+            for row in _iter_member(archive, info):
+                yield info.filename, row
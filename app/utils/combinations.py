@@ -0,0 +1,51 @@
+"""
+Apriori-style growth of herb combinations from pairwise synergies
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Hard cap on combination size accepted from callers
+MAX_COMBINATION_SIZE = 6
+
+Combination = Tuple[int, ...]
+
+
+def linked_combinations(pairs: Iterable[Tuple[int, int]], max_size: int = 3,
+                        max_per_level: int = 200) -> Tuple[List[Combination], bool]:
+    """Return groups of 3..max_size items in which every pair is linked.
+
+    Items are integer positions; ``pairs`` are the linked (i, j) pairs.
+    Groups are grown one size at a time, Apriori fashion: every subset of a
+    linked group is itself linked, so a k-group is only ever an extension of
+    a kept (k-1)-group by a larger item linked to all of its members, and
+    items outside that common neighbourhood are never combined. At most
+    ``max_per_level`` groups are kept per size, in lexicographic order,
+    which bounds the work for large formulations.
+
+    Returns the groups (smallest first) and whether any level was truncated.
+    """
+    max_size = min(max_size, MAX_COMBINATION_SIZE)
+    adjacency: Dict[int, Set[int]] = {}
+    for i, j in pairs:
+        if i != j:
+            adjacency.setdefault(i, set()).add(j)
+            adjacency.setdefault(j, set()).add(i)
+    level: List[Combination] = sorted({(min(i, j), max(i, j)) for i in adjacency for j in adjacency[i]})
+    groups: List[Combination] = []
+    truncated = False
+    for _ in range(3, max_size + 1):
+        next_level: List[Combination] = []
+        for group in level:
+            common = set.intersection(*(adjacency[item] for item in group))
+            extensions = sorted(item for item in common if item > group[-1])
+            room = max_per_level - len(next_level)
+            if len(extensions) > room:
+                next_level.extend(group + (item,) for item in extensions[:room])
+                truncated = True
+                break
+            next_level.extend(group + (item,) for item in extensions)
+        if not next_level:
+            break
+        groups.extend(next_level)
+        level = next_level
+    return groups, truncated
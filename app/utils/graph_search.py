@@ -0,0 +1,55 @@
+"""
+Bounded breadth-first search over the herb projection of the graph
+"""
+
+from dataclasses import dataclass, asdict
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+# Hard cap on traversal depth accepted from callers
+MAX_DEPTH = 4
+
+Via = Tuple[str, str]  # (relationship or property type, shared value)
+
+
+@dataclass(frozen=True)
+class Neighbor:
+    """A herb reached from the start herb, and the shared node that led to it."""
+    herb: str
+    depth: int
+    parent: str
+    via_type: str
+    via: str
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def bounded_bfs(start: str, expand: Callable[[str], Iterable[Tuple[str, Via]]],
+                max_depth: int = 2, fan_out: Optional[int] = None) -> Iterator[Neighbor]:
+    """Yield herbs within ``max_depth`` hops of ``start`` in BFS order.
+
+    ``expand(herb)`` lazily yields ``(other_herb, (type, value))`` for herbs
+    sharing a compound or property with ``herb``; at most ``fan_out`` new
+    herbs are taken per expanded herb. Results are produced lazily, so
+    callers can stream or slice them without walking the whole
+    neighbourhood.
+    """
+    max_depth = min(max_depth, MAX_DEPTH)
+    seen = {start}
+    frontier = [start]
+    for depth in range(1, max_depth + 1):
+        next_frontier = []
+        for herb in frontier:
+            taken = 0
+            for other, (via_type, via) in expand(herb):
+                if other in seen:
+                    continue
+                seen.add(other)
+                next_frontier.append(other)
+                yield Neighbor(other, depth, herb, via_type, via)
+                taken += 1
+                if fan_out and taken >= fan_out:
+                    break
+        if not next_frontier:
+            return
+        frontier = next_frontier
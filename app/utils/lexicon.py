@@ -0,0 +1,157 @@
+"""
+Multi-pattern herb lexicon matching (Aho-Corasick)
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class LexiconMatch:
+    """A lexicon hit in a text: canonical herb plus the matched span."""
+    canonical: str
+    text: str
+    start: int
+    end: int
+
+
+def _is_word_char(char: str) -> bool:
+    """Return True for characters that may not border a whole-word match."""
+    return char.isalnum() or char == '_'
+
+
+def _fold(text: str) -> str:
+    """Lowercase text without changing its length so offsets stay valid."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class LexiconMatcher:
+    """Aho-Corasick automaton over herb aliases.
+
+    Aliases are matched case-insensitively and only on word boundaries.
+    Overlapping hits are resolved leftmost-longest, so "black pepper" wins
+    over "pepper" and "cumin seed" over "cumin". An alias may map to more
+    than one canonical herb; each is reported for the same span.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, Iterable[str]]] = None):
+        self._patterns: Dict[str, List[str]] = {}
+        self._built = False
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._output: List[Optional[str]] = []
+        self._output_link: List[int] = []
+        if lexicon:
+            self.add_lexicon(lexicon)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def add(self, alias: str, canonical: str) -> None:
+        """Register an alias for a canonical herb name."""
+        key = _fold(alias.strip())
+        if not key:
+            return
+        canonicals = self._patterns.setdefault(key, [])
+        if canonical not in canonicals:
+            canonicals.append(canonical)
+            self._built = False
+
+    def add_lexicon(self, lexicon: Dict[str, Iterable[str]]) -> None:
+        """Register a canonical -> aliases mapping (canonical names match too)."""
+        for canonical, aliases in lexicon.items():
+            self.add(canonical, canonical)
+            for alias in aliases:
+                self.add(alias, canonical)
+
+    def build(self) -> None:
+        """Compile the automaton; called lazily by find_all if needed."""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Optional[str]] = [None]
+
+        for pattern in self._patterns:
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append(None)
+                state = next_state
+            output[state] = pattern
+
+        fail = [0] * len(goto)
+        output_link = [-1] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                link = fail[next_state]
+                output_link[next_state] = link if output[link] is not None else output_link[link]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+        self._output_link = output_link
+        self._built = True
+
+    def _scan(self, folded: str) -> List[Tuple[int, int, str]]:
+        """Return every whole-word (start, end, pattern) hit in folded text."""
+        goto, fail = self._goto, self._fail
+        output, output_link = self._output, self._output_link
+        length = len(folded)
+        hits = []
+        state = 0
+
+        for index, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            candidate = state if output[state] is not None else output_link[state]
+            if candidate <= 0:
+                continue
+            end = index + 1
+            if end < length and _is_word_char(folded[end]):
+                continue
+            while candidate > 0:
+                pattern = output[candidate]
+                start = end - len(pattern)
+                if start == 0 or not _is_word_char(folded[start - 1]):
+                    hits.append((start, end, pattern))
+                candidate = output_link[candidate]
+
+        return hits
+
+    def find_all(self, text: str) -> List[LexiconMatch]:
+        """Find non-overlapping herb mentions in one pass over the text."""
+        if not text or not self._patterns:
+            return []
+        if not self._built:
+            self.build()
+
+        hits = self._scan(_fold(text))
+        hits.sort(key=lambda hit: (hit[0], -hit[1]))
+
+        matches = []
+        covered_until = 0
+        for start, end, pattern in hits:
+            if start < covered_until:
+                continue
+            covered_until = end
+            surface = text[start:end]
+            for canonical in self._patterns[pattern]:
+                matches.append(LexiconMatch(canonical, surface, start, end))
+
+        return matches
@@ -0,0 +1,77 @@
+"""
+Thread-safe in-process LRU cache with optional TTL and hit/miss counters
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Least-recently-used mapping bounded to ``maxsize`` entries.
+
+    Entries older than ``ttl`` seconds (if given) count as misses, which
+    bounds staleness when another process changes the underlying data.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (marking it recently used) or ``default``."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self.ttl is not None and time.monotonic() > entry[1]:
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop one entry; return True if it was cached."""
+        with self._lock:
+            if self._data.pop(key, _MISSING) is _MISSING:
+                return False
+            self._stats['invalidations'] += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, hit/miss, eviction and invalidation counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['maxsize'] = self.maxsize
+        return stats
@@ -0,0 +1,128 @@
+"""
+Single-pass Ayurvedic property scanning with per-herb attribution
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+SENTENCE_END_RE = re.compile(r"[.!?;]+(?=\s|$)|\n\s*\n")
+
+
+@dataclass(frozen=True)
+class PropertyHit:
+    """A property term found in text, e.g. rasa 'tikta' from 'bitter'."""
+    category: str
+    value: str
+    start: int
+    end: int
+
+
+class PropertyScanner:
+    """Scan text once for every rasa/guna/virya term and attribute the hits
+    to the nearest herb mention.
+
+    ``vocabulary`` maps category -> value -> trigger terms. All terms are
+    compiled into one alternation. A term may belong to several categories
+    (e.g. 'hot' is both virya ushna and guna ushna); each is reported.
+
+    A hit is attributed to the nearest herb mention within
+    ``sentence_window`` sentences and, if set, ``token_window`` tokens.
+    Nearness prefers the same sentence, then a mention in an earlier sentence
+    over a later one, then token distance. Equidistant mentions all receive
+    the hit.
+    """
+
+    def __init__(self, vocabulary: Dict[str, Dict[str, List[str]]],
+                 sentence_window: int = 1,
+                 token_window: Optional[int] = None):
+        self.sentence_window = sentence_window
+        self.token_window = token_window
+        self._categories = list(vocabulary)
+        self._rank: Dict[Tuple[str, str], int] = {}
+        self._terms: Dict[str, List[Tuple[str, str]]] = {}
+
+        for category, values in vocabulary.items():
+            for value, terms in values.items():
+                self._rank[(category, value)] = len(self._rank)
+                for term in terms:
+                    self._terms.setdefault(term.lower(), []).append((category, value))
+
+        alternation = '|'.join(re.escape(term) for term in
+                               sorted(self._terms, key=len, reverse=True))
+        self._pattern = re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE)
+
+    def scan(self, text: str) -> List[PropertyHit]:
+        """Return every property hit in the text, in text order."""
+        hits = []
+        for match in self._pattern.finditer(text):
+            for category, value in self._terms[match.group().lower()]:
+                hits.append(PropertyHit(category, value, match.start(), match.end()))
+        return hits
+
+    def _collect(self, hits: Iterable[PropertyHit]) -> Dict[str, List[str]]:
+        """Group hits by category, deduplicated and in vocabulary order."""
+        pairs = sorted({(h.category, h.value) for h in hits}, key=self._rank.get)
+        collected = {category: [] for category in self._categories}
+        for category, value in pairs:
+            collected[category].append(value)
+        return collected
+
+    def properties(self, text: str) -> Dict[str, List[str]]:
+        """Return all properties mentioned anywhere in the text."""
+        return self._collect(self.scan(text))
+
+    def attribute(self, text: str,
+                  mentions: Dict[Hashable, List[Tuple[int, int]]]
+                  ) -> Dict[Hashable, Dict[str, List[str]]]:
+        """Attribute property hits to herbs.
+
+        ``mentions`` maps a herb key to its (start, end) character spans.
+        Returns the properties attributed to each herb key.
+        """
+        token_starts = [m.start() for m in TOKEN_RE.finditer(text)]
+        sentence_ends = [m.end() for m in SENTENCE_END_RE.finditer(text)]
+
+        def token_at(offset: int) -> int:
+            return max(bisect_right(token_starts, offset) - 1, 0)
+
+        def sentence_at(offset: int) -> int:
+            return bisect_right(sentence_ends, offset)
+
+        # Group mention spans by token range so equal spans share one slot
+        slots: Dict[Tuple[int, int], Tuple[int, List[Hashable]]] = {}
+        for key, spans in mentions.items():
+            for start, end in spans:
+                token_range = (token_at(start), token_at(max(end - 1, start)))
+                slot = slots.setdefault(token_range, (sentence_at(start), []))
+                if key not in slot[1]:
+                    slot[1].append(key)
+        ordered = sorted(slots.items())
+        slot_starts = [token_range[0] for token_range, _ in ordered]
+
+        attributed: Dict[Hashable, List[PropertyHit]] = {key: [] for key in mentions}
+        for hit in self.scan(text):
+            hit_token = token_at(hit.start)
+            hit_sentence = sentence_at(hit.start)
+            index = bisect_right(slot_starts, hit_token)
+
+            best_distance = None
+            best_keys: List[Hashable] = []
+            for (low, high), (sentence, keys) in ordered[max(index - 1, 0):index + 1]:
+                tokens_away = max(low - hit_token, hit_token - high, 0)
+                if abs(sentence - hit_sentence) > self.sentence_window:
+                    continue
+                if self.token_window is not None and tokens_away > self.token_window:
+                    continue
+                distance = (abs(sentence - hit_sentence), sentence > hit_sentence, tokens_away)
+                if best_distance is None or distance < best_distance:
+                    best_distance, best_keys = distance, list(keys)
+                elif distance == best_distance:
+                    best_keys.extend(k for k in keys if k not in best_keys)
+
+            for key in best_keys:
+                attributed[key].append(hit)
+
+        return {key: self._collect(hits) for key, hits in attributed.items()}
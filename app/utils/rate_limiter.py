@@ -0,0 +1,107 @@
+"""
+Token-bucket rate limiting shared across threads and worker processes
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process limiting
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_STATE = struct.Struct('dd')  # (tokens, timestamp)
+
+
+class TokenBucketRateLimiter:
+    """Token bucket allowing ``rate`` requests/second with bursts up to
+    ``capacity``.
+
+    With a ``state_path`` the bucket lives in a small file guarded by
+    ``flock``, so every process on the host draws from the same budget.
+    Callers reserve tokens up front (the balance may go negative) and then
+    sleep outside the lock, so waiters queue in order without spinning.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0,
+                 state_path: Optional[str] = None):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.state_path = state_path if fcntl else None
+        if state_path and not fcntl:
+            logger.warning("fcntl unavailable; rate limit is per process only")
+
+        self._lock = threading.Lock()
+        self._fd = None
+        self._fd_pid = None
+        self._tokens = capacity
+        self._timestamp = time.time()
+        self._stats = {'acquired': 0, 'waits': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    def _file(self) -> int:
+        """Return a descriptor for the state file, reopened after fork.
+
+        flock locks belong to the open file description, which a forked
+        child shares with its parent, so each process needs its own.
+        """
+        if self._fd is None or self._fd_pid != os.getpid():
+            self._fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._fd_pid = os.getpid()
+        return self._fd
+
+    def _reserve(self, tokens: float, now: float) -> float:
+        """Take tokens from (tokens, timestamp) state; return the wait."""
+        if self.state_path:
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                raw = os.pread(fd, _STATE.size, 0)
+                if len(raw) == _STATE.size:
+                    self._tokens, self._timestamp = _STATE.unpack(raw)
+                else:
+                    self._tokens, self._timestamp = self.capacity, now
+                wait = self._take(tokens, now)
+                os.pwrite(fd, _STATE.pack(self._tokens, self._timestamp), 0)
+                return wait
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        return self._take(tokens, now)
+
+    def _take(self, tokens: float, now: float) -> float:
+        """Refill by elapsed time, reserve tokens and return the deficit wait."""
+        elapsed = max(now - self._timestamp, 0.0)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._timestamp = now
+        self._tokens -= tokens
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` may be spent; return seconds waited."""
+        with self._lock:
+            wait = self._reserve(tokens, time.time())
+            self._stats['acquired'] += 1
+            if wait > 0:
+                self._stats['waits'] += 1
+                self._stats['total_wait'] += wait
+                self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        """Return wait-time metrics for this process."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_wait'] = stats['total_wait'] / stats['acquired'] if stats['acquired'] else 0.0
+        stats['rate'] = self.rate
+        stats['capacity'] = self.capacity
+        stats['shared'] = bool(self.state_path)
+        return stats
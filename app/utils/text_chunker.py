@@ -0,0 +1,111 @@
+"""
+Incremental sentence-aligned chunking for book-length texts
+"""
+
+import codecs
+import re
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator
+
+SENTENCE_BREAK_RE = re.compile(r"[.!?;]+\s+|\n\s*\n")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass
+class TextChunk:
+    """A slice of a larger document.
+
+    ``offset`` is the absolute character offset of ``text[0]`` and
+    ``overlap`` is the number of leading characters repeated from the
+    previous chunk for context.
+    """
+    index: int
+    text: str
+    offset: int
+    overlap: int = 0
+
+
+def _last_break(text: str, lower: int, upper: int) -> int:
+    """Return the end of the last sentence break in text[lower:upper], or -1."""
+    end = -1
+    for match in SENTENCE_BREAK_RE.finditer(text, lower, upper):
+        end = match.end()
+    if end == -1:
+        for match in WHITESPACE_RE.finditer(text, lower, upper):
+            end = match.end()
+    return end
+
+
+def _first_break(text: str, lower: int, upper: int) -> int:
+    """Return the end of the first sentence break in text[lower:upper], or -1."""
+    match = SENTENCE_BREAK_RE.search(text, lower, upper) or WHITESPACE_RE.search(text, lower, upper)
+    return match.end() if match else -1
+
+
+def iter_text_chunks(pieces: Iterable[str], chunk_size: int = 20000,
+                     overlap: int = 500) -> Iterator[TextChunk]:
+    """Split streamed text into sentence-aligned chunks with overlap.
+
+    Only about ``chunk_size + overlap`` characters plus one incoming piece
+    are held in memory at a time.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    overlap = max(0, min(overlap, chunk_size // 2))
+
+    buffer = ''
+    buffer_offset = 0
+    carried = 0
+    index = 0
+
+    def cut_chunks(final: bool) -> Iterator[TextChunk]:
+        nonlocal buffer, buffer_offset, carried, index
+        while len(buffer) >= chunk_size + carried or (final and len(buffer) > carried):
+            limit = min(len(buffer), chunk_size + carried)
+            if final and limit == len(buffer):
+                cut = limit
+            else:
+                cut = _last_break(buffer, carried + 1, limit)
+                if cut <= carried:
+                    cut = limit
+            yield TextChunk(index, buffer[:cut], buffer_offset, carried)
+            index += 1
+
+            if final and cut == len(buffer):
+                buffer_offset += cut
+                buffer = ''
+                carried = 0
+                break
+
+            # Start the overlap at a sentence boundary near the cut
+            tail_start = max(cut - overlap, 0)
+            start = _first_break(buffer, tail_start, cut)
+            if start == -1 or start >= cut:
+                start = tail_start
+            carried = cut - start
+            buffer_offset += start
+            buffer = buffer[start:]
+
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer += piece
+        yield from cut_chunks(final=False)
+
+    yield from cut_chunks(final=True)
+
+
+def iter_decoded(stream: BinaryIO, encoding: str = 'utf-8',
+                 block_size: int = 65536) -> Iterator[str]:
+    """Decode a binary stream incrementally without reading it all."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark cross-herb compound interaction analysis by formulation size.
+
+Compares the previous pairwise scan over all compounds (one interaction
+table probe per cross-herb pair) with the partner-index join in
+hypothesis_engine.analyze_compound_interactions, on synthetic formulations
+and a synthetic interaction table.
+
+Usage: python benchmarks/bench_compound_interactions.py [--sizes 5,10,20,30] [--rules 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def time_call(func, repeat=1):
+    """Return (result, seconds per call) for a zero-argument callable."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def synthetic_rules(vocabulary, count, rng):
+    pairs = set()
+    while len(pairs) < count:
+        a, b = rng.sample(vocabulary, 2)
+        pairs.add((a, b))
+    return {'compound_interactions': {'kind': 'pair', 'rules': [
+        {'pair': list(pair), 'mechanism': 'Synthetic', 'effect': f'{pair[0]} + {pair[1]}'}
+        for pair in pairs
+    ]}}
+
+
+def synthetic_formulation(vocabulary, herbs, compounds_per_herb, rng):
+    return {f'Herb {i}': {name: {} for name in rng.sample(vocabulary, compounds_per_herb)}
+            for i in range(herbs)}
+
+
+def pairwise_scan(engine, modern_compounds):
+    """The previous analyze_compound_interactions: every cross-herb pair probed."""
+    all_compounds = [(herb, name) for herb, compounds in modern_compounds.items()
+                     for name in compounds]
+    interactions = []
+    for i in range(len(all_compounds)):
+        for j in range(i + 1, len(all_compounds)):
+            herb1, compound1 = all_compounds[i]
+            herb2, compound2 = all_compounds[j]
+            if herb1 != herb2:
+                interaction = engine.analyze_compound_pair(compound1, compound2, herb1, herb2)
+                if interaction:
+                    interactions.append(interaction)
+    return interactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='5,10,20,30,60',
+                        help='comma-separated herb counts per formulation')
+    parser.add_argument('--compounds-per-herb', type=int, default=4)
+    parser.add_argument('--vocabulary', type=int, default=2000)
+    parser.add_argument('--rules', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    import hypothesis_engine
+    from app.services.rule_store import RuleStore
+
+    rng = random.Random(7)
+    vocabulary = [f'compound {i}' for i in range(args.vocabulary)]
+    hypothesis_engine.RULES = RuleStore(synthetic_rules(vocabulary, args.rules, rng))
+
+    print(f"{args.rules} interaction rules, {args.compounds_per_herb} compounds per herb")
+    print(f"{'herbs':>6} {'compounds':>10} {'matches':>8} {'pairwise':>12} {'indexed':>12} {'speedup':>8}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        formulation = synthetic_formulation(vocabulary, size, args.compounds_per_herb, rng)
+        herbs = list(formulation)
+        expected, scan = time_call(lambda: pairwise_scan(hypothesis_engine, formulation), args.repeat)
+        result, join = time_call(
+            lambda: hypothesis_engine.analyze_compound_interactions(herbs, formulation), args.repeat
+        )
+        assert result == expected, 'indexed join disagrees with the pairwise scan'
+        compounds = size * args.compounds_per_herb
+        print(f"{size:6d} {compounds:10d} {len(result):8d} {scan * 1000:9.2f} ms "
+              f"{join * 1000:9.3f} ms {scan / join:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming herb importer on a synthetic archive.
+
+Writes a zip with --herbs herbs in long format (one row per compound) and
+imports it into the embedded graph, reporting rows/sec and peak RSS so
+memory can be checked to stay flat as the archive grows. The archive is
+then re-imported through the manifest, which should only hash it.
+
+Usage: python benchmarks/bench_herb_import.py [--herbs 20000] [--compounds 5]
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RASA = ['madhura', 'amla', 'lavana', 'katu', 'tikta', 'kashaya']
+GUNA = ['guru', 'laghu', 'snigdha', 'ruksha', 'tiksna', 'manda']
+
+
+def write_archive(path, herbs, compounds, seed=7):
+    rng = random.Random(seed)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['Herb', 'Rasa', 'Guna', 'Virya', 'Chemical Constituents'])
+    for i in range(herbs):
+        rasa = '; '.join(rng.sample(RASA, 2))
+        guna = '; '.join(rng.sample(GUNA, 2))
+        virya = rng.choice(['ushna', 'shita'])
+        for j in range(compounds):
+            writer.writerow([f'Herb {i}', rasa, guna, virya, f'compound {rng.randrange(50000)}'])
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('herbs.csv', buffer.getvalue())
+    return herbs * compounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--herbs', type=int, default=20000)
+    parser.add_argument('--compounds', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    from app.services.herb_importer import HerbImporter, peak_rss_mb
+    from app.services.import_manifest import ImportManifest, format_delta
+    from app.services.kg_service import KnowledgeGraphService
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = os.path.join(directory, 'herbs.zip')
+        rows = write_archive(archive, args.herbs, args.compounds)
+        print(f"archive: {rows} rows, {os.path.getsize(archive) / 1e6:.1f} MB compressed")
+        baseline = peak_rss_mb()
+
+        kg_service = KnowledgeGraphService('bolt://unused', '', '', backend='embedded')
+        manifest = ImportManifest(os.path.join(directory, 'manifest.sqlite3'))
+        importer = HerbImporter(kg_service, batch_size=args.batch_size, manifest=manifest)
+        stats = importer.import_archive(archive)
+        print(f"imported {stats['herbs']} herbs in {stats['elapsed_s']:.1f}s: "
+              f"{stats['rows_per_s']:.0f} rows/s, {stats['herbs_per_s']:.0f} herbs/s")
+        if baseline is not None:
+            print(f"peak RSS: {stats['peak_rss_mb']:.0f} MB (before import {baseline:.0f} MB)")
+        print(f"graph: {kg_service.backend_stats()}")
+
+        again = importer.import_archive(archive)
+        print(f"unchanged re-import: {again['elapsed_s']:.1f}s, {again['herbs']} herbs written "
+              f"({format_delta(again['delta'])})")
+        manifest.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark spaCy startup and extraction throughput for AyurvedicNLPService.
+
+Compares the old eager full-pipeline load against the lazy trimmed load,
+and per-document extract_herbs against extract_herbs_batch (nlp.pipe).
+
+Usage: python benchmarks/bench_nlp.py [--model en_core_web_sm] [--docs 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_TEXT = (
+    "Ashwagandha (Withania somnifera) has a bitter and astringent taste with "
+    "heating potency. Turmeric is pungent and light; it is combined with black "
+    "pepper to improve absorption. Neem is cold and bitter."
+)
+
+
+def time_call(func):
+    """Return (result, seconds) for a zero-argument callable."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default='en_core_web_sm')
+    parser.add_argument('--docs', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--n-process', type=int, default=1)
+    args = parser.parse_args()
+
+    from app.services.nlp_service import AyurvedicNLPService
+    texts = [SAMPLE_TEXT] * args.docs
+
+    # Startup: old behaviour loaded the full pipeline in __init__
+    try:
+        import spacy
+        _, eager = time_call(lambda: spacy.load(args.model))
+        print(f"eager full-pipeline load:   {eager * 1000:8.1f} ms")
+    except Exception as e:
+        print(f"eager full-pipeline load:   unavailable ({e})")
+
+    service, init = time_call(lambda: AyurvedicNLPService(spacy_model=args.model))
+    print(f"lazy service init:          {init * 1000:8.1f} ms")
+    _, first = time_call(lambda: service.extract_herbs(SAMPLE_TEXT))
+    print(f"first extract (trimmed load): {first * 1000:6.1f} ms")
+    print(f"pipeline components:        {service.nlp.pipe_names if service.nlp else 'fallback (no spaCy model)'}")
+
+    # Throughput
+    _, single = time_call(lambda: [service.extract_herbs(text) for text in texts])
+    print(f"extract_herbs loop:         {args.docs / single:8.1f} docs/sec")
+    _, batch = time_call(lambda: service.extract_herbs_batch(
+        texts, batch_size=args.batch_size, n_process=args.n_process))
+    print(f"extract_herbs_batch:        {args.docs / batch:8.1f} docs/sec "
+          f"(batch_size={args.batch_size}, n_process={args.n_process})")
+
+
+if __name__ == '__main__':
+    main()
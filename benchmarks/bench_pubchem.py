@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark sequential versus concurrent PubChem lookups for multi-herb analyses.
+
+Runs the local stub server with a fixed per-request latency and resolves
+every herb in PubChemService.HERB_COMPOUNDS, first with the blocking
+search_compounds_for_herbs and then through AsyncPubChemClient. The cache
+is disabled so both runs hit the (stub) network.
+
+Usage: python benchmarks/bench_pubchem.py [--latency 0.1] [--concurrency 8] [--rate 50]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_call(func):
+    """Return (result, seconds) for a zero-argument callable."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=50,
+                        help='token-bucket requests/second (PubChem allows 5)')
+    args = parser.parse_args()
+
+    from pubchem_stub_server import make_server
+    from app.services.pubchem_async import AsyncPubChemClient
+    from app.services.pubchem_service import PubChemService
+    from app.utils.rate_limiter import TokenBucketRateLimiter
+
+    server = make_server(0, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/rest/pug"
+
+    def make_service():
+        service = PubChemService(cache_path=None, max_connections=args.concurrency,
+                                 base_url=base_url)
+        service.rate_limiter = TokenBucketRateLimiter(rate=args.rate, capacity=args.concurrency)
+        return service
+
+    herbs = list(PubChemService.HERB_COMPOUNDS)
+    print(f"{len(herbs)} herbs, stub latency {args.latency * 1000:.0f} ms, "
+          f"rate {args.rate}/s, concurrency {args.concurrency}")
+
+    sequential, seq_time = time_call(lambda: make_service().search_compounds_for_herbs(herbs))
+    client = AsyncPubChemClient(make_service(), max_concurrency=args.concurrency)
+    concurrent, conc_time = time_call(lambda: client.search_compounds_for_herbs(herbs))
+    client.close()
+    server.shutdown()
+
+    assert sequential == concurrent, "concurrent results differ from sequential"
+    compounds = sum(len(found) for found in sequential.values())
+    print(f"sequential: {seq_time:.2f}s  ({compounds} compounds)")
+    print(f"concurrent: {conc_time:.2f}s  ({seq_time / conc_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark HerbSimilarityEngine top-k queries on synthetic herbs.
+
+Compares the old dict-order dosha-word loop of get_synergistic_herbs with
+sparse top-k scoring, for single queries and for all herbs in blocks.
+
+Usage: python benchmarks/bench_similarity.py [--herbs 10000] [--k 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VOCABULARY = {
+    'rasa': ['sweet', 'sour', 'salty', 'pungent', 'bitter', 'astringent'],
+    'guna': ['heavy', 'light', 'oily', 'dry', 'sharp', 'dull', 'smooth', 'rough'],
+    'vipaka': ['sweet', 'sour', 'pungent'],
+    'virya': ['hot', 'cold'],
+    'dosha': ['vata', 'pitta', 'kapha'],
+    'therapeutic_actions': [f'action {i}' for i in range(300)],
+    'modern_compounds': [f'compound {i}' for i in range(5000)]
+}
+SIZES = {'rasa': 2, 'guna': 3, 'vipaka': 1, 'virya': 1, 'dosha': 2,
+         'therapeutic_actions': 4, 'modern_compounds': 6}
+
+
+def time_call(func):
+    """Return (result, seconds) for a zero-argument callable."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def synthetic_herbs(count, seed=7):
+    rng = random.Random(seed)
+    return {f'Herb {i}': {feature: rng.sample(values, SIZES[feature])
+                          for feature, values in VOCABULARY.items()}
+            for i in range(count)}
+
+
+def dosha_word_loop(herbs, herb):
+    """The previous get_synergistic_herbs: first five herbs sharing a dosha word."""
+    words = set(' '.join(herbs[herb]['dosha']).split())
+    synergistic = []
+    for other, properties in herbs.items():
+        if other != herb and words & set(' '.join(properties['dosha']).split()):
+            synergistic.append(other)
+    return synergistic[:5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--herbs', type=int, default=10000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    from app.services.herb_similarity import HerbSimilarityEngine
+    herbs = synthetic_herbs(args.herbs)
+    names = list(herbs)[:args.queries]
+
+    engine = HerbSimilarityEngine()
+    _, load = time_call(lambda: [engine.upsert(herb, features) for herb, features in herbs.items()])
+    print(f"featurize {args.herbs} herbs:     {load * 1000:8.1f} ms")
+    _, build = time_call(lambda: engine.most_similar(names[0], args.k))
+    print(f"matrix build + first query:  {build * 1000:8.1f} ms  {engine.stats()}")
+
+    _, loop = time_call(lambda: [dosha_word_loop(herbs, herb) for herb in names])
+    print(f"dosha word loop:             {loop / len(names) * 1000:8.2f} ms/query")
+    for metric in HerbSimilarityEngine.METRICS:
+        _, single = time_call(lambda: [engine.most_similar(herb, args.k, metric) for herb in names])
+        print(f"{metric:7s} top-{args.k} single:       {single / len(names) * 1000:8.2f} ms/query")
+    _, bulk = time_call(lambda: engine.most_similar_many(list(herbs), args.k))
+    print(f"jaccard top-{args.k} all herbs:    {bulk:8.2f} s ({args.herbs / bulk:.0f} herbs/sec)")
+
+    _, update = time_call(lambda: (engine.upsert('Herb 0', herbs['Herb 1']),
+                                   engine.most_similar('Herb 0', args.k)))
+    print(f"upsert + requery:            {update * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
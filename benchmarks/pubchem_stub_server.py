@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the PubChem PUG REST endpoints used by PubChemService.
+
+Answers name -> CID and CID-list -> property requests with deterministic
+data after a configurable delay, so client concurrency can be measured
+without touching the real service.
+
+Usage: python benchmarks/pubchem_stub_server.py [--port 8765] [--latency 0.1]
+"""
+
+import argparse
+import json
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+def name_to_cid(name):
+    """Stable fake CID for a compound name."""
+    return zlib.crc32(name.strip().lower().encode('utf-8')) % 10_000_000 + 1
+
+
+class PubChemStubHandler(BaseHTTPRequestHandler):
+    latency = 0.1
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parts = unquote(self.path).split('/rest/pug/compound/', 1)[-1].split('/')
+        if len(parts) >= 3 and parts[0] == 'name' and parts[2] == 'cids':
+            self._send(200, {'IdentifierList': {'CID': [name_to_cid(parts[1])]}})
+        elif len(parts) >= 3 and parts[0] == 'cid' and parts[2] == 'property':
+            cids = [int(cid) for cid in parts[1].split(',') if cid.isdigit()]
+            self._send(200, {'PropertyTable': {'Properties': [
+                {'CID': cid, 'MolecularFormula': 'C10H12O2', 'MolecularWeight': '164.2',
+                 'CanonicalSMILES': 'COC1=CC=CC=C1', 'IUPACName': f'compound-{cid}'}
+                for cid in cids
+            ]}})
+        else:
+            self._send(404, {'Fault': {'Code': 'PUGREST.NotFound'}})
+
+
+def make_server(port=0, latency=0.1):
+    """Create (but do not start) a stub server; port 0 picks a free port."""
+    handler = type('Handler', (PubChemStubHandler,), {'latency': latency})
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency)
+    print(f"PubChem stub on http://127.0.0.1:{server.server_address[1]}/rest/pug")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,73 @@
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 import re
 from knowledge_graph import KNOWLEDGE_GRAPH
+from app.config import Config
+from app.services.rule_store import get_rule_store, normalize_key
+from app.utils.lru_cache import LRUCache
+
+# Rule tables, compiled once per process
+RULES = get_rule_store(Config.HYPOTHESIS_RULES_PATH)
+
+# Hypotheses per input fingerprint, for the rule version in _cache_state
+HYPOTHESIS_CACHE = LRUCache(Config.HYPOTHESIS_CACHE_SIZE)
+_cache_state = {'version': RULES.version, 'rule_invalidations': 0}
+
+# Herb properties the hypothesis rules read
+FINGERPRINT_PROPERTIES = ('rasa', 'guna', 'virya', 'dosha', 'therapeutic_actions')
+
+def _freeze(value: Any) -> Any:
+    """Hashable form of a property value."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+def hypothesis_fingerprint(herbs: List[str], ayurvedic_data: Dict, modern_compounds: Dict) -> Tuple:
+    """
+    Cache key covering everything generate_hypothesis reads: the rule version,
+    the herbs in order, their rasa/guna/virya/dosha/action properties and the
+    compound names of every herb (in order, since output follows it)
+    """
+    properties = tuple(
+        (herb, _freeze({key: value for key, value in ayurvedic_data[herb].items()
+                        if key in FINGERPRINT_PROPERTIES}))
+        for herb in herbs if ayurvedic_data.get(herb)
+    )
+    compounds = tuple((herb, tuple(names)) for herb, names in modern_compounds.items())
+    return (RULES.version, tuple(herbs), properties, compounds)
+
+def hypothesis_cache_stats() -> Dict:
+    """
+    Hit/miss counters of the hypothesis cache
+    """
+    stats = HYPOTHESIS_CACHE.stats()
+    stats['rule_version'] = _cache_state['version']
+    stats['rule_invalidations'] = _cache_state['rule_invalidations']
+    return stats
 
 def generate_hypothesis(herbs: List[str], ayurvedic_data: Dict, modern_compounds: Dict) -> List[Dict]:
     """
     Generate hypotheses about potential bioactive mechanisms and synergistic combinations
+
+    Memoized by hypothesis_fingerprint(); the cache is cleared when the rule
+    tables are reloaded.
+    """
+    if RULES.version != _cache_state['version']:
+        HYPOTHESIS_CACHE.clear()
+        _cache_state['version'] = RULES.version
+        _cache_state['rule_invalidations'] += 1
+    
+    key = hypothesis_fingerprint(herbs, ayurvedic_data, modern_compounds)
+    hypotheses = HYPOTHESIS_CACHE.get(key)
+    if hypotheses is None:
+        hypotheses = tuple(_build_hypothesis(herbs, ayurvedic_data, modern_compounds))
+        HYPOTHESIS_CACHE.put(key, hypotheses)
+    return [dict(hypothesis) for hypothesis in hypotheses]
+
+def _build_hypothesis(herbs: List[str], ayurvedic_data: Dict, modern_compounds: Dict) -> List[Dict]:
+    """
+    Run every hypothesis rule over the herbs
     """
     hypotheses = []
     
@@ -39,41 +102,20 @@ def find_biochemical_synergies(herbs: List[str], modern_compounds: Dict) -> Dict
     
     synergies = []
     
-    # Known synergistic combinations
-    known_synergies = {
-        ('turmeric', 'black pepper'): {
-            'mechanism': 'Piperine enhances curcumin bioavailability by inhibiting glucuronidation',
-            'evidence': 'Piperine increases curcumin absorption by up to 2000%',
-            'clinical_significance': 'Enhanced anti-inflammatory and antioxidant effects'
-        },
-        ('ginger', 'garlic'): {
-            'mechanism': 'Combined anti-inflammatory and cardiovascular protective effects',
-            'evidence': 'Synergistic reduction in inflammatory markers',
-            'clinical_significance': 'Enhanced cardiovascular and immune system support'
-        },
-        ('ashwagandha', 'brahmi'): {
-            'mechanism': 'Complementary adaptogenic and neuroprotective effects',
-            'evidence': 'Enhanced stress reduction and cognitive function',
-            'clinical_significance': 'Improved mental clarity and stress resilience'
-        }
-    }
-    
     # Check for known synergies
-    herb_combinations = []
     for i in range(len(herbs)):
         for j in range(i+1, len(herbs)):
-            herb_combinations.append((herbs[i].lower(), herbs[j].lower()))
-    
-    for combo in herb_combinations:
-        if combo in known_synergies:
-            synergies.append({
-                'herbs': [combo[0].title(), combo[1].title()],
-                'type': 'Known Biochemical Synergy',
-                'mechanism': known_synergies[combo]['mechanism'],
-                'evidence': known_synergies[combo]['evidence'],
-                'clinical_significance': known_synergies[combo]['clinical_significance'],
-                'confidence': 'High'
-            })
+            combo = (herbs[i].lower(), herbs[j].lower())
+            synergy = RULES.pair('herb_synergies', *combo)
+            if synergy:
+                synergies.append({
+                    'herbs': [combo[0].title(), combo[1].title()],
+                    'type': 'Known Biochemical Synergy',
+                    'mechanism': synergy['mechanism'],
+                    'evidence': synergy['evidence'],
+                    'clinical_significance': synergy['clinical_significance'],
+                    'confidence': 'High'
+                })
     
     # Analyze compound interactions
     compound_interactions = analyze_compound_interactions(herbs, modern_compounds)
@@ -91,26 +133,38 @@ def find_biochemical_synergies(herbs: List[str], modern_compounds: Dict) -> Dict
 
 def analyze_compound_interactions(herbs: List[str], modern_compounds: Dict) -> List[Dict]:
     """
-    Analyze potential interactions between compounds
+    Analyze potential interactions between compounds of different herbs
+
+    Joins the formulation's compounds with the interaction table instead of
+    testing every cross-herb pair: compounds are indexed by name, and only
+    the known partners of each compound are looked up, so the cost grows
+    with the number of compounds plus matching pairs. Results come out in
+    the same order as a pairwise scan over the compounds.
     """
-    interactions = []
-    
     # Get all compounds
     all_compounds = []
+    positions = {}
     for herb, compounds in modern_compounds.items():
         for compound_name in compounds.keys():
+            positions.setdefault(normalize_key(compound_name), []).append(len(all_compounds))
             all_compounds.append((herb, compound_name))
     
-    # Look for complementary mechanisms
-    for i in range(len(all_compounds)):
-        for j in range(i+1, len(all_compounds)):
-            herb1, compound1 = all_compounds[i]
-            herb2, compound2 = all_compounds[j]
-            
-            if herb1 != herb2:  # Different herbs
-                interaction = analyze_compound_pair(compound1, compound2, herb1, herb2)
-                if interaction:
-                    interactions.append(interaction)
+    # Probe the partner index of each compound against the formulation
+    matches = []
+    for i, (herb1, compound1) in enumerate(all_compounds):
+        for partner in RULES.partners('compound_interactions', compound1):
+            for j in positions.get(partner, ()):
+                if j > i and all_compounds[j][0] != herb1:
+                    matches.append((i, j))
+    matches.sort()
+    
+    interactions = []
+    for i, j in matches:
+        herb1, compound1 = all_compounds[i]
+        herb2, compound2 = all_compounds[j]
+        interaction = analyze_compound_pair(compound1, compound2, herb1, herb2)
+        if interaction:
+            interactions.append(interaction)
     
     return interactions
 
@@ -118,41 +172,14 @@ def analyze_compound_pair(compound1: str, compound2: str, herb1: str, herb2: str
     """
     Analyze potential interaction between two compounds
     """
-    # Known compound interactions
-    compound_interactions = {
-        ('curcumin', 'piperine'): {
-            'mechanism': 'Bioavailability enhancement',
-            'effect': 'Piperine inhibits curcumin metabolism, increasing absorption'
-        },
-        ('gingerol', 'allicin'): {
-            'mechanism': 'Anti-inflammatory synergy',
-            'effect': 'Combined COX-2 inhibition and antioxidant activity'
-        },
-        ('withanolides', 'bacosides'): {
-            'mechanism': 'Neuroprotective synergy',
-            'effect': 'Complementary stress reduction and cognitive enhancement'
-        }
-    }
-    
-    combo = (compound1.lower(), compound2.lower())
-    reverse_combo = (compound2.lower(), compound1.lower())
-    
-    if combo in compound_interactions:
+    interaction = RULES.pair('compound_interactions', compound1, compound2)
+    if interaction:
         return {
             'herbs': [herb1.title(), herb2.title()],
             'compounds': [compound1, compound2],
             'type': 'Compound Interaction',
-            'mechanism': compound_interactions[combo]['mechanism'],
-            'effect': compound_interactions[combo]['effect'],
-            'confidence': 'Medium'
-        }
-    elif reverse_combo in compound_interactions:
-        return {
-            'herbs': [herb1.title(), herb2.title()],
-            'compounds': [compound1, compound2],
-            'type': 'Compound Interaction',
-            'mechanism': compound_interactions[reverse_combo]['mechanism'],
-            'effect': compound_interactions[reverse_combo]['effect'],
+            'mechanism': interaction['mechanism'],
+            'effect': interaction['effect'],
             'confidence': 'Medium'
         }
     
@@ -202,33 +229,15 @@ def analyze_rasa_modern_correlation(herb: str, properties: Dict, compounds: Dict
     if not rasa:
         return None
     
-    # Known rasa-compound correlations
-    rasa_compound_correlations = {
-        'bitter': {
-            'compounds': ['alkaloids', 'glycosides', 'terpenoids'],
-            'modern_understanding': 'Bitter compounds often have strong pharmacological activity',
-            'examples': ['curcumin', 'piperine', 'withanolides']
-        },
-        'pungent': {
-            'compounds': ['volatile oils', 'phenolic compounds'],
-            'modern_understanding': 'Pungent compounds often have antimicrobial and digestive properties',
-            'examples': ['gingerol', 'piperine', 'eugenol']
-        },
-        'sweet': {
-            'compounds': ['sugars', 'glycosides', 'triterpenes'],
-            'modern_understanding': 'Sweet compounds often have nutritive and tonic properties',
-            'examples': ['glycyrrhizin', 'saponins']
-        }
-    }
-    
     correlations_found = []
     for taste in rasa:
-        if taste in rasa_compound_correlations:
+        correlation = RULES.get('rasa_correlations', taste)
+        if correlation:
             correlations_found.append({
                 'ancient_property': f'{taste} rasa',
-                'modern_understanding': rasa_compound_correlations[taste]['modern_understanding'],
-                'compounds': rasa_compound_correlations[taste]['compounds'],
-                'examples': rasa_compound_correlations[taste]['examples']
+                'modern_understanding': correlation['modern_understanding'],
+                'compounds': correlation['compounds'],
+                'examples': correlation['examples']
             })
     
     if correlations_found:
@@ -249,38 +258,15 @@ def analyze_guna_modern_correlation(herb: str, properties: Dict, compounds: Dict
     if not guna:
         return None
     
-    # Known guna-compound correlations
-    guna_correlations = {
-        'hot': {
-            'modern_understanding': 'Hot guna correlates with compounds that increase metabolism and circulation',
-            'compounds': ['capsaicinoids', 'piperine', 'gingerol'],
-            'mechanism': 'Thermogenic and vasodilatory effects'
-        },
-        'cold': {
-            'modern_understanding': 'Cold guna correlates with compounds that have cooling and anti-inflammatory effects',
-            'compounds': ['menthol', 'camphor', 'eugenol'],
-            'mechanism': 'Anti-inflammatory and cooling effects'
-        },
-        'dry': {
-            'modern_understanding': 'Dry guna correlates with compounds that have astringent properties',
-            'compounds': ['tannins', 'phenolic compounds'],
-            'mechanism': 'Astringent and tissue-drying effects'
-        },
-        'oily': {
-            'modern_understanding': 'Oily guna correlates with lipid-soluble compounds',
-            'compounds': ['fatty acids', 'terpenes', 'sterols'],
-            'mechanism': 'Lipid-soluble absorption and tissue lubrication'
-        }
-    }
-    
     correlations_found = []
     for quality in guna:
-        if quality in guna_correlations:
+        correlation = RULES.get('guna_correlations', quality)
+        if correlation:
             correlations_found.append({
                 'ancient_property': f'{quality} guna',
-                'modern_understanding': guna_correlations[quality]['modern_understanding'],
-                'compounds': guna_correlations[quality]['compounds'],
-                'mechanism': guna_correlations[quality]['mechanism']
+                'modern_understanding': correlation['modern_understanding'],
+                'compounds': correlation['compounds'],
+                'mechanism': correlation['mechanism']
             })
     
     if correlations_found:
@@ -301,38 +287,15 @@ def analyze_therapeutic_correlation(herb: str, properties: Dict, compounds: Dict
     if not therapeutic_actions:
         return None
     
-    # Known therapeutic-compound correlations
-    therapeutic_correlations = {
-        'anti-inflammatory': {
-            'modern_compounds': ['curcumin', 'gingerol', 'eugenol', 'ursolic acid'],
-            'mechanism': 'COX-2 inhibition, NF-κB pathway modulation',
-            'evidence': 'Well-documented anti-inflammatory activity in modern research'
-        },
-        'antioxidant': {
-            'modern_compounds': ['curcumin', 'vitamin C', 'ellagic acid', 'rosmarinic acid'],
-            'mechanism': 'Free radical scavenging, antioxidant enzyme induction',
-            'evidence': 'Strong antioxidant activity demonstrated in vitro and in vivo'
-        },
-        'antimicrobial': {
-            'modern_compounds': ['allicin', 'eugenol', 'azadirachtin', 'piperine'],
-            'mechanism': 'Cell membrane disruption, enzyme inhibition',
-            'evidence': 'Broad-spectrum antimicrobial activity against bacteria and fungi'
-        },
-        'adaptogenic': {
-            'modern_compounds': ['withanolides', 'bacosides', 'ginsenosides'],
-            'mechanism': 'HPA axis modulation, stress response regulation',
-            'evidence': 'Stress-reducing and performance-enhancing effects'
-        }
-    }
-    
     correlations_found = []
     for action in therapeutic_actions:
-        if action in therapeutic_correlations:
+        correlation = RULES.get('therapeutic_correlations', action)
+        if correlation:
             correlations_found.append({
                 'ancient_action': action,
-                'modern_compounds': therapeutic_correlations[action]['modern_compounds'],
-                'mechanism': therapeutic_correlations[action]['mechanism'],
-                'evidence': therapeutic_correlations[action]['evidence']
+                'modern_compounds': correlation['modern_compounds'],
+                'mechanism': correlation['mechanism'],
+                'evidence': correlation['evidence']
             })
     
     if correlations_found:
@@ -374,16 +337,10 @@ def analyze_dosha_therapeutic_implications(dosha_info: str) -> str:
     """
     Analyze therapeutic implications of dosha effects
     """
-    dosha_implications = {
-        'vata': 'Calming, grounding, stress reduction, nervous system support',
-        'pitta': 'Cooling, anti-inflammatory, digestive support, liver health',
-        'kapha': 'Stimulating, expectorant, metabolic enhancement, weight management',
-        'all three doshas': 'Balancing, rejuvenative, comprehensive health support'
-    }
-    
-    for dosha, implication in dosha_implications.items():
-        if dosha in dosha_info.lower():
-            return implication
+    dosha_info = dosha_info.lower()
+    for dosha, implication in RULES.items('dosha_implications'):
+        if dosha in dosha_info:
+            return implication['implication']
     
     return 'General health support and balance'
 
@@ -419,28 +376,9 @@ def analyze_rgv_correlation(herb: str, rasa: List[str], guna: List[str], virya:
     """
     Analyze correlation between rasa, guna, and virya for a specific herb
     """
-    # Known RGV correlations
-    rgv_patterns = {
-        'pungent-hot-sharp': {
-            'pattern': ['pungent', 'hot', 'sharp'],
-            'significance': 'Strong digestive and metabolic stimulation',
-            'therapeutic_potential': 'Digestive disorders, respiratory conditions, circulation'
-        },
-        'bitter-cold-light': {
-            'pattern': ['bitter', 'cold', 'light'],
-            'significance': 'Cooling and detoxifying properties',
-            'therapeutic_potential': 'Inflammation, fever, detoxification'
-        },
-        'sweet-heavy-cold': {
-            'pattern': ['sweet', 'heavy', 'cold'],
-            'significance': 'Nourishing and cooling properties',
-            'therapeutic_potential': 'Debility, inflammation, nourishment'
-        }
-    }
-    
     herb_properties = rasa + guna + virya
     
-    for pattern_name, pattern_info in rgv_patterns.items():
+    for pattern_name, pattern_info in RULES.items('rgv_patterns'):
         pattern_properties = pattern_info['pattern']
         if all(prop in herb_properties for prop in pattern_properties):
             return {
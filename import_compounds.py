@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Build the offline compound database from the phytochemical dataset.
+
+Streams every CSV/TSV/JSON member of the archive into an indexed SQLite
+store (name, synonym, CID, InChIKey, herb) that PubChemService consults
+before going to the network. Re-imports only rewrite compounds whose
+records changed (tracked in the import manifest) unless --full is given.
+
+Usage: python import_compounds.py ["Phytochemical data.zip"] [--db compounds.sqlite3] [--full]
+"""
+
+import argparse
+import sys
+import time
+
+from app.config import Config
+from app.services.compound_store import CompoundStore
+from app.services.import_manifest import ImportManifest, format_delta
+from app.utils.archive import check_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('archive', nargs='?', default='Phytochemical data.zip')
+    parser.add_argument('--db', default=Config.COMPOUND_DB_PATH)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--manifest', default=Config.IMPORT_MANIFEST_PATH)
+    parser.add_argument('--full', action='store_true',
+                        help='reload every record instead of only the changed ones')
+    args = parser.parse_args()
+
+    try:
+        check_archive(args.archive)
+        store = CompoundStore(args.db)
+        manifest = None if args.full else ImportManifest(args.manifest)
+        start = time.perf_counter()
+        counts = store.import_archive(args.archive, batch_size=args.batch_size, manifest=manifest)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    stats = store.stats()
+    print(f"Imported {counts['rows']} rows in {elapsed:.1f}s "
+          f"({counts['compounds']} new compounds, {counts['skipped']} skipped)")
+    if 'delta' in counts:
+        print(f"Changes: {format_delta(counts['delta'])}")
+    print(f"{args.db}: {stats['compounds']} compounds, {stats['compound_names']} names, "
+          f"{stats['herb_compounds']} herb links")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Load the Ayurvedic herb dataset into the knowledge graph.
+
+Streams every CSV/TSV/JSON member of the archive, normalizes records to
+Herb models and writes them in batches (UNWIND transactions on Neo4j, or
+the embedded graph snapshot). By default only herbs whose records changed
+since the last import are rewritten and vanished herbs are removed (content
+hashes in the import manifest); --full reloads everything, checkpointing
+progress so an interrupted load resumes where it stopped. With --memory the
+herbs are also saved for the app's in-memory store (HERB_STORE_PATH, loaded
+at startup). Throughput and peak RSS are reported.
+
+Usage: python import_herbs.py ["Ayurvedic herbs.zip"] [--backend auto] [--full [--restart]]
+"""
+
+import argparse
+import os
+import sys
+
+from app.config import Config
+from app.services.compound_store import CompoundStore
+from app.services.herb_importer import HerbImporter
+from app.services.import_manifest import ImportManifest, format_delta
+from app.services.kg_service import KnowledgeGraphService
+
+
+def report(stats):
+    rss = f"{stats['peak_rss_mb']:.0f} MB" if stats['peak_rss_mb'] is not None else 'n/a'
+    print(f"  {stats['rows']:>10} rows  {stats['herbs']:>8} herbs  "
+          f"{stats['rows_per_s']:>9.0f} rows/s  peak RSS {rss}  ({stats['member']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('archive', nargs='?', default='Ayurvedic herbs.zip')
+    parser.add_argument('--backend', default=Config.KG_BACKEND,
+                        choices=['auto', 'neo4j', 'embedded'])
+    parser.add_argument('--snapshot', default=Config.KG_SNAPSHOT_PATH,
+                        help='embedded graph snapshot to load and save')
+    parser.add_argument('--compound-db', default=Config.COMPOUND_DB_PATH,
+                        help='offline compound database used to resolve CIDs')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--manifest', default=Config.IMPORT_MANIFEST_PATH)
+    parser.add_argument('--full', action='store_true',
+                        help='reload every record instead of only the changed ones')
+    parser.add_argument('--checkpoint', default='herb_import.checkpoint.json')
+    parser.add_argument('--checkpoint-every', type=int, default=10, help='batches')
+    parser.add_argument('--restart', action='store_true', help='ignore any checkpoint')
+    parser.add_argument('--memory', action='store_true',
+                        help='also save the herbs for the in-memory knowledge_graph store')
+    parser.add_argument('--memory-store', default=Config.HERB_STORE_PATH,
+                        help='file the app loads the in-memory store from')
+    args = parser.parse_args()
+
+    kg_service = KnowledgeGraphService(Config.NEO4J_URI, Config.NEO4J_USER, Config.NEO4J_PASSWORD,
+                                       backend=args.backend, snapshot_path=args.snapshot)
+    if kg_service.backend == 'embedded' and not args.snapshot:
+        print("Embedded graph without --snapshot: nothing will persist, so the "
+              "checkpoint and manifest are not used")
+        args.checkpoint = None
+        args.full = True
+    memory_store = None
+    if args.memory:
+        import knowledge_graph as memory_store
+    compound_store = CompoundStore(args.compound_db) if os.path.exists(args.compound_db) else None
+
+    manifest = None if args.full else ImportManifest(args.manifest)
+
+    importer = HerbImporter(kg_service, memory_store, compound_store,
+                            batch_size=args.batch_size, checkpoint_path=args.checkpoint,
+                            checkpoint_every=args.checkpoint_every, manifest=manifest)
+    try:
+        stats = importer.import_archive(args.archive, resume=not args.restart, progress=report)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    finally:
+        kg_service.close()
+
+    if stats['resumed_from']:
+        print(f"Resumed from {stats['resumed_from']['member']} row {stats['resumed_from']['row']}")
+    print(f"Imported {stats['herbs']} herbs from {stats['rows']} rows in {stats['elapsed_s']:.1f}s "
+          f"({stats['rows_per_s']:.0f} rows/s, {stats['skipped']} skipped) into {kg_service.backend}")
+    if 'delta' in stats:
+        print(f"Changes: {format_delta(stats['delta'])}")
+    if stats['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {stats['peak_rss_mb']:.0f} MB")
+    if memory_store is not None:
+        memory_store.save_herbs(args.memory_store)
+        print(f"In-memory store: {len(memory_store.get_all_herbs())} herbs "
+              f"saved to {args.memory_store}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
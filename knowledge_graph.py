@@ -1,6 +1,14 @@
 # Ayurvedic Knowledge Graph
 # Maps herbs to their traditional Ayurvedic properties
 
+import json
+import os
+import tempfile
+from collections import defaultdict
+from itertools import count
+from app.utils.graph_search import bounded_bfs
+from app.services.herb_similarity import HerbSimilarityEngine
+
 KNOWLEDGE_GRAPH = {
     'Turmeric': {
         'rasa': ['bitter', 'pungent', 'astringent'],
@@ -204,6 +212,132 @@ KNOWLEDGE_GRAPH = {
     }
 }
 
+# Inverted indexes over KNOWLEDGE_GRAPH, built once at import and kept in
+# sync by add_herb/remove_herb (mutate the graph through those, not directly)
+DOSHAS = ('vata', 'pitta', 'kapha')
+PROPERTY_INDEX = defaultdict(lambda: defaultdict(set))  # property type -> value -> herbs
+DOSHA_INDEX = defaultdict(set)  # dosha -> herbs that pacify it
+COMPOUND_INDEX = PROPERTY_INDEX['modern_compounds']  # compound -> herbs
+_HERB_ORDER = {}  # herb -> insertion position, so results keep graph order
+_next_position = count()
+_SORTED_MEMBERS = {}  # (property type, value) -> herbs in graph order, rebuilt lazily
+
+# Shared values that connect herbs in neighbourhood queries
+NEIGHBOR_PROPERTIES = ('modern_compounds', 'rasa', 'guna', 'vipaka', 'virya')
+
+# Sparse feature matrix for similarity ranking, kept in sync like the indexes
+SIMILARITY_FEATURES = ('rasa', 'guna', 'vipaka', 'virya', 'therapeutic_actions', 'modern_compounds')
+SIMILARITY_ENGINE = HerbSimilarityEngine()
+
+def _pacified_doshas(properties):
+    """
+    Doshas named in a herb's dosha descriptions ('all three' means every dosha)
+    """
+    doshas = set()
+    for description in properties.get('dosha', []):
+        text = description.lower()
+        if 'all three' in text or 'tridosh' in text:
+            doshas.update(DOSHAS)
+        doshas.update(dosha for dosha in DOSHAS if dosha in text)
+    return doshas
+
+def _similarity_features(properties):
+    """
+    Feature type -> values used by SIMILARITY_ENGINE (doshas as pacified doshas)
+    """
+    features = {feature: [value.lower() for value in properties.get(feature, [])]
+                for feature in SIMILARITY_FEATURES}
+    features['dosha'] = sorted(_pacified_doshas(properties))
+    return features
+
+def _index_herb(herb, properties):
+    for property_type, values in properties.items():
+        if isinstance(values, list):
+            for value in values:
+                PROPERTY_INDEX[property_type][value.lower()].add(herb)
+    for dosha in _pacified_doshas(properties):
+        DOSHA_INDEX[dosha].add(herb)
+    SIMILARITY_ENGINE.upsert(herb, _similarity_features(properties))
+
+def _unindex_herb(herb, properties):
+    for property_type, values in properties.items():
+        if isinstance(values, list):
+            for value in values:
+                PROPERTY_INDEX[property_type][value.lower()].discard(herb)
+    for dosha in _pacified_doshas(properties):
+        DOSHA_INDEX[dosha].discard(herb)
+
+def _members(property_type, value):
+    """
+    Herbs with a property value, in graph order (cached until the graph changes)
+    """
+    key = (property_type, value)
+    members = _SORTED_MEMBERS.get(key)
+    if members is None:
+        members = _SORTED_MEMBERS[key] = tuple(
+            _in_graph_order(PROPERTY_INDEX.get(property_type, {}).get(value, ()))
+        )
+    return members
+
+def _in_graph_order(herbs):
+    return sorted(herbs, key=_HERB_ORDER.__getitem__)
+
+def add_herb(herb_name, properties):
+    """
+    Add or replace a herb in the knowledge graph, updating the indexes
+    """
+    herb_key = herb_name.title()
+    _SORTED_MEMBERS.clear()
+    if herb_key in KNOWLEDGE_GRAPH:
+        _unindex_herb(herb_key, KNOWLEDGE_GRAPH[herb_key])
+    else:
+        _HERB_ORDER[herb_key] = next(_next_position)
+    KNOWLEDGE_GRAPH[herb_key] = properties
+    _index_herb(herb_key, properties)
+
+def remove_herb(herb_name):
+    """
+    Remove a herb from the knowledge graph and its indexes
+    """
+    herb_key = herb_name.title()
+    properties = KNOWLEDGE_GRAPH.pop(herb_key, None)
+    if properties is None:
+        return False
+    _unindex_herb(herb_key, properties)
+    SIMILARITY_ENGINE.remove(herb_key)
+    del _HERB_ORDER[herb_key]
+    _SORTED_MEMBERS.clear()
+    return True
+
+for _herb, _properties in KNOWLEDGE_GRAPH.items():
+    _HERB_ORDER[_herb] = next(_next_position)
+    _index_herb(_herb, _properties)
+
+def save_herbs(path):
+    """
+    Write every herb of the knowledge graph to a JSON file (atomically), for
+    load_herbs() in another process
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as handle:
+            json.dump(KNOWLEDGE_GRAPH, handle)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def load_herbs(path):
+    """
+    Add (or replace) every herb of a save_herbs() file; return how many
+    """
+    with open(path) as handle:
+        herbs = json.load(handle)
+    for herb_name, properties in herbs.items():
+        add_herb(herb_name, properties)
+    return len(herbs)
+
 def get_herb_properties(herb_name):
     """
     Get Ayurvedic properties for a given herb
@@ -221,38 +355,70 @@ def search_herbs_by_property(property_type, property_value):
     """
     Search herbs by specific Ayurvedic property
     """
-    matching_herbs = []
-    for herb, properties in KNOWLEDGE_GRAPH.items():
-        if property_type in properties and property_value in properties[property_type]:
-            matching_herbs.append(herb)
-    return matching_herbs
+    matching_herbs = PROPERTY_INDEX.get(property_type, {}).get(property_value.lower(), set())
+    return _in_graph_order(matching_herbs)
+
+def get_herbs_by_compound(compound_name):
+    """
+    Get herbs known to contain a compound
+    """
+    return _in_graph_order(COMPOUND_INDEX.get(compound_name.lower(), set()))
 
 def get_herbs_by_dosha(dosha):
     """
     Get herbs that pacify a specific dosha
     """
-    matching_herbs = []
-    for herb, properties in KNOWLEDGE_GRAPH.items():
-        if 'dosha' in properties and dosha.lower() in properties['dosha'].lower():
-            matching_herbs.append(herb)
-    return matching_herbs
+    dosha = dosha.lower().strip()
+    if dosha in DOSHAS:
+        return _in_graph_order(DOSHA_INDEX.get(dosha, set()))
+    
+    # Free-text query ('all three doshas'): match the descriptions
+    matching_herbs = set()
+    for description, herbs in PROPERTY_INDEX.get('dosha', {}).items():
+        if dosha in description:
+            matching_herbs |= herbs
+    return _in_graph_order(matching_herbs)
+
+def get_similar_herbs(herb_name, k=10, metric='jaccard'):
+    """
+    Get the k herbs with the most similar properties, as (herb, score) pairs
+    
+    Scores are weighted Jaccard or cosine similarity over rasa, guna,
+    vipaka, virya, pacified doshas, therapeutic actions and compounds.
+    """
+    return SIMILARITY_ENGINE.most_similar(herb_name.title(), k, metric)
 
 def get_synergistic_herbs(herb_name):
     """
     Get herbs that work synergistically with the given herb
     """
-    herb_properties = get_herb_properties(herb_name)
-    if not herb_properties:
-        return []
+    # Herbs with similar properties and dosha effects often work synergistically
+    return [herb for herb, _ in get_similar_herbs(herb_name, k=5)]
+
+def iter_herb_neighborhood(herb_name, max_depth=2, fan_out=None, properties=NEIGHBOR_PROPERTIES):
+    """
+    Yield herbs sharing compounds or properties with a herb within max_depth hops
+    
+    BFS over the inverted indexes; at most fan_out new herbs are expanded
+    from each herb. Yields app.utils.graph_search.Neighbor records lazily.
+    """
+    herb_key = herb_name.title()
+    if herb_key not in KNOWLEDGE_GRAPH:
+        return iter(())
     
-    synergistic = []
-    herb_dosha = herb_properties.get('dosha', '')
+    # Values whose herbs were all reached already; skipping them keeps a
+    # full traversal linear in the index size
+    exhausted = set()
     
-    for other_herb, properties in KNOWLEDGE_GRAPH.items():
-        if other_herb != herb_name:
-            other_dosha = properties.get('dosha', '')
-            # Herbs that pacify similar doshas often work synergistically
-            if herb_dosha and other_dosha and any(d in other_dosha for d in herb_dosha.split()):
-                synergistic.append(other_herb)
+    def expand(herb):
+        herb_properties = KNOWLEDGE_GRAPH[herb]
+        for property_type in properties:
+            for value in herb_properties.get(property_type, []):
+                key = (property_type, value.lower())
+                if key in exhausted:
+                    continue
+                for other in _members(*key):
+                    yield other, (property_type, value)
+                exhausted.add(key)
     
-    return synergistic[:5]  # Return top 5 synergistic herbs
+    return bounded_bfs(herb_key, expand, max_depth, fan_out)
@@ -3,6 +3,7 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 import pandas as pd
+from app.utils.lexicon import LexiconMatcher
 
 # Download required NLTK data
 try:
@@ -65,6 +66,10 @@ AYURVEDIC_HERBS = {
     'lentil': ['dal', 'lens culinaris']
 }
 
+# Prebuilt once at import; see find_herbs_in_text
+HERB_MATCHER = LexiconMatcher(AYURVEDIC_HERBS)
+HERB_MATCHER.build()
+
 def find_herbs_in_text(text):
     """
     Extract herb names from text using NLP and pattern matching
@@ -73,31 +78,24 @@ def find_herbs_in_text(text):
         return []
     
     found_herbs = []
-    text_lower = text.lower()
     
-    # Direct pattern matching for known herbs
-    for herb, variations in AYURVEDIC_HERBS.items():
-        if herb in text_lower:
-            found_herbs.append(herb.title())
-        else:
-            for variation in variations:
-                if variation in text_lower:
-                    found_herbs.append(herb.title())
-                    break
+    # Single pass over the text with the prebuilt herb automaton
+    for match in HERB_MATCHER.find_all(text):
+        herb = match.canonical.title()
+        if herb not in found_herbs:
+            found_herbs.append(herb)
     
     # Use spaCy for additional entity recognition if available
     if nlp:
         doc = nlp(text)
         for ent in doc.ents:
             if ent.label_ in ['PLANT', 'ORG', 'PERSON']:  # Plants might be tagged as ORG
-                ent_text = ent.text.lower()
-                for herb, variations in AYURVEDIC_HERBS.items():
-                    if herb in ent_text or any(var in ent_text for var in variations):
-                        if herb.title() not in found_herbs:
-                            found_herbs.append(herb.title())
+                for match in HERB_MATCHER.find_all(ent.text):
+                    herb = match.canonical.title()
+                    if herb not in found_herbs:
+                        found_herbs.append(herb)
     
-    # Remove duplicates and return
-    return list(set(found_herbs))
+    return found_herbs
 
 def extract_ayurvedic_properties(text):
     """
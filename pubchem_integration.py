@@ -1,11 +1,28 @@
+import asyncio
+import os
 import requests
 import json
-import time
 from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from app.config import Config
+from app.services.compound_store import CompoundStore
+from app.utils.rate_limiter import TokenBucketRateLimiter
 
 # PubChem API base URL
 PUBCHEM_BASE_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
 
+# Shares the host-wide PubChem budget with app.services.pubchem_service
+RATE_LIMITER = TokenBucketRateLimiter(
+    rate=5,
+    capacity=Config.PUBCHEM_RATE_BURST,
+    state_path=Config.PUBCHEM_RATE_LIMIT_STATE
+)
+
+# One keep-alive pool for every call instead of a new connection per request
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=Config.PUBCHEM_MAX_CONCURRENCY))
+
 # Known compound mappings for common herbs
 HERB_COMPOUND_MAPPING = {
     'turmeric': ['curcumin', 'demethoxycurcumin', 'bisdemethoxycurcumin'],
@@ -28,6 +45,63 @@ HERB_COMPOUND_MAPPING = {
     'saffron': ['crocin', 'crocetin', 'safranal', 'picrocrocin']
 }
 
+def _fetch_known_compound(compound_name: str) -> Optional[Dict]:
+    """
+    Fetch summary properties for one compound name
+    """
+    try:
+        # Search for compound by name
+        search_url = f"{PUBCHEM_BASE_URL}/compound/name/{compound_name}/property/MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES/json"
+        
+        RATE_LIMITER.acquire()
+        response = SESSION.get(search_url, timeout=10)
+        
+        if response.status_code == 200:
+            data = response.json()
+            
+            if 'PropertyTable' in data and 'Properties' in data['PropertyTable']:
+                properties = data['PropertyTable']['Properties'][0]
+                
+                return {
+                    'molecular_formula': properties.get('MolecularFormula', 'N/A'),
+                    'molecular_weight': properties.get('MolecularWeight', 'N/A'),
+                    'iupac_name': properties.get('IUPACName', 'N/A'),
+                    'canonical_smiles': properties.get('CanonicalSMILES', 'N/A'),
+                    'pubchem_id': data.get('PropertyTable', {}).get('CID', 'N/A')
+                }
+        
+    except Exception as e:
+        print(f"Error fetching data for {compound_name}: {str(e)}")
+        # Provide fallback data
+        return {
+            'molecular_formula': 'N/A',
+            'molecular_weight': 'N/A',
+            'iupac_name': compound_name,
+            'canonical_smiles': 'N/A',
+            'pubchem_id': 'N/A',
+            'error': str(e)
+        }
+    
+    return None
+
+def _gather_compounds(compound_names: List[str]) -> List[Optional[Dict]]:
+    """
+    Run _fetch_known_compound for every name concurrently, in input order
+    """
+    if not compound_names:
+        return []
+    
+    async def gather():
+        return await asyncio.gather(*(asyncio.to_thread(_fetch_known_compound, name)
+                                      for name in compound_names))
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather())
+    # Already inside an event loop: fall back to sequential calls
+    return [_fetch_known_compound(name) for name in compound_names]
+
 def call_pubchem_api(herb_name: str) -> Dict[str, List[Dict]]:
     """
     Call PubChem API to get compound information for a herb
@@ -37,49 +111,18 @@ def call_pubchem_api(herb_name: str) -> Dict[str, List[Dict]]:
     # First try to get compounds from our mapping
     known_compounds = HERB_COMPOUND_MAPPING.get(herb_lower, [])
     
+    # Fetch the known compounds concurrently, keeping the mapping's order
     compounds_data = {}
-    
-    for compound_name in known_compounds:
-        try:
-            # Search for compound by name
-            search_url = f"{PUBCHEM_BASE_URL}/compound/name/{compound_name}/property/MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES/json"
-            
-            response = requests.get(search_url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'PropertyTable' in data and 'Properties' in data['PropertyTable']:
-                    properties = data['PropertyTable']['Properties'][0]
-                    
-                    compounds_data[compound_name] = {
-                        'molecular_formula': properties.get('MolecularFormula', 'N/A'),
-                        'molecular_weight': properties.get('MolecularWeight', 'N/A'),
-                        'iupac_name': properties.get('IUPACName', 'N/A'),
-                        'canonical_smiles': properties.get('CanonicalSMILES', 'N/A'),
-                        'pubchem_id': data.get('PropertyTable', {}).get('CID', 'N/A')
-                    }
-            
-            # Add delay to avoid rate limiting
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"Error fetching data for {compound_name}: {str(e)}")
-            # Provide fallback data
-            compounds_data[compound_name] = {
-                'molecular_formula': 'N/A',
-                'molecular_weight': 'N/A',
-                'iupac_name': compound_name,
-                'canonical_smiles': 'N/A',
-                'pubchem_id': 'N/A',
-                'error': str(e)
-            }
+    for compound_name, compound in zip(known_compounds, _gather_compounds(known_compounds)):
+        if compound:
+            compounds_data[compound_name] = compound
     
     # If no known compounds, try a general search
     if not compounds_data:
         try:
             search_url = f"{PUBCHEM_BASE_URL}/compound/name/{herb_name}/property/MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES/json"
-            response = requests.get(search_url, timeout=10)
+            RATE_LIMITER.acquire()
+            response = SESSION.get(search_url, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -105,15 +148,14 @@ def get_compound_synonyms(compound_name: str) -> List[str]:
     """
     try:
         search_url = f"{PUBCHEM_BASE_URL}/compound/name/{compound_name}/synonyms/json"
-        response = requests.get(search_url, timeout=10)
+        RATE_LIMITER.acquire()
+        response = SESSION.get(search_url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
             if 'InformationList' in data and 'Information' in data['InformationList']:
                 synonyms = data['InformationList']['Information'][0].get('Synonym', [])
                 return synonyms[:10]  # Return first 10 synonyms
-        
-        time.sleep(0.5)
     except Exception as e:
         print(f"Error fetching synonyms for {compound_name}: {str(e)}")
     
@@ -126,7 +168,8 @@ def get_compound_properties(compound_name: str) -> Dict:
     try:
         search_url = f"{PUBCHEM_BASE_URL}/compound/name/{compound_name}/property/MolecularFormula,MolecularWeight,IUPACName,CanonicalSMILES,IsomericSMILES,InChI,InChIKey,ExactMass,TopologicalPolarSurfaceArea,HeavyAtomCount,FormalCharge,Complexity/json"
         
-        response = requests.get(search_url, timeout=10)
+        RATE_LIMITER.acquire()
+        response = SESSION.get(search_url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -148,8 +191,6 @@ def get_compound_properties(compound_name: str) -> Dict:
                     'formal_charge': properties.get('FormalCharge', 'N/A'),
                     'complexity': properties.get('Complexity', 'N/A')
                 }
-        
-        time.sleep(0.5)
     except Exception as e:
         print(f"Error fetching detailed properties for {compound_name}: {str(e)}")
     
@@ -161,15 +202,14 @@ def search_compounds_by_property(property_name: str, property_value: str) -> Lis
     """
     try:
         search_url = f"{PUBCHEM_BASE_URL}/compound/property/{property_name}/{property_value}/cids/json"
-        response = requests.get(search_url, timeout=10)
+        RATE_LIMITER.acquire()
+        response = SESSION.get(search_url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
             if 'IdentifierList' in data and 'CID' in data['IdentifierList']:
                 cids = data['IdentifierList']['CID']
                 return cids[:20]  # Return first 20 results
-        
-        time.sleep(0.5)
     except Exception as e:
         print(f"Error searching compounds by property: {str(e)}")
     
@@ -183,7 +223,8 @@ def get_bioactivity_data(compound_name: str) -> Dict:
         # This is a simplified version - in practice, you'd need to query
         # ChEMBL or other bioactivity databases
         search_url = f"{PUBCHEM_BASE_URL}/compound/name/{compound_name}/property/MolecularWeight,LogP/json"
-        response = requests.get(search_url, timeout=10)
+        RATE_LIMITER.acquire()
+        response = SESSION.get(search_url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -196,8 +237,6 @@ def get_bioactivity_data(compound_name: str) -> Dict:
                     'logp': properties.get('LogP', 'N/A'),
                     'bioactivity_available': True
                 }
-        
-        time.sleep(0.5)
     except Exception as e:
         print(f"Error fetching bioactivity data for {compound_name}: {str(e)}")
     
@@ -230,4 +269,29 @@ def get_fallback_compound_data(herb_name: str) -> Dict:
     Get fallback compound data when API calls fail
     """
     herb_lower = herb_name.lower()
-    return FALLBACK_COMPOUND_DATA.get(herb_lower, {})
+    if herb_lower in FALLBACK_COMPOUND_DATA:
+        return FALLBACK_COMPOUND_DATA[herb_lower]
+    return get_offline_compound_data(herb_name)
+
+_compound_store = None
+
+def get_offline_compound_data(herb_name: str) -> Dict:
+    """
+    Get compounds for a herb from the local database built by import_compounds.py
+    """
+    global _compound_store
+    if _compound_store is None:
+        if not os.path.exists(Config.COMPOUND_DB_PATH):
+            return {}
+        _compound_store = CompoundStore(Config.COMPOUND_DB_PATH)
+    
+    compounds_data = {}
+    for compound in _compound_store.compounds_for_herb(herb_name):
+        compounds_data[compound['name'] or str(compound['cid'])] = {
+            'molecular_formula': compound.get('molecular_formula') or 'N/A',
+            'molecular_weight': compound.get('molecular_weight') or 'N/A',
+            'iupac_name': compound.get('iupac_name') or compound['name'],
+            'canonical_smiles': compound.get('smiles') or 'N/A',
+            'pubchem_id': str(compound['cid']) if compound['cid'] else 'N/A'
+        }
+    return compounds_data
@@ -1,3 +1,4 @@
+import json
 import pytest
 from app import create_app
 
@@ -23,3 +24,204 @@ def test_analyze_endpoint(client):
     data = response.get_json()
     assert data['success'] == True
     assert 'results' in data
+
+def test_analyze_document_streams_chunks(client):
+    text = ("Turmeric has bitter taste and hot potency. " * 20 +
+            "Neem is cold and bitter. " * 20)
+    response = client.post('/api/analyze/document?chunk_size=300&overlap=60',
+                           data=text, content_type='text/plain')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    frames = [json.loads(line) for line in response.data.decode().splitlines()]
+    
+    summary = frames[-1]
+    assert summary['done'] == True
+    assert summary['chunks'] == len(frames) - 1 > 1
+    assert summary['herbs'] == ['neem', 'turmeric']
+    assert sum(f['length'] for f in frames[:-1]) == len(text)
+
+def test_analyze_document_rejects_paths_outside_root(client, monkeypatch, tmp_path):
+    from app.config import Config
+    response = client.post('/api/analyze/document', json={'path': 'notes.txt'})
+    assert response.status_code == 403
+    
+    (tmp_path / 'notes.txt').write_text('Turmeric has bitter taste and hot potency.')
+    monkeypatch.setattr(Config, 'DOCUMENT_ROOT', str(tmp_path))
+    for path in ('../etc/passwd', '/etc/passwd', 'sub/../../notes.txt'):
+        response = client.post('/api/analyze/document', json={'path': path})
+        assert response.status_code == 403
+    
+    response = client.post('/api/analyze/document', json={'path': 'notes.txt'})
+    assert response.status_code == 200
+    frames = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert frames[-1]['herbs'] == ['turmeric']
+
+def test_graph_endpoint_supports_etags(client):
+    from app.routes.api import kg_service
+    if kg_service.backend != 'embedded':
+        pytest.skip('needs the embedded graph backend')
+    client.post('/api/analyze', json={'text': 'Turmeric has bitter taste and hot potency.'})
+
+    response = client.get('/api/graph/Turmeric')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.get_json()['nodes'][0]['id'] == 'Herb:Turmeric'
+
+    cached = client.get('/api/graph/Turmeric', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+def test_neighbors_endpoint_paginates_and_streams(client):
+    from app.routes.api import kg_service
+    if kg_service.backend != 'embedded':
+        pytest.skip('needs the embedded graph backend')
+    client.post('/api/analyze', json={'text': 'Turmeric and Neem have bitter taste. '
+                                              'Ginger is pungent.'})
+
+    first = client.get('/api/herbs/Turmeric/neighbors?depth=1&limit=1').get_json()
+    assert len(first['results']) == 1 and first['results'][0]['depth'] == 1
+    if first['next_offset'] is not None:
+        second = client.get(f"/api/herbs/Turmeric/neighbors?depth=1&limit=1"
+                            f"&offset={first['next_offset']}").get_json()
+        assert second['results'][0]['herb'] != first['results'][0]['herb']
+
+    response = client.get('/api/herbs/Turmeric/neighbors?depth=1&stream=1')
+    assert response.mimetype == 'application/x-ndjson'
+    frames = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert frames[-1] == {'done': True, 'count': len(frames) - 1, 'next_offset': None}
+
+    assert client.get('/api/herbs/Turmeric/neighbors?depth=9').status_code == 400
+
+def test_similar_herbs_endpoint(client):
+    response = client.get('/api/herbs/turmeric/similar?k=3')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['herb'] == 'Turmeric' and len(data['similar']) == 3
+    scores = [item['score'] for item in data['similar']]
+    assert scores == sorted(scores, reverse=True)
+
+    assert client.get('/api/herbs/unknown/similar').status_code == 404
+    assert client.get('/api/herbs/turmeric/similar?metric=euclid').status_code == 400
+
+def test_analyze_reports_formulation_synergies(client):
+    response = client.post('/api/analyze', json={'text': 'Take turmeric with black pepper.'})
+    formulation = response.get_json()['formulation']
+    assert formulation['pairs'][0]['herbs'] == ['turmeric', 'black pepper']
+    assert formulation['pairs'][0]['synergies'][0]['basis'] == 'herb'
+    assert formulation['pairs'][0]['confidence_score'] == 0.9
+
+    response = client.post('/api/analyze', json={'text': 'Take turmeric with black pepper.',
+                                                 'min_confidence': 0.95})
+    assert response.get_json()['formulation']['pairs'] == []
+
+    response = client.post('/api/analyze', json={'text': 'Turmeric', 'max_combination_size': 'x'})
+    assert response.status_code == 400
+
+def test_analyze_filters_hypotheses_by_confidence(client):
+    text = 'Turmeric has bitter taste, tikta rasa and ushna virya.'
+    full = client.post('/api/analyze', json={'text': text}).get_json()['results'][0]['hypotheses']
+    scores = [h['confidence_score'] for h in full]
+    assert scores == sorted(scores, reverse=True)
+    assert all(h['confidence'] in ('high', 'medium', 'low') for h in full)
+
+    kept = client.post('/api/analyze', json={'text': text, 'top_k': 1}).get_json()
+    assert len(kept['results'][0]['hypotheses']) == min(1, len(full))
+    response = client.post('/api/analyze', json={'text': text, 'min_confidence': 2})
+    assert response.status_code == 400
+
+def test_analyze_batch_returns_documents_in_input_order(client):
+    texts = ['Take turmeric with black pepper.', 'Neem is bitter.', 'Take turmeric with black pepper.']
+    response = client.post('/api/analyze/batch', json={'texts': texts, 'top_k': 2})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [d['index'] for d in data['documents']] == [0, 1, 2]
+    herbs = [[r['herb'].get('canonical', r['herb']['name']) for r in d['results']]
+             for d in data['documents']]
+    assert herbs == [['turmeric', 'black pepper'], ['neem'], ['turmeric', 'black pepper']]
+    assert (data['distinct_texts'], data['unique_herbs']) == (2, 3)
+    assert data['documents'][2]['formulation']['pairs'][0]['herbs'] == ['turmeric', 'black pepper']
+    assert all(len(r['hypotheses']) <= 2 for d in data['documents'] for r in d['results'])
+    assert set(data['timings']) == {'nlp_ms', 'compounds_ms', 'hypotheses_ms',
+                                    'formulation_ms', 'kg_ms', 'total_ms'}
+
+def test_analyze_batch_validates_texts(client):
+    assert client.post('/api/analyze/batch', json={'texts': []}).status_code == 400
+    assert client.post('/api/analyze/batch', json={'texts': ['a', 3]}).status_code == 400
+    response = client.post('/api/analyze/batch', json={'texts': ['a'], 'top_k': 0})
+    assert response.status_code == 400
+
+def test_merge_kg_records_keeps_one_record_per_herb():
+    from app.routes.api import _merge_kg_records
+    records = [
+        {'name': 'Neem', 'properties': {'rasa': 'tikta', 'virya': 'unknown', 'guna': ''},
+         'rasa': ['tikta'], 'guna': [], 'virya': [], 'compounds': [{'cid': 1, 'name': 'A'}]},
+        {'name': 'Neem', 'properties': {'rasa': 'kashaya', 'virya': 'shita', 'guna': 'laghu'},
+         'rasa': ['kashaya', 'tikta'], 'guna': ['laghu'], 'virya': ['shita'],
+         'compounds': [{'cid': 1, 'name': 'A'}, {'cid': 2, 'name': 'B'}]}
+    ]
+    [merged] = _merge_kg_records(records)
+    assert merged['rasa'] == ['tikta', 'kashaya']
+    assert merged['properties'] == {'rasa': 'tikta,kashaya', 'virya': 'shita', 'guna': 'laghu'}
+    assert [c['cid'] for c in merged['compounds']] == [1, 2]
+    assert records[0]['rasa'] == ['tikta']
+
+def test_analyze_streams_herb_results_then_summary(client):
+    text = 'Take turmeric with black pepper and neem.'
+    response = client.post('/api/analyze?stream=ndjson', json={'text': text})
+    assert response.mimetype == 'application/x-ndjson'
+    frames = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert frames[0]['type'] == 'herbs'
+    assert sorted(f['index'] for f in frames[1:-1]) == list(range(len(frames[0]['herbs'])))
+    assert frames[-1]['type'] == 'summary'
+    assert frames[-1]['resolved'] == len(frames[0]['herbs'])
+    
+    response = client.post('/api/analyze', json={'text': text},
+                           headers={'Accept': 'text/event-stream'})
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split('\n')[1] for block in response.data.decode().split('\n\n') if block]
+    assert events[0] == 'event: herbs' and events[-1] == 'event: summary'
+
+def test_analyze_stream_cancels_lookups_when_client_leaves(client, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+    import app.routes.api as api
+    gate = threading.Event()
+    looked_up = []
+    
+    def search_herb_compounds(name):
+        looked_up.append(name)
+        if len(looked_up) > 1:
+            gate.wait(5)
+        return []
+    
+    monkeypatch.setattr(api.pubchem_service, 'search_herb_compounds', search_herb_compounds)
+    monkeypatch.setattr(api, 'stream_executor', ThreadPoolExecutor(max_workers=1))
+    cancelled = dict(api._stream_stats)
+    
+    response = client.post('/api/analyze?stream=1', buffered=False,
+                           json={'text': 'Take turmeric with black pepper and neem.'})
+    frames = iter(response.response)
+    assert json.loads(next(frames))['type'] == 'herbs'
+    assert json.loads(next(frames))['type'] == 'result'
+    response.close()
+    gate.set()
+    api.stream_executor.shutdown(wait=True)
+    assert len(looked_up) < 3
+    assert api._stream_stats['cancelled'] == cancelled['cancelled'] + 1
+    assert api._stream_stats['lookups_cancelled'] > cancelled['lookups_cancelled']
+
+def test_analyze_stream_counts_failures_apart_from_disconnects(client, monkeypatch):
+    import app.routes.api as api
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError('scoring failed')
+    
+    monkeypatch.setattr(api.pubchem_service, 'search_herb_compounds', lambda name: [])
+    monkeypatch.setattr(api.hypothesis_engine, 'generate_hypotheses', fail)
+    before = dict(api._stream_stats)
+    
+    response = client.post('/api/analyze?stream=ndjson', json={'text': 'Take turmeric with neem.'})
+    frames = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert frames[-1] == {'type': 'error', 'error': 'scoring failed'}
+    assert api._stream_stats['errors'] == before['errors'] + 1
+    assert api._stream_stats['cancelled'] == before['cancelled']
@@ -0,0 +1,100 @@
+import json
+import zipfile
+import pytest
+from app.services.compound_store import CompoundStore
+from app.services.pubchem_service import PubChemService
+
+CSV_ROWS = """Herb,Phytochemical Name,PubChem CID,InChIKey,Synonyms,Molecular Formula,Molecular Weight,SMILES
+Turmeric,Curcumin,969516,vfldvqvibfgzkr-uhfffaoysa-n,Diferuloylmethane|Turmeric yellow,C21H20O6,368.4,COC1
+Black Pepper,Piperine,638024,MXXWOMGUGJBKIW-YPCIICBESA-N,Bioperine,C17H19NO3,285.34,O=C(N1
+Tulsi,Eugenol,3314,,,C10H12O2,,
+"""
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / 'phytochemicals.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('data/compounds.csv', CSV_ROWS)
+        # A second member repeats a compound for another herb, filling the weight
+        zf.writestr('data/extra.json', json.dumps(
+            {'Clove': [{'compound': 'eugenol', 'cid': '3314', 'mw': '164.2'}]}
+        ))
+    return str(path)
+
+@pytest.fixture
+def store(tmp_path, archive):
+    store = CompoundStore(str(tmp_path / 'compounds.sqlite3'))
+    store.import_archive(archive)
+    return store
+
+def test_import_indexes_names_synonyms_cids_and_herbs(store):
+    assert store.find_by_name('CURCUMIN')['cid'] == 969516
+    assert store.find_by_name('diferuloylmethane')['cid'] == 969516
+    assert store.find_by_inchikey('VFLDVQVIBFGZKR-UHFFFAOYSA-N')['name'] == 'Curcumin'
+    assert store.find_by_cid(638024)['molecular_formula'] == 'C17H19NO3'
+    assert [c['name'] for c in store.compounds_for_herb('black pepper')] == ['Piperine']
+    assert store.find_by_name('unobtainium') is None
+
+def test_rows_for_the_same_compound_are_merged(store):
+    eugenol = store.find_by_cid(3314)
+    assert eugenol['molecular_weight'] == '164.2'
+    assert eugenol['molecular_formula'] == 'C10H12O2'
+    assert [c['cid'] for c in store.compounds_for_herb('clove')] == [3314]
+    assert store.stats()['compounds'] == 3
+
+def test_lfs_pointer_archive_is_rejected(tmp_path):
+    pointer = tmp_path / 'pointer.zip'
+    pointer.write_text("version https://git-lfs.github.com/spec/v1\noid sha256:00\nsize 1\n")
+    with pytest.raises(ValueError, match='git lfs pull'):
+        CompoundStore(str(tmp_path / 'db.sqlite3')).import_archive(str(pointer))
+
+def test_offline_service_answers_from_store(store, tmp_path):
+    class NoNetwork:
+        def get(self, url, timeout=None):
+            pytest.fail(f"network request for {url}")
+
+    service = PubChemService(compound_db_path=store.path, offline=True)
+    service.session = NoNetwork()
+
+    results = service.search_compounds_for_herbs(['Turmeric', 'Clove', 'Saffron'])
+
+    assert results['Turmeric'][0]['molecular_formula'] == 'C21H20O6'
+    assert [c['cid'] for c in results['Clove']] == [3314]
+    assert results['Saffron'] == []
+    assert service.get_compound_synonyms('curcumin') == ['Diferuloylmethane', 'Turmeric yellow']
+
+def test_reimport_applies_only_the_delta(tmp_path, archive):
+    from app.services.import_manifest import ImportManifest
+    manifest = ImportManifest(str(tmp_path / 'manifest.sqlite3'))
+    store = CompoundStore(str(tmp_path / 'incremental.sqlite3'))
+    first = store.import_archive(archive, manifest=manifest)
+    assert len(first['delta']['added']) == 3
+
+    again = store.import_archive(archive, manifest=manifest)
+    assert again['rows'] == 0 and again['delta']['unchanged'] == 3
+
+    updated = tmp_path / 'updated.zip'
+    with zipfile.ZipFile(updated, 'w') as zf:
+        zf.writestr('data/compounds.csv', CSV_ROWS.replace('285.34', '285.3').split('Tulsi')[0])
+        zf.writestr('data/extra.json', json.dumps(
+            {'Clove': [{'compound': 'eugenol', 'cid': '3314', 'mw': '164.2'}]}
+        ))
+    delta = store.import_archive(str(updated), manifest=manifest)['delta']
+    # Eugenol changed too: it lost its Tulsi row
+    assert (delta['changed'], delta['removed'], delta['unchanged']) == (['Piperine', 'eugenol'], [], 1)
+    assert store.find_by_cid(638024)['molecular_weight'] == '285.3'
+    assert [c['name'] for c in store.compounds_for_herb('tulsi')] == []
+    assert [c['name'] for c in store.compounds_for_herb('clove')] == ['eugenol']
+
+def test_json_members_are_parsed_record_by_record():
+    import io
+    from app.utils.archive import _iter_json_rows
+    document = json.dumps({
+        'meta': {'version': 2},
+        'records': [{'compound': 'Curcumin', 'cid': 969516}, 'skipped', {'compound': 'Piperine'}]
+    }, indent=1)
+    # A 3-character buffer forces values and literals to span refills
+    rows = list(_iter_json_rows(io.StringIO(document), chunk_size=3))
+    assert rows == [{'compound': 'Curcumin', 'cid': 969516}, {'compound': 'Piperine'}]
+    grouped = list(_iter_json_rows(io.StringIO('{"Neem": [{"c": "nimbin"}], "Tulsi": {"c": 1}}'), 2))
+    assert grouped == [{'__group__': 'Neem', 'c': 'nimbin'}, {'__group__': 'Tulsi', 'c': 1}]
@@ -0,0 +1,138 @@
+import json
+import zipfile
+import pytest
+from app.services.compound_store import CompoundStore
+from app.services.herb_importer import HerbImporter
+from app.services.kg_service import KnowledgeGraphService
+
+# Long format: one row per herb and compound, properties repeated
+CSV_ROWS = """Herb Name,Botanical Name,Rasa,Virya,Vipaka,Dosha,Karma,Chemical Constituents
+Guggulu,Commiphora wightii,Tikta; Katu,Ushna (hot),Katu,Pacifies vata and kapha,anti-inflammatory,guggulsterone
+Guggulu,Commiphora wightii,Tikta,Ushna,Katu,,lekhana,myrrhanol
+Vacha,Acorus calamus,pungent|bitter,heating,pungent,,nervine,asarone
+"""
+
+class MemoryStore:
+    """Stands in for the knowledge_graph module."""
+    def __init__(self):
+        self.herbs = {}
+    def get_herb_properties(self, name):
+        return self.herbs.get(name.title())
+    def add_herb(self, name, properties):
+        self.herbs[name.title()] = properties
+    def remove_herb(self, name):
+        return self.herbs.pop(name.title(), None) is not None
+
+SHATAVARI = {'name': 'Shatavari', 'rasa': ['madhura', 'tikta'], 'guna': ['guru', 'snigdha'],
+             'virya': 'shita', 'compounds': 'shatavarin IV'}
+
+def write_archive(path, csv_rows=CSV_ROWS, json_herbs=(SHATAVARI,)):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('herbs/classical.csv', csv_rows)
+        zf.writestr('herbs/more.json', json.dumps({'herbs': list(json_herbs)}))
+    return str(path)
+
+@pytest.fixture
+def archive(tmp_path):
+    return write_archive(tmp_path / 'herbs.zip')
+
+@pytest.fixture
+def embedded(tmp_path):
+    return KnowledgeGraphService('bolt://unused', 'neo4j', 'secret', backend='embedded',
+                                 snapshot_path=str(tmp_path / 'graph.json'))
+
+def test_import_normalizes_into_graph_and_memory(tmp_path, archive, embedded):
+    compounds = CompoundStore(str(tmp_path / 'compounds.sqlite3'))
+    compounds.import_rows([{'compound': 'Guggulsterone', 'cid': '6450278'}])
+    memory = MemoryStore()
+    importer = HerbImporter(embedded, memory, compounds, batch_size=2)
+
+    stats = importer.import_archive(archive)
+    assert (stats['rows'], stats['herbs'], stats['skipped']) == (4, 3, 0)
+    assert stats['rows_per_s'] > 0
+
+    guggulu = memory.herbs['Guggulu']
+    assert guggulu['rasa'] == ['bitter', 'pungent'] and guggulu['virya'] == ['hot']
+    assert guggulu['vipaka'] == ['pungent']
+    assert guggulu['therapeutic_actions'] == ['anti-inflammatory', 'lekhana']
+    assert guggulu['modern_compounds'] == ['guggulsterone', 'myrrhanol']
+    assert memory.herbs['Vacha']['rasa'] == ['pungent', 'bitter']
+
+    assert embedded.search_herbs_by_property('rasa', 'tikta') == ['Guggulu', 'Vacha', 'Shatavari']
+    assert embedded.search_herbs_by_property('virya', 'shita') == ['Shatavari']
+    graph = embedded.get_herb_graph('Guggulu')
+    assert graph['nodes'][0]['scientific_name'] == 'Commiphora wightii'
+    assert 'Compound:6450278' in {node['id'] for node in graph['nodes']}
+
+def test_import_resumes_from_checkpoint(tmp_path, archive, embedded):
+    checkpoint = str(tmp_path / 'import.checkpoint.json')
+    importer = HerbImporter(embedded, batch_size=1, checkpoint_path=checkpoint, checkpoint_every=1)
+
+    def crash(stats):
+        if stats['batches'] == 2:
+            raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_archive(archive, progress=crash)
+    assert importer.load_checkpoint(archive)['row'] == 2
+
+    # A fresh process reloads the snapshot and picks up after row 2
+    embedded = KnowledgeGraphService('bolt://unused', 'neo4j', 'secret', backend='embedded',
+                                     snapshot_path=str(tmp_path / 'graph.json'))
+    importer = HerbImporter(embedded, batch_size=1, checkpoint_path=checkpoint, checkpoint_every=1)
+    stats = importer.import_archive(archive)
+    assert stats['resumed_from'] == {'member': 'herbs/classical.csv', 'row': 2}
+    assert stats['rows'] == 2
+    assert sorted(embedded.get_all_herbs()) == ['Guggulu', 'Shatavari', 'Vacha']
+    assert importer.load_checkpoint(archive)['complete']
+
+def test_reimport_writes_only_changed_herbs(tmp_path, archive, embedded):
+    from app.services.import_manifest import ImportManifest
+    manifest = ImportManifest(str(tmp_path / 'manifest.sqlite3'))
+    memory = MemoryStore()
+    importer = HerbImporter(embedded, memory, manifest=manifest)
+
+    first = importer.import_archive(archive)
+    assert sorted(first['delta']['added']) == ['Guggulu', 'Shatavari', 'Vacha']
+    unchanged = importer.import_archive(archive)
+    assert unchanged['herbs'] == 0 and unchanged['delta']['unchanged'] == 3
+
+    guggulu_graph = embedded.get_herb_graph('Guggulu')
+    vacha_graph = embedded.get_herb_graph('Vacha')
+    # Vacha turns cooling, Shatavari is dropped and Brahmi is new
+    rows = CSV_ROWS.replace('pungent|bitter,heating', 'bitter,cooling') + \
+        'Brahmi,Bacopa monnieri,tikta,shita,madhura,,medhya,bacoside A\n'
+    write_archive(tmp_path / 'herbs.zip', rows, json_herbs=())
+    stats = importer.import_archive(archive)
+
+    assert stats['delta'] == {'added': ['Brahmi'], 'changed': ['Vacha'],
+                              'removed': ['Shatavari'], 'unchanged': 1}
+    assert stats['herbs'] == 2
+    assert embedded.search_herbs_by_property('virya', 'shita') == ['Vacha', 'Brahmi']
+    assert embedded.search_herbs_by_property('virya', 'ushna') == ['Guggulu']
+    assert 'Shatavari' not in embedded.get_all_herbs()
+    assert memory.herbs['Vacha']['rasa'] == ['bitter'] and 'Shatavari' not in memory.herbs
+    assert embedded.get_herb_graph('Guggulu') is guggulu_graph
+    assert embedded.get_herb_graph('Vacha') is not vacha_graph
+    assert embedded.get_herb_graph('Vacha')['nodes'][0]['content_hash']
+    assert manifest.stats('herbs') == {'entities': 3, 'tombstones': 1}
+
+    # A new process's memory store gets unchanged herbs too, but the graph only the delta
+    fresh_memory = MemoryStore()
+    again = HerbImporter(embedded, fresh_memory, manifest=manifest).import_archive(archive)
+    assert again['herbs'] == 0 and again['delta']['unchanged'] == 3
+    assert sorted(fresh_memory.herbs) == ['Brahmi', 'Guggulu', 'Vacha']
+    assert fresh_memory.herbs['Vacha'] == memory.herbs['Vacha']
+    assert embedded.get_herb_graph('Guggulu') is guggulu_graph
+
+def test_herb_split_across_batches_keeps_all_text_values(tmp_path, embedded):
+    rows = CSV_ROWS.replace(',,lekhana', ',Aggravates pitta,lekhana')
+    archive = write_archive(tmp_path / 'split.zip', csv_rows=rows, json_herbs=())
+    memory = MemoryStore()
+    HerbImporter(embedded, memory, batch_size=1).import_archive(archive)
+
+    expected = ['pacifies vata and kapha', 'aggravates pitta']
+    assert memory.herbs['Guggulu']['dosha'] == expected
+    node = embedded.get_herb_properties(['Guggulu', 'Unknown'])
+    assert list(node) == ['Guggulu']
+    assert node['Guggulu']['dosha'] == ','.join(expected)
+    assert node['Guggulu']['vipaka'] == 'katu'
@@ -0,0 +1,138 @@
+import time
+from app.services.hypothesis_service import HypothesisEngine
+from app.services.rule_store import RuleStore
+from app.utils.combinations import linked_combinations
+
+def test_linked_combinations_keep_only_fully_linked_groups():
+    pairs = [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (0, 3), (3, 4)]
+    groups, truncated = linked_combinations(pairs, max_size=5)
+    assert groups == [(0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3), (0, 1, 2, 3)]
+    assert not truncated
+    assert linked_combinations(pairs, max_size=3)[0] == groups[:4]
+    assert linked_combinations(pairs, max_size=3, max_per_level=2) == ([(0, 1, 2), (0, 1, 3)], True)
+
+def test_formulation_links_herbs_and_split_compounds():
+    engine = HypothesisEngine(RuleStore({
+        'herb_synergies': {'kind': 'pair', 'rules': [
+            {'pair': ['Turmeric', 'Black Pepper'], 'mechanism': 'm', 'evidence': 'e',
+             'clinical_significance': 'c'}]},
+        'compound_synergies': {'kind': 'pair', 'rules': [
+            {'pair': [a, b], 'mechanism': f'{a}+{b}', 'evidence': 'e', 'clinical_significance': 'c'}
+            for a, b in [('curcumin', 'piperine'), ('gingerol', 'piperine'), ('curcumin', 'gingerol')]]}
+    }))
+    compounds = {
+        'Turmeric': [{'name': 'curcumin', 'molecular_formula': 'C21H20O6'}],
+        'Black Pepper': [{'name': 'piperine'}],
+        'Ginger': [{'name': 'gingerol'}],
+        'Neem': [{'name': 'nimbin'}]
+    }
+    result = engine.generate_formulation_hypotheses(
+        ['Turmeric', 'Neem', 'Black Pepper', 'Ginger', 'Turmeric'], compounds)
+    assert result['herbs'] == ['Turmeric', 'Neem', 'Black Pepper', 'Ginger']
+    pairs = {tuple(p['herbs']): [s['basis'] for s in p['synergies']] for p in result['pairs']}
+    assert pairs == {('Turmeric', 'Black Pepper'): ['herb', 'compound'],
+                     ('Turmeric', 'Ginger'): ['compound'],
+                     ('Black Pepper', 'Ginger'): ['compound']}
+    assert [c['herbs'] for c in result['combinations']] == [['Turmeric', 'Black Pepper', 'Ginger']]
+    # A herb rule outranks compound rules; a triple decays from its weakest pair
+    assert [(p['herbs'][1], p['confidence_score'], p['confidence']) for p in result['pairs']] == [
+        ('Black Pepper', 0.9, 'high'), ('Ginger', 0.8, 'high'), ('Ginger', 0.8, 'high')]
+    assert (result['combinations'][0]['confidence_score'],
+            result['combinations'][0]['confidence']) == (0.64, 'medium')
+
+    kept = engine.generate_formulation_hypotheses(
+        ['Turmeric', 'Black Pepper', 'Ginger'], compounds, min_confidence=0.7, top_k=2)
+    assert [p['confidence_score'] for p in kept['pairs']] == [0.9, 0.8]
+    assert kept['combinations'] == []
+
+def test_formulation_stage_is_bounded_for_large_formulas():
+    herbs = [f'herb {i}' for i in range(30)]
+    rules = [{'pair': [f'compound {i}', f'compound {j}'], 'mechanism': 'm', 'evidence': 'e',
+              'clinical_significance': 'c'} for i in range(30) for j in range(i + 1, 30)]
+    engine = HypothesisEngine(RuleStore({'compound_synergies': {'kind': 'pair', 'rules': rules}}))
+    compounds = {herb: [{'name': f'compound {i}'}] for i, herb in enumerate(herbs)}
+    start = time.perf_counter()
+    result = engine.generate_formulation_hypotheses(herbs, compounds, max_combination_size=6,
+                                                    max_combinations=100)
+    assert time.perf_counter() - start < 5
+    assert len(result['pairs']) == 435
+    assert result['truncated'] and len(result['combinations']) == 400
+
+def test_hypotheses_are_scored_and_sorted():
+    engine = HypothesisEngine(RuleStore())
+    herb = {'name': 'Turmeric', 'rasa': ['tikta'], 'guna': ['laghu'], 'virya': 'ushna'}
+    compounds = [{'name': 'piperine', 'cid': 638024}, {'name': 'curcumin', 'cid': 969516}]
+    hypotheses = engine.generate_hypotheses(herb, compounds)
+    # tikta predicts anti-inflammatory and antimicrobial activity, both evidenced
+    assert [(h.get('ayurvedic_property') or h['type'], h['confidence_score'], h['confidence'])
+            for h in hypotheses] == [
+        ('synergy_analysis', 0.9, 'high'),
+        ('Rasa: tikta', 0.8, 'high'),
+        ('phytochemical_analysis', 0.8, 'high'),
+        ('Guna: laghu', 0.5, 'medium'),
+        ('Virya: ushna', 0.5, 'medium')
+    ]
+    kept = engine.generate_hypotheses(herb, compounds, min_confidence=0.6, top_k=2)
+    assert [h['confidence_score'] for h in kept] == [0.9, 0.8]
+    assert engine.generate_hypotheses(herb, compounds, min_confidence=0.95) == []
+
+def test_batch_scores_herbs_together_and_shares_fingerprints():
+    engine = HypothesisEngine(RuleStore())
+    neem = {'name': 'Neem', 'rasa': ['tikta'], 'guna': [], 'virya': 'unknown'}
+    tulsi = {'name': 'Tulsi', 'rasa': ['tikta'], 'guna': [], 'virya': 'unknown'}
+    batch = engine.generate_hypotheses_batch([(neem, [{'name': 'eugenol'}]), (tulsi, [])])
+    assert batch[0][0]['confidence_score'] == 0.8 and batch[1][0]['confidence_score'] == 0.5
+    # Same properties and compounds: one entry, stamped with each herb's name
+    again = engine.generate_hypotheses_batch([(tulsi, [{'name': 'eugenol'}])])
+    assert again[0][0]['herb'] == 'Tulsi'
+    assert engine.cache_stats()['hits'] == 1
+
+def test_hypotheses_are_memoized_until_rules_change():
+    store = RuleStore()
+    engine = HypothesisEngine(store, cache_size=8)
+    herb = {'name': 'Turmeric', 'rasa': ['tikta'], 'guna': [], 'virya': 'unknown'}
+    compounds = [{'cid': 2, 'molecular_formula': 'B'}, {'cid': 1, 'molecular_formula': 'A'}]
+    first = engine.generate_hypotheses(herb, compounds)
+    first[1]['mechanism'] = 'mutated'
+    again = engine.generate_hypotheses(dict(herb), list(reversed(compounds)))
+    assert again[1]['mechanism'] != 'mutated'
+    assert engine.cache_stats()['hits'] == 1
+
+    store.update({'property_bioactivity': {'kind': 'key', 'rules': {
+        'tikta': {'likely_properties': ['bitter tonic'], 'mechanism': 'Reloaded', 'prior': 0.95}}}})
+    reloaded = engine.generate_hypotheses(herb, compounds)
+    assert (reloaded[0]['mechanism'], reloaded[0]['confidence_score']) == ('Reloaded', 0.95)
+    stats = engine.cache_stats()
+    assert (stats['hits'], stats['rule_invalidations'], stats['rule_version']) == (1, 1, store.version)
+
+def test_cached_hypotheses_match_an_uncached_engine():
+    engine = HypothesisEngine(RuleStore(), cache_size=8)
+    herb = {'name': 'Turmeric', 'rasa': ['tikta'], 'guna': [], 'virya': 'unknown'}
+    engine.generate_hypotheses(herb, [{'cid': 1, 'name': 'diferuloylmethane', 'molecular_formula': 'C21'},
+                                      {'cid': 2, 'name': 'water', 'molecular_formula': 'H2O'}])
+    for compounds in (
+        [{'cid': 1, 'name': 'Curcumin', 'molecular_formula': 'C21'},
+         {'cid': 2, 'name': 'Piperine', 'molecular_formula': 'H2O'}],
+        [{'cid': 2, 'name': 'water', 'molecular_formula': 'H2O'},
+         {'cid': 1, 'name': 'diferuloylmethane', 'molecular_formula': 'C21'}],
+    ):
+        fresh = HypothesisEngine(RuleStore()).generate_hypotheses(herb, compounds)
+        assert engine.generate_hypotheses(herb, compounds) == fresh
+    assert engine.cache_stats()['hits'] == 1
+
+def test_legacy_hypotheses_are_memoized_by_fingerprint():
+    import hypothesis_engine
+    hypothesis_engine.HYPOTHESIS_CACHE.clear()
+    herbs = ['Turmeric', 'Black Pepper']
+    properties = {'Turmeric': {'rasa': ['bitter'], 'dosha': 'Balances Kapha', 'description': 'x'}}
+    compounds = {'Turmeric': {'curcumin': {}}, 'Black Pepper': {'piperine': {}}}
+    first = hypothesis_engine.generate_hypothesis(herbs, properties, compounds)
+    hits = hypothesis_engine.hypothesis_cache_stats()['hits']
+    # Properties the rules do not read leave the fingerprint unchanged
+    properties['Turmeric']['description'] = 'y'
+    assert hypothesis_engine.generate_hypothesis(herbs, properties, compounds) == first
+    assert hypothesis_engine.hypothesis_cache_stats()['hits'] == hits + 1
+    properties['Turmeric']['rasa'] = ['pungent']
+    changed = hypothesis_engine.generate_hypothesis(herbs, properties, compounds)
+    assert changed != first
+    assert hypothesis_engine.hypothesis_cache_stats()['hits'] == hits + 1
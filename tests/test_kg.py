@@ -0,0 +1,330 @@
+import pytest
+from app.services import kg_service as kg_module
+from app.services.kg_service import KnowledgeGraphService
+
+class FakeTransaction:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def run(self, query, **params):
+        self.queries.append((query, params))
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        self.driver.auto_commit.append(query)
+        return []
+
+    def execute_write(self, work):
+        self.driver.transactions.append([])
+        return work(FakeTransaction(self.driver.transactions[-1]))
+
+class FakeDriver:
+    def __init__(self):
+        self.sessions = 0
+        self.auto_commit = []
+        self.transactions = []
+
+    def session(self):
+        self.sessions += 1
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def kg(monkeypatch):
+    driver = FakeDriver()
+    monkeypatch.setattr(kg_module.GraphDatabase, 'driver', lambda *args, **kwargs: driver)
+    service = KnowledgeGraphService('bolt://fake', 'neo4j', 'secret')
+    driver.sessions = 0
+    driver.auto_commit.clear()
+    return service
+
+def test_upsert_analysis_uses_one_transaction(kg):
+    kg.upsert_analysis([
+        {'name': 'Turmeric', 'properties': {'virya': 'ushna'}, 'rasa': ['tikta', 'katu'],
+         'guna': ['laghu'], 'virya': ['ushna'], 'compounds': [{'cid': 969516, 'name': 'C21H20O6'}]},
+        {'name': 'Neem', 'properties': {}, 'rasa': ['tikta'], 'guna': [], 'virya': [],
+         'compounds': []}
+    ])
+
+    driver = kg.driver
+    assert driver.sessions == 1
+    assert driver.auto_commit == []
+    assert len(driver.transactions) == 1
+
+    queries = driver.transactions[0]
+    # herbs, rasa, guna, virya and compounds; no query for empty row lists
+    assert len(queries) == 5
+    assert all(query.startswith('UNWIND') for query, _ in queries)
+    assert [h['name'] for h in queries[0][1]['herbs']] == ['Turmeric', 'Neem']
+    assert queries[1][1]['rows'] == [{'herb': 'Turmeric', 'value': 'tikta'},
+                                     {'herb': 'Turmeric', 'value': 'katu'},
+                                     {'herb': 'Neem', 'value': 'tikta'}]
+    assert queries[4][1]['rows'] == [{'herb': 'Turmeric', 'cid': 969516, 'name': 'C21H20O6'}]
+
+def test_upsert_analysis_skips_empty_batch(kg):
+    kg.upsert_analysis([])
+    assert kg.driver.sessions == 0
+
+def _entry(name, rasa=(), cids=()):
+    return {'name': name, 'properties': {'rasa': ','.join(rasa)}, 'rasa': list(rasa),
+            'guna': [], 'virya': [], 'compounds': [{'cid': cid, 'name': str(cid)} for cid in cids]}
+
+def test_write_queue_coalesces_and_drains_on_close():
+    from app.services.kg_write_queue import KGWriteQueue
+    writes = []
+    queue = KGWriteQueue(writes.append, max_batch=100, flush_interval=60)
+
+    queue.put([_entry('Turmeric', ['tikta'], [969516])])
+    queue.put([_entry('Turmeric', ['katu'], [969516, 5281794]), _entry('Neem', ['tikta'])])
+    assert queue.depth() == 2 and writes == []
+
+    queue.close()
+    assert len(writes) == 1
+    turmeric, neem = writes[0]
+    assert turmeric['rasa'] == ['tikta', 'katu']
+    assert [c['cid'] for c in turmeric['compounds']] == [969516, 5281794]
+    assert turmeric['properties'] == {'rasa': 'katu'}
+    assert neem['name'] == 'Neem'
+
+    stats = queue.stats()
+    assert stats['depth'] == 0
+    assert stats['coalesced'] == 1
+    assert stats['written'] == 2
+    assert stats['flushes'] == 1
+
+def test_write_queue_flushes_in_background_on_size():
+    import threading
+    from app.services.kg_write_queue import KGWriteQueue
+    written = threading.Event()
+    batches = []
+
+    def write(batch):
+        batches.append(batch)
+        written.set()
+
+    queue = KGWriteQueue(write, max_batch=2, flush_interval=60)
+    queue.put([_entry('Turmeric'), _entry('Neem'), _entry('Tulsi')])
+
+    assert written.wait(5)
+    assert [e['name'] for e in batches[0]] == ['Turmeric', 'Neem']
+    queue.close()
+    assert [e['name'] for e in batches[-1]] == ['Tulsi']
+
+def test_write_queue_retries_failed_batch():
+    from app.services.kg_write_queue import KGWriteQueue
+    writes = []
+
+    def flaky(batch):
+        if not writes:
+            writes.append(None)
+            raise RuntimeError('neo4j unavailable')
+        writes.append(batch)
+
+    queue = KGWriteQueue(flaky, max_batch=10, flush_interval=60)
+    queue.put([_entry('Turmeric', ['tikta'])])
+    queue.flush()
+    assert queue.depth() == 1
+    queue.put([_entry('Turmeric', ['katu'])])
+    queue.close()
+
+    assert writes[-1][0]['rasa'] == ['tikta', 'katu']
+    assert queue.stats()['errors'] == 1
+
+def test_write_queue_flush_waits_for_in_flight_batch():
+    import threading
+    import time
+    from app.services.kg_write_queue import KGWriteQueue
+    taken = threading.Event()
+    writes = []
+
+    class SlowQueue(KGWriteQueue):
+        def _write_batch(self, batch, retry=False):
+            # Widen the gap between the flusher taking a batch and writing it
+            if threading.current_thread().name == 'kg-write-behind':
+                taken.set()
+                time.sleep(0.3)
+            return super()._write_batch(batch, retry)
+
+    queue = SlowQueue(lambda batch: writes.extend((e['name'], e['rasa']) for e in batch),
+                      max_batch=1, flush_interval=60)
+    queue.put([_entry('X', ['v1'])])
+    assert taken.wait(5)
+    queue.put([_entry('X', ['v2'])])
+    queue.flush()
+    assert writes == [('X', ['v1']), ('X', ['v2'])]
+    queue.close()
+
+def test_enqueue_analysis_is_written_before_reads(kg):
+    from app.services.kg_write_queue import KGWriteQueue
+    kg.write_queue = KGWriteQueue(kg.upsert_analysis, max_batch=100, flush_interval=60)
+
+    kg.enqueue_analysis([_entry('Turmeric', ['tikta'])])
+    assert kg.driver.transactions == []
+    kg.get_all_herbs()
+    assert len(kg.driver.transactions) == 1
+    kg.close()
+
+@pytest.fixture
+def embedded(tmp_path):
+    return KnowledgeGraphService('bolt://unused', 'neo4j', 'secret', backend='embedded',
+                                 snapshot_path=str(tmp_path / 'graph.json'))
+
+def test_embedded_backend_serves_reads(embedded):
+    embedded.upsert_analysis([
+        _entry('Turmeric', ['tikta', 'katu'], [969516]),
+        _entry('Neem', ['tikta'])
+    ])
+    embedded.add_virya_property('Turmeric', 'ushna')
+    embedded.add_rasa_property('Unknown herb', 'madhura')
+
+    assert embedded.backend == 'embedded'
+    assert embedded.get_all_herbs() == ['Turmeric', 'Neem']
+    assert embedded.search_herbs_by_property('rasa', 'tikta') == ['Turmeric', 'Neem']
+    assert embedded.search_herbs_by_property('rasa', 'madhura') == []
+
+    graph = embedded.get_herb_graph('Turmeric')
+    targets = {(r['type'], r['target']) for r in graph['relationships']}
+    assert targets == {('HAS_RASA', 'Rasa:tikta'), ('HAS_RASA', 'Rasa:katu'),
+                       ('HAS_VIRYA', 'Virya:ushna'), ('CONTAINS_COMPOUND', 'Compound:969516')}
+    assert [node['id'] for node in graph['nodes']][0] == 'Herb:Turmeric'
+
+def test_embedded_snapshot_round_trip(embedded):
+    embedded.upsert_analysis([_entry('Turmeric', ['tikta'], [969516]), _entry('Neem', ['tikta'])])
+    embedded.close()
+
+    reloaded = KnowledgeGraphService('bolt://unused', 'neo4j', 'secret', backend='embedded',
+                                     snapshot_path=embedded.graph.snapshot_path)
+    assert reloaded.get_all_herbs() == ['Turmeric', 'Neem']
+    assert reloaded.search_herbs_by_property('rasa', 'tikta') == ['Turmeric', 'Neem']
+    assert reloaded.get_herb_graph('Turmeric') == embedded.get_herb_graph('Turmeric')
+
+def test_csr_adjacency_compacts_without_losing_edges():
+    from app.services.embedded_graph import CSRAdjacency
+    adjacency = CSRAdjacency(compact_threshold=3)
+    edges = [(0, 5), (2, 1), (0, 3), (2, 1), (7, 0), (0, 4)]
+    added = [adjacency.add(source, target) for source, target in edges]
+
+    assert added == [True, True, True, False, True, True]
+    assert adjacency.pending_count < 3
+    assert adjacency.neighbors(0) == [3, 5, 4]
+    adjacency.compact()
+    assert adjacency.neighbors(0) == [3, 4, 5]
+    assert adjacency.neighbors(2) == [1]
+    assert adjacency.neighbors(6) == []
+    assert len(adjacency) == 5
+
+def test_csr_adjacency_compaction_threshold_grows_with_graph(monkeypatch):
+    from app.services.embedded_graph import CSRAdjacency
+    adjacency = CSRAdjacency(compact_threshold=16)
+    compactions = []
+    compact = adjacency.compact
+    monkeypatch.setattr(adjacency, 'compact', lambda *args: compactions.append(1) or compact(*args))
+    for edge in range(10000):
+        adjacency.add(edge % 97, edge)
+
+    assert len(adjacency) == 10000
+    assert len(compactions) < 40
+    assert adjacency.pending_count <= len(adjacency.indices) // 4
+
+def test_herb_graph_lists_each_node_once(embedded):
+    embedded.upsert_analysis([_entry('Turmeric', ['tikta'], [969516]), _entry('Neem', ['tikta'])])
+
+    graph = embedded.get_herb_graph('Turmeric')
+
+    ids = [node['id'] for node in graph['nodes']]
+    assert len(ids) == len(set(ids)) == 3
+    assert {node['id']: node['label'] for node in graph['nodes']} == {
+        'Herb:Turmeric': 'Herb', 'Rasa:tikta': 'Rasa', 'Compound:969516': 'Compound'}
+    assert all(rel['source'] == 'Herb:Turmeric' for rel in graph['relationships'])
+
+def test_graph_cache_invalidated_by_writes_to_the_herb(embedded):
+    embedded.upsert_analysis([_entry('Turmeric', ['tikta'], [969516]), _entry('Neem', ['tikta'])])
+    graph, etag = embedded.get_herb_graph_with_etag('Turmeric')
+    neem_etag = embedded.get_herb_graph_with_etag('Neem')[1]
+
+    assert embedded.get_herb_graph_with_etag('Turmeric') == (graph, etag)
+    assert embedded.graph_cache_stats()['hits'] == 1
+
+    embedded.add_guna_property('Turmeric', 'laghu')
+    updated, new_etag = embedded.get_herb_graph_with_etag('Turmeric')
+    assert new_etag != etag
+    assert 'Guna:laghu' in [node['id'] for node in updated['nodes']]
+    # Neem was not touched and stays cached
+    assert embedded.get_herb_graph_with_etag('Neem')[1] == neem_etag
+    assert embedded.graph_cache_stats()['invalidations'] == 1
+
+def test_graph_cache_invalidated_when_shared_compound_changes(embedded):
+    embedded.upsert_analysis([_entry('Turmeric', cids=[969516]), _entry('Ginger')])
+    before = embedded.get_herb_graph_with_etag('Turmeric')[1]
+
+    embedded.link_herb_to_compound('Ginger', 969516, 'curcumin')
+
+    graph, after = embedded.get_herb_graph_with_etag('Turmeric')
+    assert after != before
+    assert {'id': 'Compound:969516', 'label': 'Compound', 'cid': 969516,
+            'name': 'curcumin'} in graph['nodes']
+
+def test_embedded_neighborhood_bfs(embedded):
+    embedded.upsert_analysis([
+        _entry('Turmeric', ['tikta'], [969516]),
+        _entry('Ginger', ['katu'], [969516]),
+        _entry('Pepper', ['katu']),
+        _entry('Neem', ['tikta']),
+        _entry('Isolated', ['lavana'])
+    ])
+
+    neighbors = list(embedded.iter_herb_neighborhood('Turmeric', max_depth=2))
+    assert sorted((n.herb, n.depth, n.parent) for n in neighbors) == [
+        ('Ginger', 1, 'Turmeric'), ('Neem', 1, 'Turmeric'), ('Pepper', 2, 'Ginger')]
+    ginger = next(n for n in neighbors if n.herb == 'Ginger')
+    assert (ginger.via_type, ginger.via) == ('CONTAINS_COMPOUND', '969516')
+
+    assert len(list(embedded.iter_herb_neighborhood('Turmeric', max_depth=1, fan_out=1))) == 1
+    assert len(list(embedded.iter_herb_neighborhood('Turmeric', limit=1))) == 1
+    assert [n.herb for n in embedded.iter_herb_neighborhood(
+        'Turmeric', relationships=['HAS_RASA'])] == ['Neem']
+
+def test_neo4j_neighborhood_pushes_limits_down(kg):
+    class Result(list):
+        pass
+
+    levels = [[{'i': 0, 'herb': 'Ginger', 'via_type': 'HAS_RASA', 'via': 'katu'}], []]
+    calls = []
+
+    class Session(FakeSession):
+        def run(self, query, **params):
+            calls.append(params)
+            return Result(levels[len(calls) - 1])
+
+    kg.driver.session = lambda: Session(kg.driver)
+    neighbors = list(kg.iter_herb_neighborhood('Turmeric', max_depth=3, fan_out=5, limit=10))
+
+    assert [(n.herb, n.parent, n.depth) for n in neighbors] == [('Ginger', 'Turmeric', 1)]
+    assert calls[0]['fan_out'] == 5 and calls[0]['limit'] == 10
+    assert calls[1]['frontier'] == ['Ginger'] and calls[1]['seen'] == ['Turmeric', 'Ginger']
+    assert calls[1]['limit'] == 9
+
+def test_embedded_remove_herbs_survives_snapshot(embedded, tmp_path):
+    embedded.upsert_analysis([_entry('Turmeric', ['tikta'], [969516]), _entry('Neem', ['tikta'])])
+    assert embedded.remove_herbs(['Turmeric', 'Unknown']) == 1
+    assert embedded.get_all_herbs() == ['Neem']
+    assert embedded.search_herbs_by_property('rasa', 'tikta') == ['Neem']
+    assert embedded.get_herb_graph('Turmeric') == {'nodes': [], 'relationships': []}
+
+    embedded.close()
+    reloaded = KnowledgeGraphService('bolt://unused', 'neo4j', 'secret', backend='embedded',
+                                     snapshot_path=str(tmp_path / 'graph.json'))
+    assert reloaded.get_all_herbs() == ['Neem']
+    reloaded.upsert_analysis([_entry('Turmeric', ['katu'])], replace=True)
+    assert reloaded.search_herbs_by_property('rasa', 'katu') == ['Turmeric']
@@ -0,0 +1,101 @@
+import knowledge_graph as kg
+
+def test_property_index_matches_linear_scan():
+    for property_type in ('rasa', 'guna', 'virya', 'modern_compounds'):
+        values = {v for props in kg.KNOWLEDGE_GRAPH.values() for v in props[property_type]}
+        for value in values:
+            expected = [herb for herb, props in kg.KNOWLEDGE_GRAPH.items()
+                        if value in props[property_type]]
+            assert kg.search_herbs_by_property(property_type, value) == expected
+
+def test_dosha_lookup_includes_tridoshic_herbs():
+    pitta = kg.get_herbs_by_dosha('Pitta')
+    assert 'Turmeric' in pitta and 'Amla' in pitta
+    assert 'Ginger' not in pitta
+    assert kg.get_herbs_by_dosha('all three doshas') == ['Amla', 'Guduchi', 'Triphala']
+
+def test_synergistic_herbs_share_doshas():
+    synergistic = kg.get_synergistic_herbs('black pepper')
+    assert 'Black Pepper' not in synergistic
+    assert len(synergistic) == 5
+    assert all({'kapha', 'vata'} & kg._pacified_doshas(kg.KNOWLEDGE_GRAPH[h]) for h in synergistic)
+
+def test_add_and_remove_keep_indexes_consistent():
+    kg.add_herb('haritaki', {'rasa': ['astringent'], 'dosha': ['pacifies vata'],
+                             'modern_compounds': ['chebulagic acid']})
+    try:
+        assert kg.get_herbs_by_compound('Chebulagic Acid') == ['Haritaki']
+        assert kg.search_herbs_by_property('rasa', 'astringent')[-1] == 'Haritaki'
+        assert 'Haritaki' in kg.get_herbs_by_dosha('vata')
+
+        kg.add_herb('Haritaki', {'rasa': ['salty'], 'dosha': ['pacifies kapha'],
+                                 'modern_compounds': []})
+        assert kg.get_herbs_by_compound('chebulagic acid') == []
+        assert 'Haritaki' not in kg.get_herbs_by_dosha('vata')
+        assert kg.search_herbs_by_property('rasa', 'salty') == ['Haritaki']
+    finally:
+        assert kg.remove_herb('Haritaki')
+    assert kg.search_herbs_by_property('rasa', 'salty') == []
+    assert 'Haritaki' not in kg.get_all_herbs()
+
+def test_saved_herbs_load_into_another_store(tmp_path):
+    path = str(tmp_path / 'herb_store.json')
+    kg.add_herb('Haritaki', {'rasa': ['astringent'], 'modern_compounds': ['chebulagic acid']})
+    try:
+        kg.save_herbs(path)
+    finally:
+        kg.remove_herb('Haritaki')
+    assert kg.get_herbs_by_compound('chebulagic acid') == []
+    try:
+        assert kg.load_herbs(path) == len(kg.get_all_herbs())
+        assert kg.get_herbs_by_compound('chebulagic acid') == ['Haritaki']
+    finally:
+        kg.remove_herb('Haritaki')
+
+def test_neighborhood_is_bounded_by_depth_and_fan_out():
+    neighbors = list(kg.iter_herb_neighborhood('tulsi', max_depth=1,
+                                               properties=('modern_compounds',)))
+    assert [(n.herb, n.via) for n in neighbors] == [('Cinnamon', 'eugenol'), ('Clove', 'eugenol')]
+
+    limited = list(kg.iter_herb_neighborhood('Turmeric', max_depth=2, fan_out=2))
+    assert [n.depth for n in limited] == [1, 1, 2, 2, 2, 2]
+    assert len({n.herb for n in limited}) == len(limited)
+    assert 'Turmeric' not in {n.herb for n in limited}
+
+def test_neighborhood_reaches_every_connected_herb():
+    reached = {n.herb for n in kg.iter_herb_neighborhood('Garlic', max_depth=4)}
+    assert reached == set(kg.KNOWLEDGE_GRAPH) - {'Garlic'}
+    assert list(kg.iter_herb_neighborhood('Unknown herb')) == []
+
+def test_similarity_engine_matches_pairwise_jaccard():
+    from app.services.herb_similarity import HerbSimilarityEngine
+    engine = HerbSimilarityEngine(weights={'rasa': 1.0, 'modern_compounds': 3.0})
+    herbs = {
+        'A': {'rasa': ['bitter', 'sweet'], 'modern_compounds': ['x']},
+        'B': {'rasa': ['bitter'], 'modern_compounds': ['x', 'y']},
+        'C': {'rasa': ['sweet']},
+        'D': {'rasa': ['salty']}
+    }
+    for herb, features in herbs.items():
+        engine.upsert(herb, features)
+
+    # A.B share bitter + x = 4 of A(5) + B(7) - 4 = 8; A.C share sweet = 1 of 5
+    assert engine.most_similar('A', k=5) == [('B', 0.5), ('C', 0.2)]
+    assert engine.most_similar('A', k=1) == [('B', 0.5)]
+    cosine = dict(engine.most_similar('A', metric='cosine'))
+    assert abs(cosine['B'] - 10 / (11 * 19) ** 0.5) < 1e-9
+
+    engine.upsert('D', {'rasa': ['bitter', 'sweet'], 'modern_compounds': ['x']})
+    assert engine.remove('B')
+    assert engine.most_similar('A', k=2) == [('D', 1.0), ('C', 0.2)]
+    assert engine.most_similar('B') == []
+    assert engine.stats()['herbs'] == 3
+
+def test_similar_herbs_follow_graph_updates():
+    assert 'Ginger' in kg.get_synergistic_herbs('black pepper')
+    kg.add_herb('long pepper', dict(kg.KNOWLEDGE_GRAPH['Black Pepper']))
+    try:
+        assert kg.get_similar_herbs('Black Pepper', k=1) == [('Long Pepper', 1.0)]
+    finally:
+        kg.remove_herb('Long Pepper')
+    assert 'Long Pepper' not in kg.get_synergistic_herbs('black pepper')
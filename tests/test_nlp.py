@@ -30,3 +30,55 @@ def test_ayurvedic_properties_extraction():
     assert 'katu' in properties['rasa']   # pungent
     assert 'kashaya' in properties['rasa'] # astringent
     assert 'ushna' in properties['virya']  # hot
+
+def test_herb_mentions_use_word_boundaries():
+    nlp_service = AyurvedicNLPService()
+    
+    sample_text = "Until the medal ceremony, Turmeric (Curcuma longa) and black pepper were served."
+    
+    mentions = nlp_service.find_herb_mentions(sample_text)
+    
+    assert [m.canonical for m in mentions] == ['turmeric', 'turmeric', 'black pepper']
+    assert sample_text[mentions[1].start:mentions[1].end] == 'Curcuma longa'
+
+def test_lexicon_prefers_longest_alias():
+    from app.utils.lexicon import LexiconMatcher
+    
+    matcher = LexiconMatcher({'cumin': ['cumin seed'], 'pepper': [], 'black pepper': []})
+    matches = matcher.find_all("Roast cumin seed with Black Pepper.")
+    
+    assert [(m.canonical, m.text) for m in matches] == [
+        ('cumin', 'cumin seed'),
+        ('black pepper', 'Black Pepper')
+    ]
+
+def test_properties_are_attributed_per_herb():
+    nlp_service = AyurvedicNLPService()
+    
+    sample_text = """
+    Turmeric is bitter and heating. It is light.
+    Neem is cold; Ginger is pungent.
+    """
+    
+    herbs = {h['canonical']: h for h in nlp_service.extract_herbs(sample_text)}
+    
+    assert herbs['turmeric']['rasa'] == ['tikta']
+    assert herbs['turmeric']['virya'] == 'ushna'
+    assert herbs['turmeric']['guna'] == ['laghu']
+    assert herbs['neem']['virya'] == 'shita'
+    assert herbs['neem']['rasa'] == []
+    assert herbs['ginger']['rasa'] == ['katu']
+
+def test_spacy_is_loaded_lazily_and_batch_matches_single():
+    nlp_service = AyurvedicNLPService()
+    assert nlp_service._nlp_loaded == False
+    
+    texts = [
+        "Turmeric has bitter taste and hot potency.",
+        "Neem is cold. Ginger is pungent.",
+        ""
+    ]
+    
+    batch = nlp_service.extract_herbs_batch(texts, batch_size=2)
+    
+    assert batch == [nlp_service.extract_herbs(text) for text in texts]
@@ -0,0 +1,105 @@
+import pytest
+from app.services.pubchem_service import PubChemService
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self._payload
+
+NAME_CIDS = {'curcumin': 969516, 'piperine': 638024, 'gingerol': 442793, 'shogaol': 5281794}
+
+class FakeSession:
+    """Answers PubChem URLs from a small table and records every call."""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        path = url.lower().split('/rest/pug/compound/')[1]
+        kind, key, operation = path.split('/')[:3]
+        if kind == 'name' and operation == 'cids' and key in NAME_CIDS:
+            return FakeResponse(200, {'IdentifierList': {'CID': [NAME_CIDS[key]]}})
+        if kind == 'cid' and operation == 'property':
+            known = [int(cid) for cid in key.split(',') if int(cid) in NAME_CIDS.values()]
+            if known:
+                return FakeResponse(200, {'PropertyTable': {'Properties': [
+                    {'CID': cid, 'MolecularFormula': 'C21H20O6' if cid == 969516 else 'CxHy',
+                     'MolecularWeight': '368.4', 'CanonicalSMILES': 'COC1'}
+                    for cid in known
+                ]}})
+        return FakeResponse(404, {'Fault': {'Code': 'PUGREST.NotFound'}})
+
+@pytest.fixture
+def service(tmp_path):
+    service = PubChemService(cache_path=str(tmp_path / 'pubchem.sqlite3'))
+    service.session = FakeSession()
+    return service
+
+def test_cache_hits_skip_network_and_rate_limit(service, monkeypatch):
+    assert service.search_compound('Curcumin') == 969516
+    assert service.get_compound_properties(969516)['molecular_formula'] == 'C21H20O6'
+    assert len(service.session.urls) == 2
+
+    monkeypatch.setattr(service, '_rate_limit', lambda: pytest.fail('rate limited on cache hit'))
+    assert service.search_compound('curcumin ') == 969516
+    assert service.get_compound_properties(969516)['cid'] == 969516
+    assert len(service.session.urls) == 2
+
+    stats = service.cache_stats()
+    assert stats['name_cid'] == {'hits': 1, 'misses': 1}
+    assert stats['cid_properties'] == {'hits': 1, 'misses': 1}
+
+def test_not_found_names_are_negatively_cached(service, tmp_path):
+    assert service.search_compound('unobtainium') is None
+    assert service.search_compound('unobtainium') is None
+    assert len(service.session.urls) == 1
+
+    # A second service on the same file (another worker) shares the entries
+    other = PubChemService(cache_path=str(tmp_path / 'pubchem.sqlite3'))
+    other.session = FakeSession()
+    assert other.search_compound('unobtainium') is None
+    assert other.search_compound('curcumin') == 969516
+    assert len(other.session.urls) == 1
+
+def test_multi_herb_search_batches_property_requests(service):
+    results = service.search_compounds_for_herbs(['Turmeric', 'black pepper', 'ginger', 'unknown'])
+    
+    assert [c['cid'] for c in results['Turmeric']] == [969516]
+    assert [c['cid'] for c in results['ginger']] == [442793, 5281794]
+    assert results['ginger'][0]['source_herb'] == 'ginger'
+    assert results['unknown'] == []
+    
+    property_urls = [url for url in service.session.urls if '/cid/' in url]
+    assert len(property_urls) == 1
+    assert '/cid/969516,638024,442793,5281794/' in property_urls[0]
+
+def test_bulk_properties_respect_batch_size(service):
+    service.property_batch_size = 2
+    
+    properties = service.get_compound_properties_bulk([969516, 638024, 442793, 969516])
+    
+    assert sorted(properties) == [442793, 638024, 969516]
+    assert len(service.session.urls) == 2
+
+def test_async_client_matches_sequential_results(service, tmp_path):
+    from app.services.pubchem_async import AsyncPubChemClient
+    herbs = ['Turmeric', 'black pepper', 'ginger', 'unknown']
+    expected = service.search_compounds_for_herbs(herbs)
+
+    fresh = PubChemService(cache_path=str(tmp_path / 'async.sqlite3'))
+    fresh.session = FakeSession()
+    client = AsyncPubChemClient(fresh, max_concurrency=4)
+    try:
+        assert client.search_compounds_for_herbs(herbs) == expected
+    finally:
+        client.close()
+    assert len([url for url in fresh.session.urls if '/cid/' in url]) == 1
@@ -0,0 +1,42 @@
+import threading
+import time
+import pytest
+from app.utils.rate_limiter import TokenBucketRateLimiter
+
+def test_burst_then_steady_rate():
+    limiter = TokenBucketRateLimiter(rate=50, capacity=3)
+
+    waits = [limiter.acquire() for _ in range(5)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.02, abs=0.01)
+    assert waits[4] == pytest.approx(0.02, abs=0.01)
+    stats = limiter.stats()
+    assert stats['acquired'] == 5
+    assert stats['waits'] == 2
+    assert stats['total_wait'] == pytest.approx(0.04, abs=0.01)
+
+def test_shared_state_file_splits_budget(tmp_path):
+    path = str(tmp_path / 'bucket')
+    # Separate instances stand in for separate worker processes
+    first = TokenBucketRateLimiter(rate=20, capacity=2, state_path=path)
+    second = TokenBucketRateLimiter(rate=20, capacity=2, state_path=path)
+
+    assert first.acquire() == 0.0
+    assert second.acquire() == 0.0
+    assert first.acquire() > 0
+    assert second.stats()['shared'] == True
+
+def test_concurrent_threads_stay_within_rate():
+    limiter = TokenBucketRateLimiter(rate=100, capacity=1)
+    start = time.time()
+
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 1 burst token + 10 more at 100/s
+    assert time.time() - start >= 0.09
+    assert limiter.stats()['acquired'] == 11
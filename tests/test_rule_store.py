@@ -0,0 +1,73 @@
+import json
+import pytest
+import hypothesis_engine
+from app.services.hypothesis_service import HypothesisEngine
+from app.services.rule_store import RuleStore
+
+def test_pairs_are_found_in_either_order():
+    store = RuleStore()
+    forward = store.pair('compound_interactions', 'Curcumin', 'piperine')
+    assert forward['mechanism'] == 'Bioavailability enhancement'
+    assert store.pair('compound_interactions', 'PIPERINE', ' curcumin ') is forward
+    assert store.pair('compound_interactions', 'curcumin', 'allicin') is None
+    assert set(store.partners('herb_synergies', 'Turmeric')) == {'black pepper'}
+
+def test_find_pairs_matches_whole_words_in_table_order():
+    store = RuleStore()
+    texts = ['Bacosides A', 'withanolides; allicin', 'gingerol extract', 'curcuminoid']
+    found = store.find_pairs('compound_synergies', texts)
+    assert [pair for pair, _ in found] == [('gingerol', 'allicin'), ('withanolides', 'bacosides')]
+
+def test_rule_file_extends_tables_and_bumps_version(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({
+        'compound_interactions': {'kind': 'pair', 'rules': [
+            {'pair': ['eugenol', 'Piperine'], 'mechanism': 'Test', 'effect': 'Test effect'}
+        ]},
+        'rasa_correlations': {'kind': 'key', 'rules': {
+            'bitter': {'compounds': [], 'modern_understanding': 'Overridden', 'examples': []}
+        }}
+    }))
+    store = RuleStore()
+    version = store.version
+    store.load(str(path))
+    assert store.version == version + 1
+    assert store.pair('compound_interactions', 'piperine', 'eugenol')['effect'] == 'Test effect'
+    assert store.pair('compound_interactions', 'curcumin', 'piperine') is not None
+    assert store.get('rasa_correlations', 'Bitter')['modern_understanding'] == 'Overridden'
+    assert store.stats()['tables']['compound_interactions'] == 4
+    with pytest.raises(ValueError):
+        store.update({'compound_interactions': {'kind': 'key', 'rules': {}}})
+
+def test_engine_reports_known_compound_synergy():
+    engine = HypothesisEngine(RuleStore())
+    herb = {'name': 'Turmeric', 'rasa': ['tikta'], 'guna': ['laghu'], 'virya': 'ushna'}
+    compounds = [{'molecular_formula': 'Piperine'}, {'molecular_formula': 'Curcumin'}]
+    hypotheses = engine.generate_hypotheses(herb, compounds)
+    synergy = hypotheses[0]
+    assert synergy['title'] == 'Compound Synergy Identified'
+    assert synergy['compounds'] == ['curcumin', 'piperine']
+
+def test_legacy_engine_uses_shared_rules():
+    herbs = ['Black Pepper', 'Turmeric']
+    compounds = {'Turmeric': {'Curcumin': {}}, 'Black Pepper': {'piperine': {}}}
+    result = hypothesis_engine.find_biochemical_synergies(herbs, compounds)
+    kinds = [s['type'] for s in result['synergies']]
+    assert kinds == ['Known Biochemical Synergy', 'Compound Interaction']
+    assert hypothesis_engine.analyze_dosha_therapeutic_implications('Pacifies Pitta') \
+        .startswith('Cooling')
+
+def test_compound_interactions_keep_pairwise_order():
+    compounds = {
+        'Ginger': {'Gingerol': {}, 'Piperine': {}},
+        'Turmeric': {'curcumin': {}},
+        'Garlic': {'allicin': {}},
+        'Black Pepper': {'piperine': {}, 'gingerol': {}}
+    }
+    interactions = hypothesis_engine.analyze_compound_interactions(list(compounds), compounds)
+    assert [(i['herbs'], i['compounds']) for i in interactions] == [
+        (['Ginger', 'Garlic'], ['Gingerol', 'allicin']),
+        (['Ginger', 'Turmeric'], ['Piperine', 'curcumin']),
+        (['Turmeric', 'Black Pepper'], ['curcumin', 'piperine']),
+        (['Garlic', 'Black Pepper'], ['allicin', 'gingerol'])
+    ]